@@ -0,0 +1,219 @@
+"""Streaming latency percentiles per step name and type over sliding windows.
+
+Durations go into DDSketch-style histograms: logarithmic bins with a fixed
+relative error, so quantiles are accurate to ``RELATIVE_ACCURACY`` at any
+scale and sketches merge (and un-merge) by adding bin counts. Each series
+keeps one small sketch per ``BUCKET_S`` time bucket plus a running total
+per window, from which expired buckets are subtracted. Queries therefore
+read one sketch no matter how many steps have been recorded.
+"""
+from __future__ import annotations
+
+import math
+import time
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+RELATIVE_ACCURACY = 0.01
+BUCKET_S = 10
+# Sliding windows served by the query endpoints, in seconds.
+WINDOWS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600}
+# Series beyond this many (per group) evict the least recently updated.
+MAX_SERIES = 5000
+# Durations are clamped to this, which bounds the bins per sketch (~1,100).
+MAX_DURATION_MS = 2 ** 31
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class DDSketch:
+    """Log-binned histogram with relative-error quantiles."""
+
+    __slots__ = ("bins", "zeros", "count")
+
+    gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    _log_gamma = math.log(gamma)
+
+    def __init__(self) -> None:
+        self.bins: dict[int, int] = {}
+        self.zeros = 0  # values below 1 ms
+        self.count = 0
+
+    @classmethod
+    def key(cls, value: float) -> Optional[int]:
+        """Bin index of a value (None for the zero bin)."""
+        if value < 1:
+            return None
+        return math.ceil(math.log(min(value, MAX_DURATION_MS)) / cls._log_gamma)
+
+    def add(self, value: float, n: int = 1) -> None:
+        self.add_key(self.key(value), n)
+
+    def add_key(self, key: Optional[int], n: int = 1) -> None:
+        self.count += n
+        if key is None:
+            self.zeros += n
+        else:
+            self.bins[key] = self.bins.get(key, 0) + n
+
+    def merge(self, other: DDSketch, sign: int = 1) -> None:
+        """Add (or with ``sign=-1`` remove) another sketch's counts."""
+        self.count += sign * other.count
+        self.zeros += sign * other.zeros
+        bins = self.bins
+        for key, n in other.bins.items():
+            total = bins.get(key, 0) + sign * n
+            if total:
+                bins[key] = total
+            else:
+                del bins[key]
+
+    def quantiles(self, qs: tuple[float, ...]) -> list[Optional[float]]:
+        """Values at ascending quantiles ``qs``, in one pass over the bins."""
+        if self.count <= 0:
+            return [None] * len(qs)
+        results: list[Optional[float]] = []
+        ranks = iter(q * (self.count - 1) for q in qs)
+        rank = next(ranks)
+        seen = self.zeros
+        while rank < seen:
+            results.append(0.0)
+            rank = next(ranks, None)
+            if rank is None:
+                return results
+        bins = self.bins
+        for key in sorted(bins):
+            seen += bins[key]
+            while rank < seen:
+                # Midpoint of the bin (gamma^(k-1), gamma^k], within the accuracy bound.
+                results.append(2 * self.gamma ** key / (self.gamma + 1))
+                rank = next(ranks, None)
+                if rank is None:
+                    return results
+        return results + [results[-1] if results else 0.0] * (len(qs) - len(results))
+
+    def summary(self) -> dict:
+        values = self.quantiles(QUANTILES)
+        return {
+            "count": self.count,
+            **{f"p{round(q * 100)}": _round(v) for q, v in zip(QUANTILES, values)},
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+class SlidingSeries:
+    """Per-bucket sketches for the last hour plus running window totals."""
+
+    __slots__ = ("buckets", "windows", "cutoffs", "now")
+
+    max_buckets = max(WINDOWS.values()) // BUCKET_S
+
+    def __init__(self, now: int) -> None:
+        self.buckets: dict[int, DDSketch] = {}
+        self.windows = {name: DDSketch() for name in WINDOWS}
+        # Per window, the newest bucket index already subtracted from it.
+        self.cutoffs = {name: now - span // BUCKET_S for name, span in WINDOWS.items()}
+        self.now = now
+
+    def add(self, index: int, key: Optional[int]) -> None:
+        """Count one value (by its sketch bin ``key``) in time bucket ``index``."""
+        if index <= self.now - self.max_buckets:
+            return  # older than every window
+        index = min(index, self.now)
+        bucket = self.buckets.get(index)
+        if bucket is None:
+            bucket = self.buckets[index] = DDSketch()
+        bucket.add_key(key)
+        for name, cutoff in self.cutoffs.items():
+            if index > cutoff:
+                self.windows[name].add_key(key)
+
+    def advance(self, now: int) -> None:
+        """Move the windows forward, subtracting buckets that left them."""
+        if now <= self.now:
+            return
+        self.now = now
+        indexes = sorted(self.buckets)
+        for name, span in WINDOWS.items():
+            cutoff = now - span // BUCKET_S
+            window = self.windows[name]
+            for index in indexes:
+                if index > cutoff:
+                    break
+                if index > self.cutoffs[name]:
+                    window.merge(self.buckets[index], -1)
+            self.cutoffs[name] = cutoff
+        for index in indexes:
+            if index > now - self.max_buckets:
+                break
+            del self.buckets[index]
+
+    def timeseries(self, span_s: int) -> list[dict]:
+        first = self.now - span_s // BUCKET_S
+        return [
+            {"t": index * BUCKET_S, **self.buckets[index].summary()}
+            for index in sorted(self.buckets) if index > first
+        ]
+
+
+class LatencyAnalytics:
+    """Latency series keyed by step ``name`` and by step ``type`` (plus
+    ``all``), fed with each step's duration when it finishes."""
+
+    groups = ("type", "name")
+
+    def __init__(self) -> None:
+        self.series: dict[str, OrderedDict[str, SlidingSeries]] = {
+            group: OrderedDict() for group in self.groups
+        }
+        self.series["type"]["all"] = SlidingSeries(self._now())
+
+    @staticmethod
+    def _now() -> int:
+        return int(time.time() // BUCKET_S)
+
+    def record(self, name: str, step_type: str, duration_ms: float, ended_at: Optional[float] = None) -> None:
+        """Add one finished step; ``ended_at`` (epoch seconds) picks its bucket."""
+        now = self._now()
+        index = int(ended_at // BUCKET_S) if ended_at is not None else now
+        bin_key = DDSketch.key(duration_ms)
+        for group, key in (("type", "all"), ("type", step_type), ("name", name)):
+            series = self._series(group, key, now)
+            series.advance(now)
+            series.add(index, bin_key)
+
+    def _series(self, group: str, key: str, now: int) -> SlidingSeries:
+        by_key = self.series[group]
+        series = by_key.get(key)
+        if series is None:
+            series = by_key[key] = SlidingSeries(now)
+            if len(by_key) > MAX_SERIES:
+                by_key.popitem(last=False)
+        else:
+            by_key.move_to_end(key)
+        return series
+
+    def _matching(self, group: str, key: Optional[str]) -> Iterator[tuple[str, SlidingSeries]]:
+        now = self._now()
+        by_key = self.series[group]
+        keys = [key] if key is not None else list(by_key)
+        for k in keys:
+            series = by_key.get(k)
+            if series is not None:
+                series.advance(now)
+                yield k, series
+
+    def percentiles(self, group: str, window: str, key: Optional[str] = None) -> dict[str, dict]:
+        """p50/p95/p99 and count per series over the trailing ``window``."""
+        return {
+            k: series.windows[window].summary()
+            for k, series in self._matching(group, key)
+            if series.windows[window].count
+        }
+
+    def timeseries(self, group: str, window: str, key: Optional[str] = None) -> dict[str, list[dict]]:
+        """Per-bucket p50/p95/p99 over the trailing ``window``."""
+        return {k: series.timeseries(WINDOWS[window]) for k, series in self._matching(group, key)}
@@ -0,0 +1,56 @@
+"""Latency sketches: record throughput, query time and quantile error.
+
+Records ``--steps`` log-normally distributed durations over ``--names`` step
+names, then times percentile queries and compares them with exact
+quantiles of the same data.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_analytics --steps 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from analytics import LatencyAnalytics
+
+TYPES = ("llm", "tool", "plan", "final", "error")
+
+
+def main(total: int, names: int) -> None:
+    rng = random.Random(7)
+    analytics = LatencyAnalytics()
+    values = [rng.lognormvariate(6, 1.2) for _ in range(total)]
+    labels = [(f"step-{rng.randrange(names)}", rng.choice(TYPES)) for _ in range(total)]
+
+    t0 = time.perf_counter()
+    for (name, step_type), value in zip(labels, values):
+        analytics.record(name, step_type, value)
+    elapsed = time.perf_counter() - t0
+    print(f"record:   {total / elapsed:,.0f} steps/s ({elapsed / total * 1e6:.2f} us/step)")
+
+    for group, key in (("type", "all"), ("type", None), ("name", None)):
+        reps = 200
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            result = analytics.percentiles(group, "5m", key)
+        per_query = (time.perf_counter() - t0) / reps
+        print(f"query {group}/{key or '*'}: {per_query * 1e3:.3f} ms for {len(result)} series "
+              f"({per_query / len(result) * 1e6:.1f} us/series)")
+
+    exact = sorted(values)
+    summary = analytics.percentiles("type", "5m", "all")["all"]
+    for q in (50, 95, 99):
+        truth = exact[int(q / 100 * (total - 1))]
+        print(f"p{q}: sketch {summary[f'p{q}']:.1f} vs exact {truth:.1f} "
+              f"({abs(summary[f'p{q}'] - truth) / truth:.2%} error)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=1_000_000)
+    parser.add_argument("--names", type=int, default=50)
+    args = parser.parse_args()
+    main(args.steps, args.names)
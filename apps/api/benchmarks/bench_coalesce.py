@@ -0,0 +1,138 @@
+"""Frames per subscriber for a high-rate run, with and without coalescing.
+
+Emits ``--events`` step updates over ``--steps`` distinct steps of one run
+as fast as the loop allows (each step goes running -> completed), and
+counts the frames and bytes one subscriber receives for each window.
+
+Then checks the ``coalesce`` overflow policy for a slow ``?mode=delta``
+subscriber: each completion goes out as a delta on top of the running
+snapshot before it, and the client counts deltas that arrive on top of
+any other version of the step (a superseded snapshot must take the
+deltas queued behind it along).
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_coalesce --events 20000 --windows 0 16 50 100
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from models import Step, StepStatus, StepType
+from serialization import model_bytes
+from websocket_manager import ConnectionManager, OverflowPolicy, StreamMode
+
+RUN_ID = "bench-run"
+
+
+class CountingWebSocket:
+    def __init__(self) -> None:
+        self.frames = 0
+        self.bytes = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.frames += 1
+        self.bytes += len(data)
+
+
+async def run(events: int, steps: int, window_ms: int) -> None:
+    manager = ConnectionManager(coalesce_ms=window_ms)
+    ws = CountingWebSocket()
+    await manager.connect(RUN_ID, ws)
+    pool = [
+        Step(run_id=RUN_ID, name=f"step-{i}", type=StepType.llm, input={"prompt": "x" * 200})
+        for i in range(steps)
+    ]
+    t0 = time.perf_counter()
+    for i in range(events):
+        step = pool[i % steps]
+        step.status = StepStatus.running if (i // steps) % 2 == 0 else StepStatus.completed
+        await manager.broadcast_step(step, model_bytes(step))
+        if i % 100 == 0:
+            await asyncio.sleep(0)  # let ingest interleave with the writer tasks
+    elapsed = time.perf_counter() - t0
+    await asyncio.sleep(window_ms / 1000 + 0.05)
+    print(
+        f"{window_ms:>9} {events / elapsed:>12,.0f} {ws.frames:>8,} "
+        f"{ws.frames / max(elapsed, window_ms / 1000):>10,.0f} {ws.bytes / events:>9,.0f}"
+    )
+
+
+class DeltaClient:
+    """Applies frames as the web client does, yielding on every send so
+    the subscriber's queue backs up."""
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.steps: dict[str, dict] = {}
+        self.misapplied = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.frames += 1
+        msg = json.loads(data)
+        if msg["type"] == "step_update":
+            self.steps[msg["step"]["step_id"]] = msg["step"]
+        elif msg["type"] == "step_delta":
+            # Each cycle stamps its running snapshot with tokens_prompt and
+            # its completion with the same tokens_completion.
+            step = self.steps.get(msg["step_id"])
+            if step is None or step["tokens_prompt"] != msg["changes"]["tokens_completion"]:
+                self.misapplied += 1
+            if step is not None:
+                step.update(msg["changes"])
+        await asyncio.sleep(0)
+
+
+async def run_delta_policy(events: int, steps: int) -> None:
+    manager = ConnectionManager(overflow=OverflowPolicy.coalesce)
+    ws = DeltaClient()
+    sub = await manager.connect(RUN_ID, ws, mode=StreamMode.delta)
+    pool = [Step(run_id=RUN_ID, name=f"step-{i}", type=StepType.llm) for i in range(steps)]
+    for i in range(events):
+        step = pool[i % steps]
+        cycle = i // (2 * steps) + 1
+        if (i // steps) % 2 == 0:
+            step.status, step.tokens_prompt = StepStatus.running, cycle
+            await manager.broadcast_step(step, model_bytes(step))
+        else:
+            step.status, step.tokens_completion = StepStatus.completed, cycle
+            await manager.broadcast_step(step, model_bytes(step), {"status", "tokens_completion"})
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    while sub.backlog:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    stale = sum(ws.steps[s.step_id] != json.loads(model_bytes(s)) for s in pool)
+    print(
+        f"{'delta':>9} {events:>8,} {ws.frames:>8,} {sub.dropped:>8,} "
+        f"{ws.misapplied:>11,} {stale:>7,}"
+    )
+
+
+def main(events: int, steps: int, windows: list[int]) -> None:
+    print(f"{'window_ms':>9} {'events/s':>12} {'frames':>8} {'frames/s':>10} {'B/event':>9}")
+    for window in windows:
+        asyncio.run(run(events, steps, window))
+    print()
+    print(f"{'mode':>9} {'events':>8} {'frames':>8} {'dropped':>8} {'misapplied':>11} {'stale':>7}")
+    asyncio.run(run_delta_policy(events, max(1, steps // 10)))
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--windows", type=int, nargs="+", default=[0, 16, 50, 100])
+    args = parser.parse_args()
+    main(args.events, args.steps, args.windows)
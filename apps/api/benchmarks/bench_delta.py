@@ -0,0 +1,71 @@
+"""WebSocket bytes per run: full step_update frames vs ?mode=delta.
+
+Runs every demo scenario with its delays zeroed, with one full-mode and one
+delta-mode subscriber attached, and compares what each was sent.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_delta --runs 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+
+from database import db
+from models import Run
+from scenarios import SCENARIOS, ScenarioStep
+from simulator import run_simulation
+from websocket_manager import StreamMode, manager
+
+
+class CountingWebSocket:
+    """Accepts every frame and only counts it."""
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.bytes = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.frames += 1
+        self.bytes += len(data.encode())
+
+
+def no_delays(step: ScenarioStep) -> None:
+    step.delay_s = 0
+    for child in step.children:
+        no_delays(child)
+
+
+async def main(runs: int) -> None:
+    for scenario in SCENARIOS.values():
+        no_delays(scenario)
+
+    print(f"{'scenario':<20} {'full B/run':>11} {'delta B/run':>12} {'saved':>7}")
+    for name in SCENARIOS:
+        full, delta = CountingWebSocket(), CountingWebSocket()
+        for _ in range(runs):
+            run = db.create_run(Run())
+            await manager.connect(run.run_id, full)
+            await manager.connect(run.run_id, delta, mode=StreamMode.delta)
+            await run_simulation(run.run_id, name)
+            await asyncio.sleep(0)  # let the writer tasks drain
+            manager.disconnect(run.run_id, full)
+            manager.disconnect(run.run_id, delta)
+        assert full.frames == delta.frames
+        print(
+            f"{name:<20} {full.bytes / runs:>11,.0f} {delta.bytes / runs:>12,.0f} "
+            f"{1 - delta.bytes / full.bytes:>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.runs))
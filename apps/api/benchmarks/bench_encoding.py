@@ -0,0 +1,97 @@
+"""WebSocket frame encodings: bytes per event and encode throughput.
+
+Captures the frames of simulated runs (every demo scenario, delays zeroed),
+then re-encodes them in each ``FrameEncoding``. Encoding happens once per
+frame whatever the subscriber count; for comparison, the last row is
+transport-level permessage-deflate, which compresses separately for every
+client (``--clients`` compressors with context takeover).
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_encoding --runs 50 --clients 100
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+import zlib
+
+from database import db
+from models import Run
+from scenarios import SCENARIOS
+from serialization import FrameEncoding
+from simulator import run_simulation
+from websocket_manager import Frame, StreamMode, manager
+
+from benchmarks.bench_delta import no_delays
+
+
+async def capture(runs: int) -> list[Frame]:
+    for scenario in SCENARIOS.values():
+        no_delays(scenario)
+    frames: list[Frame] = []
+    for i in range(runs):
+        run = db.create_run(Run())
+        await run_simulation(run.run_id, list(SCENARIOS)[i % len(SCENARIOS)])
+        frames.extend(manager._history[run.run_id].frames)
+    return frames
+
+
+def fresh(frames: list[Frame]) -> list[Frame]:
+    """Copies with empty encoding caches."""
+    copies = []
+    for f in frames:
+        copy = Frame.__new__(Frame)
+        copy.seq, copy.key, copy.full, copy.delta, copy._encoded = f.seq, f.key, f.full, f.delta, {}
+        copies.append(copy)
+    return copies
+
+
+def report(label: str, sizes: int, events: int, elapsed: float, baseline: float) -> None:
+    print(
+        f"{label:<28} {sizes / events:>9,.0f} {sizes / baseline:>7.0%} "
+        f"{events / elapsed:>12,.0f}"
+    )
+
+
+def main(runs: int, clients: int, mode: StreamMode) -> None:
+    frames = asyncio.run(capture(runs))
+    n = len(frames)
+    baseline = sum(len(f.text(mode).encode()) for f in frames)
+    print(f"{n} frames from {runs} runs, mode={mode.value}\n")
+    print(f"{'encoding':<28} {'B/event':>9} {'vs json':>7} {'events/s':>12}")
+    for encoding in FrameEncoding:
+        if not encoding.available:
+            print(f"{encoding.value:<28} (msgpack not installed)")
+            continue
+        batch = fresh(frames)
+        t0 = time.perf_counter()
+        size = 0
+        for frame in batch:
+            data = frame.render(mode, encoding)
+            size += len(data.encode()) if isinstance(data, str) else len(data)
+        report(encoding.value, size, n, time.perf_counter() - t0, baseline)
+
+    # permessage-deflate: one compressor per connection, so the work
+    # scales with the number of clients; events/s is per broadcast.
+    compressors = [zlib.compressobj(6, zlib.DEFLATED, -15) for _ in range(clients)]
+    t0 = time.perf_counter()
+    size = 0
+    for frame in frames:
+        data = frame.text(mode).encode()
+        for c in compressors:
+            out = c.compress(data) + c.flush(zlib.Z_SYNC_FLUSH)
+        size += len(out) - 4  # the 00 00 ff ff tail is stripped on the wire
+    report(f"permessage-deflate x{clients}", size, n, time.perf_counter() - t0, baseline)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--mode", type=StreamMode, default=StreamMode.full)
+    args = parser.parse_args()
+    main(args.runs, args.clients, args.mode)
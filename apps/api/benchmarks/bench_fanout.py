@@ -0,0 +1,98 @@
+"""WebSocket fan-out with slow subscribers: queued writers vs sequential sends.
+
+1,000 in-process subscribers watch one run; a few of them take ``--slow-ms``
+per frame, like clients on a bad network. Reports how long ``broadcast``
+blocks its caller and how quickly fast subscribers receive each message.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_fanout --subscribers 1000 --slow 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from websocket_manager import ConnectionManager
+
+RUN_ID = "bench-run"
+
+
+class FakeWebSocket:
+    def __init__(self, delay_s: float, latencies: list[float]) -> None:
+        self.delay_s = delay_s
+        self.latencies = latencies
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        if self.delay_s:
+            await asyncio.sleep(self.delay_s)
+        else:
+            sent_at = json.loads(data)["sent_at"]
+            self.latencies.append(time.perf_counter() - sent_at)
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+async def sequential_broadcast(sockets: list[FakeWebSocket], message: dict) -> None:
+    """The previous ConnectionManager.broadcast: one awaited send at a time."""
+    payload = json.dumps(message, default=str)
+    for ws in sockets:
+        await ws.send_text(payload)
+
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1e3 if values else float("nan")
+
+
+async def run(mode: str, subscribers: int, slow: int, slow_s: float, messages: int) -> None:
+    latencies: list[float] = []
+    sockets = [FakeWebSocket(slow_s if i < slow else 0.0, latencies) for i in range(subscribers)]
+    manager = ConnectionManager()
+    if mode == "queued":
+        for ws in sockets:
+            await manager.connect(RUN_ID, ws)
+
+    blocked: list[float] = []
+    t_start = time.perf_counter()
+    for i in range(messages):
+        message = {"type": "step_update", "step": {"step_id": f"s{i}"}, "sent_at": time.perf_counter()}
+        t0 = time.perf_counter()
+        if mode == "queued":
+            await manager.broadcast(RUN_ID, message)
+        else:
+            await sequential_broadcast(sockets, message)
+        blocked.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.001)  # ~1k msgs/s producer
+    producer_s = time.perf_counter() - t_start
+    await asyncio.sleep(0.05)  # let fast writers finish
+
+    print(
+        f"{mode:<10} producer {producer_s:6.2f}s   broadcast p50 {pct(blocked, .5):7.2f}ms "
+        f"p99 {pct(blocked, .99):7.2f}ms   fast-client delivery p50 {pct(latencies, .5):7.2f}ms "
+        f"p99 {pct(latencies, .99):7.2f}ms"
+    )
+    for ws in list(manager.rooms.get(RUN_ID, {})):
+        manager.disconnect(RUN_ID, ws)
+
+
+async def main(args: argparse.Namespace) -> None:
+    for mode in ("sequential", "queued"):
+        await run(mode, args.subscribers, args.slow, args.slow_ms / 1000, args.messages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--slow", type=int, default=5)
+    parser.add_argument("--slow-ms", type=float, default=50)
+    parser.add_argument("--messages", type=int, default=50)
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
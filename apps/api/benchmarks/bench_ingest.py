@@ -0,0 +1,77 @@
+"""Per-step ingestion cost: POST /api/steps vs POST /api/steps:batch.
+
+Drives the ASGI app in-process (requires ``httpx``), with one subscriber
+attached to every run so broadcasts are part of the measured path.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_ingest --steps 5000 --batch-size 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+from main import app, manager
+
+RUNS = 10
+
+
+class NullWebSocket:
+    """Stands in for a browser: accepts and discards every frame."""
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        pass
+
+
+def payloads(run_ids: list[str], total: int) -> list[dict]:
+    return [
+        {
+            "run_id": run_ids[i % len(run_ids)],
+            "name": f"step-{i}",
+            "type": "llm",
+            "input": {"prompt": "Summarize the following document. " * 20},
+        }
+        for i in range(total)
+    ]
+
+
+async def main(total: int, batch_size: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        run_ids = []
+        for _ in range(RUNS):
+            run = (await client.post("/api/runs", json={})).json()
+            run_ids.append(run["run_id"])
+            await manager.connect(run["run_id"], NullWebSocket())
+        body = payloads(run_ids, total)
+
+        t0 = time.perf_counter()
+        for item in body:
+            (await client.post("/api/steps", json=item)).raise_for_status()
+        single = (time.perf_counter() - t0) / total * 1e6
+
+        t0 = time.perf_counter()
+        for i in range(0, total, batch_size):
+            (await client.post("/api/steps:batch", json=body[i:i + batch_size])).raise_for_status()
+        batched = (time.perf_counter() - t0) / total * 1e6
+
+    print(f"single  {single:8.1f} us/step   {1e6 / single:>9,.0f} steps/s")
+    print(f"batch   {batched:8.1f} us/step   {1e6 / batched:>9,.0f} steps/s   (batch={batch_size})")
+    print(f"speedup {single / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main(args.steps, args.batch_size))
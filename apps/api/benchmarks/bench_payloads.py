@@ -0,0 +1,140 @@
+"""Memory per step and steps-list size: inline payloads vs. the payload store.
+
+Ingests ``--runs`` synthetic runs (``scenario_gen`` preset ``--scenario``,
+reseeded per run) into a fresh ``Database`` per configuration: payloads
+inline, in the in-memory payload store, and in the store zlib-compressed,
+each on the dict and the columnar step store. Runs differ in everything
+but their LLM steps' system prompts, which all runs share like one agent's
+would. Every step gets its own decoded copy of its payloads, as steps
+arriving over ``POST /api/steps:batch`` do.
+
+Reports traced bytes retained per step (payload store included), ingest
+rate, the size of one run's ``GET /api/runs/{run_id}/steps`` body and the
+time to serve ``GET /api/steps/{step_id}/payload`` for each of its steps.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_payloads --scenario synthetic_large --runs 5
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+import tracemalloc
+import uuid
+from dataclasses import replace
+
+from database import Database
+from models import Run, Step, StepStatus, StepType
+from payloads import BlobStore
+from scenario_gen import PRESETS, GeneratorConfig, generate
+from scenarios import ScenarioStep
+from serialization import dumps, join_array, loads
+
+CONFIGS = {
+    "inline": lambda: None,
+    "store": lambda: BlobStore(),
+    "store+zlib": lambda: BlobStore(compress=True),
+}
+
+
+def flatten(scenario: ScenarioStep) -> list[tuple[ScenarioStep, int]]:
+    """Steps of a scenario with the index of their parent (-1 for the root)."""
+    out: list[tuple[ScenarioStep, int]] = []
+    stack = [(scenario, -1)]
+    while stack:
+        step, parent = stack.pop()
+        out.append((step, parent))
+        stack.extend((child, len(out) - 1) for child in reversed(step.children))
+    return out
+
+
+def make_runs(config: GeneratorConfig, runs: int) -> list[list[tuple[ScenarioStep, int]]]:
+    """One tree per run, reseeded, with the first run's system prompts."""
+    trees = [flatten(generate(replace(config, seed=config.seed + k))) for k in range(runs)]
+    shared = list(dict.fromkeys(s.input_data["system"] for s, _ in trees[0] if "system" in s.input_data))
+    for tree in trees[1:]:
+        own: dict[str, str] = {}
+        for step, _ in tree:
+            prompt = step.input_data.get("system")
+            if prompt is not None:
+                if prompt not in own:
+                    own[prompt] = shared[len(own) % len(shared)]
+                step.input_data["system"] = own[prompt]
+    return trees
+
+
+Encoded = list[tuple[bytes, bytes]]
+
+
+def ingest(db: Database, tree: list[tuple[ScenarioStep, int]], encoded: Encoded) -> str:
+    """Write one run of ``tree``; returns the run id."""
+    run = db.create_run(Run())
+    ids = [str(uuid.uuid4()) for _ in tree]
+    now = "2026-01-01T00:00:00+00:00"
+    db.create_steps([
+        Step.model_construct(
+            step_id=ids[i], run_id=run.run_id, parent_step_id=ids[parent] if parent >= 0 else None,
+            name=step.name, type=StepType(step.type), status=StepStatus.completed,
+            started_at=now, ended_at=now, duration_ms=step.duration_ms,
+            tokens_prompt=step.tokens_prompt, tokens_completion=step.tokens_completion,
+            cost_usd=0.0, model=step.model, input=loads(input_), output=loads(output), error=None,
+        )
+        for i, ((step, parent), (input_, output)) in enumerate(zip(tree, encoded))
+    ])
+    return run.run_id
+
+
+def bench(columnar: bool, payloads, trees: list, encoded: list[Encoded]) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    db = Database(columnar, payloads)
+    before = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    run_ids = [ingest(db, tree, enc) for tree, enc in zip(trees, encoded)]
+    elapsed = time.perf_counter() - t0
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    step_ids = db.step_ids_for_run(run_ids[-1])
+    body = b'{"steps":%s,"version":%d,"epoch":"%s"}' % (
+        join_array([db.step_json_by_id(sid) for sid in step_ids]), db.steps_version(run_ids[-1]),
+        db.epoch.encode(),
+    )
+    t0 = time.perf_counter()
+    for sid in step_ids:
+        db.payload_json(sid)
+    fetch_s = time.perf_counter() - t0
+    steps = sum(len(tree) for tree in trees)
+    return {
+        "bytes_per_step": used / steps, "steps_per_s": steps / elapsed, "list_bytes": len(body),
+        "fetch_us": fetch_s / len(step_ids) * 1e6,
+        "blobs": payloads.stats() if payloads is not None else None,
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    label, config = PRESETS[args.scenario]
+    trees = make_runs(config, args.runs)
+    encoded = [[(dumps(s.input_data), dumps(s.output_data)) for s, _ in tree] for tree in trees]
+    steps = sum(len(tree) for tree in trees)
+    raw = sum(len(i) + len(o) for enc in encoded for i, o in enc)
+    print(f"{label}: {args.runs} runs, {steps:,} steps, {raw / steps:,.0f} B of payload JSON per step")
+    print(f"{'store':<8} {'payloads':<11} {'B/step':>8} {'steps/s':>9} {'list KB/run':>12} "
+          f"{'payload us':>11} {'blobs':>7} {'blob MB':>8}")
+    for columnar in (False, True):
+        for name, make in CONFIGS.items():
+            r = bench(columnar, make(), trees, encoded)
+            blobs = r["blobs"]
+            print(f"{'columns' if columnar else 'dict':<8} {name:<11} {r['bytes_per_step']:>8,.0f} "
+                  f"{r['steps_per_s']:>9,.0f} {r['list_bytes'] / 1e3:>12,.1f} {r['fetch_us']:>11.1f} "
+                  f"{blobs['blobs'] if blobs else '-':>7} "
+                  f"{blobs['stored_bytes'] / 1e6 if blobs else 0:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=list(PRESETS), default="synthetic_large")
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
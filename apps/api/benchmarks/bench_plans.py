@@ -0,0 +1,159 @@
+"""Steps emitted per second: compiled scenario plans vs. walking scenario trees.
+
+``legacy_run_simulation`` is the simulator as it was before plans. Every
+emit prices the step, validates a ``Step``, converts the type string,
+builds the ``StepError`` and encodes the whole step, payloads included,
+for both broadcasts. Two measurements are taken on each path:
+
+1. emit: ``--emit-runs`` runs of ``--scenario`` played one after another,
+   with no delays and no subscribers. This is the per-emit cost.
+2. loadgen: ``loadgen.py``'s generator with ``--runs`` runs at once, no
+   delays and ``--subscribers`` per run. Reports steps/s and latency.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_plans --scenario synthetic_large --runs 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import loadgen
+from database import db
+from models import Run, RunStatus, Scheduling, Step, StepError, StepStatus, StepType
+from plans import dependency_order, plan_for
+from pricing import rates
+from scenario_gen import PRESETS, register_presets
+from scenarios import SCENARIOS, ScenarioStep
+from simulator import COMPLETION_FIELDS, Scheduler, run_simulation
+from websocket_manager import manager
+
+
+# ── The simulator before plans ───────────────────────────────────────────────
+
+async def legacy_emit_step(
+    run_id: str, scenario_step: ScenarioStep, parent_step_id: Optional[str], time_scale: float,
+) -> str:
+    step_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc).isoformat()
+    step = Step(
+        step_id=step_id, run_id=run_id, parent_step_id=parent_step_id,
+        name=scenario_step.name, type=StepType(scenario_step.type), status=StepStatus.running,
+        started_at=now, tokens_prompt=scenario_step.tokens_prompt,
+        tokens_completion=scenario_step.tokens_completion,
+        cost_usd=rates.cost(scenario_step.tokens_prompt, scenario_step.tokens_completion, scenario_step.model, now),
+        model=scenario_step.model, input=scenario_step.input_data,
+    )
+    db.create_step(step)
+    await manager.broadcast_step(step, db.step_json(step))
+    await asyncio.sleep(scenario_step.delay_s * time_scale)
+    step.ended_at = datetime.now(timezone.utc).isoformat()
+    step.duration_ms = scenario_step.duration_ms
+    if scenario_step.should_fail:
+        step.status = StepStatus.failed
+        step.type = StepType.error
+        step.error = StepError(**scenario_step.error_data) if scenario_step.error_data else StepError(
+            message="Step failed unexpectedly",
+        )
+        step.output = {}
+    else:
+        step.status = StepStatus.completed
+        step.output = scenario_step.output_data
+    db.update_step(step)
+    await manager.broadcast_step(step, db.step_json(step), COMPLETION_FIELDS)
+    return step_id
+
+
+async def legacy_walk(
+    run_id: str, scenario_step: ScenarioStep, parent_step_id: Optional[str], scheduler: Scheduler,
+) -> str:
+    async with scheduler.slots:
+        step_id = await legacy_emit_step(run_id, scenario_step, parent_step_id, scheduler.time_scale)
+    children = dependency_order(scenario_step.children)
+    if not scheduler.concurrent(scenario_step):
+        for child in children:
+            await legacy_walk(run_id, child, step_id, scheduler)
+        return step_id
+
+    async def walk_after(child: ScenarioStep, deps: list[asyncio.Task]) -> None:
+        if deps:
+            await asyncio.wait(deps)
+        await legacy_walk(run_id, child, step_id, scheduler)
+
+    tasks: dict[str, list[asyncio.Task]] = {}
+    async with asyncio.TaskGroup() as group:
+        for child in children:
+            deps = [t for name in child.depends_on for t in tasks.get(name, ())]
+            tasks.setdefault(child.name, []).append(group.create_task(walk_after(child, deps)))
+    return step_id
+
+
+async def legacy_run_simulation(
+    run_id: str,
+    scenario_name: str,
+    scheduling: Scheduling = Scheduling.scenario,
+    max_concurrency: Optional[int] = None,
+    time_scale: float = 1.0,
+) -> None:
+    scheduler = Scheduler(scheduling, max_concurrency, time_scale)
+    root_step_id = await legacy_walk(run_id, SCENARIOS[scenario_name], None, scheduler)
+    run = db.get_run(run_id)
+    run.root_step_id = root_step_id
+    run.status = RunStatus.completed
+    run.updated_at = datetime.now(timezone.utc).isoformat()
+    db.update_run(run)
+    await manager.broadcast_run(run, db.run_json(run))
+
+
+# ── Measurements ─────────────────────────────────────────────────────────────
+
+async def bench_emit(simulate, scenario: str, runs: int) -> float:
+    before = len(db.steps)
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        run = db.create_run(Run())
+        await simulate(run.run_id, scenario, Scheduling.sequential, None, 0)
+    return (len(db.steps) - before) / (time.perf_counter() - t0)
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.scenario in PRESETS:
+        register_presets([args.scenario])
+    t0 = time.perf_counter()
+    steps = len(plan_for(args.scenario).steps)
+    print(f"compiled {args.scenario} ({steps:,} steps) in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+    paths = {"tree walk": legacy_run_simulation, "plans": run_simulation}
+    print(f"\nemit only: {args.emit_runs} sequential runs, no delays, no subscribers")
+    for label, simulate in paths.items():
+        rate = asyncio.run(bench_emit(simulate, args.scenario, args.emit_runs))
+        print(f"  {label:<10} {rate:>9,.0f} steps/s")
+
+    print(f"\nloadgen: {args.runs} runs at once, no delays, {args.subscribers} subscribers/run")
+    gen_args = argparse.Namespace(
+        runs=args.runs, rate=0, time_scale=0, subscribers=args.subscribers, scenarios=args.scenario,
+        scheduling=Scheduling.scenario.value, max_concurrency=None, seed=0,
+    )
+    for label, simulate in paths.items():
+        loadgen.run_simulation = simulate
+        report = asyncio.run(loadgen.generate(gen_args))
+        latency = report["latency_ms"]
+        print(f"  {label:<10} {report['steps_per_s']:>9,.0f} steps/s   "
+              f"latency p50 {latency['p50']:.2f} ms  p99 {latency['p99']:.2f} ms")
+    loadgen.run_simulation = run_simulation
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", default="synthetic_large")
+    parser.add_argument("--emit-runs", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--subscribers", type=int, default=1)
+    logging.disable(logging.INFO)
+    main(parser.parse_args())
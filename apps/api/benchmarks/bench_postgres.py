@@ -0,0 +1,326 @@
+"""Postgres store: connect retry, bulk ingest, hydration and paging past
+the hydration horizon.
+
+Runs against ``DATABASE_URL`` when it points at Postgres (``docker compose
+up postgres`` provisions one; the benchmark works in its own schema and
+drops it afterwards). Otherwise it runs the store's own SQL on an
+in-process stand-in for asyncpg backed by SQLite, translated just enough
+(``$n`` parameters, ``ANY``, ``@>``, staging tables); the stand-in also
+refuses the first connections to exercise the retry.
+
+1. ``start()`` (through refused connections on the stand-in).
+2. Ingests ``--runs`` runs of ``--steps`` steps (bulk create, then each
+   completed) and reports the caller rate and the COPY/upsert flush time.
+3. Restarts with ``--hydrate`` runs loaded and checks the loaded steps and
+   ``stats()`` (archived totals summed in SQL) against the writer's.
+4. Pages through every run with ``load_runs``, newest first and back, with
+   and without a filter, checks the order against the writer's index and
+   reports page latency in memory and past the horizon.
+5. Loads one archived run with ``load_run`` and rechecks its steps and
+   the stats.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_postgres --runs 2000 --hydrate 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+import postgres_store
+from database import Database
+from models import Run, RunMetadata, RunStatus, Step, StepStatus, StepType, SystemType
+from payloads import BlobStore
+from postgres_store import PostgresDatabase
+from serialization import loads
+
+# ── In-process stand-in ──────────────────────────────────────────────────
+
+_TIMESTAMPS = ("created_at", "updated_at", "started_at", "ended_at")
+
+
+def translate(query: str) -> str:
+    """The store's Postgres SQL in the SQLite dialect."""
+    query = re.sub(r"ALTER TABLE \w+ ADD COLUMN IF NOT EXISTS [^;]+;", "", query)
+    query = re.sub(
+        r"CREATE TEMP TABLE IF NOT EXISTS (\w+) \(LIKE (\w+)\) ON COMMIT DELETE ROWS",
+        r"CREATE TEMP TABLE IF NOT EXISTS \1 AS SELECT * FROM \2 WHERE 0", query,
+    )
+    # SQLite needs a WHERE to tell an upsert's ON CONFLICT from a join.
+    query = re.sub(r"FROM (\w+_stage) ON CONFLICT", r"FROM \1 WHERE true ON CONFLICT", query)
+    query = re.sub(r"= ANY\(\$(\d+)::text\[\]\)", r"IN (SELECT value FROM json_each(?\1))", query)
+    query = re.sub(r"(\S+) @> \$(\d+)::jsonb", r"jsonb_contains(\1, ?\2)", query)
+    return re.sub(r"\$(\d+)", r"?\1", query)
+
+
+def _param(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return json.dumps(value)
+    return value
+
+
+def _record(cursor: sqlite3.Cursor, row: tuple) -> dict:
+    record = {}
+    for (name, *_), value in zip(cursor.description, row):
+        if name in _TIMESTAMPS and value is not None:
+            value = datetime.fromisoformat(value)
+        record[name] = value
+    return record
+
+
+def _jsonb_contains(container: str, contained: str) -> bool:
+    have = json.loads(container) if container else []
+    return all(item in have for item in json.loads(contained))
+
+
+class StandInConnection:
+    """The slice of ``asyncpg.Connection`` the store uses."""
+
+    def __init__(self, path: str) -> None:
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.row_factory = _record
+        self.conn.create_function("jsonb_contains", 2, _jsonb_contains)
+
+    async def execute(self, query: str, *args) -> None:
+        if not args and query.count(";") > 1:
+            self.conn.executescript(translate(query))
+        else:
+            self.conn.execute(translate(query), [_param(a) for a in args])
+
+    async def fetch(self, query: str, *args) -> list[dict]:
+        return self.conn.execute(translate(query), [_param(a) for a in args]).fetchall()
+
+    async def fetchrow(self, query: str, *args):
+        return self.conn.execute(translate(query), [_param(a) for a in args]).fetchone()
+
+    async def copy_records_to_table(self, table: str, *, records: list[tuple], columns: tuple[str, ...]) -> None:
+        self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [[_param(v) for v in record] for record in records],
+        )
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        # ON COMMIT DELETE ROWS
+        for row in self.conn.execute("SELECT name FROM temp.sqlite_master WHERE type = 'table'").fetchall():
+            self.conn.execute(f"DELETE FROM temp.{row['name']}")
+
+    async def close(self) -> None:
+        self.conn.close()
+
+
+class StandInPool:
+    """One connection, handed to one coroutine at a time."""
+
+    def __init__(self, path: str) -> None:
+        self.connection = StandInConnection(path)
+        self.lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self.lock:
+            yield self.connection
+
+    async def close(self) -> None:
+        await self.connection.close()
+
+
+class StandInAsyncpg:
+    """Replaces the ``asyncpg`` module inside postgres_store."""
+
+    CannotConnectNowError = asyncpg.CannotConnectNowError
+
+    def __init__(self, path: str, refuse: int = 0) -> None:
+        self.path = path
+        self.refuse = refuse
+        self.refused = 0
+
+    async def connect(self, dsn: str) -> StandInConnection:
+        if self.refused < self.refuse:
+            self.refused += 1
+            raise ConnectionRefusedError(111, "Connection refused (stand-in)")
+        return StandInConnection(self.path)
+
+    async def create_pool(self, dsn: str, **_) -> StandInPool:
+        return StandInPool(self.path)
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────
+
+def make_runs(db: Database, runs: int, steps: int) -> None:
+    """Runs one second apart, varied enough to filter on, each with
+    ``steps`` steps created in bulk and then completed one by one."""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    types = list(SystemType)
+    for i in range(runs):
+        run = db.create_run(Run(
+            created_at=(start + timedelta(seconds=i)).isoformat(),
+            system_type=types[i % len(types)],
+            status=RunStatus.completed if i % 3 else RunStatus.failed,
+            metadata=RunMetadata(tags=["bench", "even" if i % 2 == 0 else "odd"]),
+        ))
+        batch = db.create_steps([
+            Step(
+                step_id=str(uuid.uuid4()), run_id=run.run_id, name=f"step-{k}",
+                type=StepType.llm if k % 2 else StepType.tool,
+                started_at=(start + timedelta(seconds=i, milliseconds=k)).isoformat(),
+                tokens_prompt=500, tokens_completion=200, cost_usd=0.001 * k,
+                input={"system": "s" * 2000, "prompt": f"question {k}"},
+            )
+            for k in range(steps)
+        ])
+        for step in batch:
+            step.status = StepStatus.completed if step.name != "step-3" else StepStatus.failed
+            step.output = {"completion": "y" * 200}
+            step.duration_ms = 40
+            db.update_step(step)
+
+
+def same_stats(a: dict, b: dict) -> bool:
+    def rounded(stats: dict) -> dict:
+        return {k: round(v, 6) if k == "cost_usd" else v for k, v in stats.items()}
+    return (
+        rounded(a["global"]) == rounded(b["global"])
+        and {k: rounded(v) for k, v in a["by_system_type"].items()}
+        == {k: rounded(v) for k, v in b["by_system_type"].items()}
+    )
+
+
+def same_steps(a: Database, b: Database, run_id: str) -> bool:
+    ids = a.step_ids_for_run(run_id)
+    return ids == b.step_ids_for_run(run_id) and all(
+        loads(a.resolved_step_json(sid)) == loads(b.resolved_step_json(sid)) for sid in ids
+    )
+
+
+async def walk(
+    db: PostgresDatabase, page: int, **filters,
+) -> tuple[list[str], list[str], list[float], list[float]]:
+    """Every run newest first, then back again oldest to newest; with the
+    latency of pages served from memory and of pages reaching past the
+    horizon (holding runs that are not loaded)."""
+    down: list[str] = []
+    in_memory: list[float] = []
+    archived: list[float] = []
+    before = None
+    while True:
+        t0 = time.perf_counter()
+        runs = await db.load_runs(page, before=before, **filters)
+        elapsed = time.perf_counter() - t0
+        if not runs:
+            break
+        (in_memory if all(r.run_id in db.runs for r in runs) else archived).append(elapsed)
+        down += [r.run_id for r in runs]
+        before = (runs[-1].created_at, runs[-1].run_id)
+    up = down[-1:]
+    after = before
+    while True:
+        runs = await db.load_runs(page, after=after, **filters)
+        if not runs:
+            break
+        up += [r.run_id for r in reversed(runs)]
+        after = (runs[0].created_at, runs[0].run_id)
+    return down, up, in_memory, archived
+
+
+def percentile_ms(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[max(0, int(len(values) * p) - 1)] * 1e3
+
+
+async def bench(dsn: str, args: argparse.Namespace, stand_in: StandInAsyncpg | None) -> None:
+    t0 = time.perf_counter()
+    writer = PostgresDatabase(dsn, hydrate_runs=args.hydrate, payloads=BlobStore())
+    await writer.start()
+    refused = f" after {stand_in.refused} refused connections" if stand_in else ""
+    print(f"start     {time.perf_counter() - t0:.2f}s{refused}")
+
+    t0 = time.perf_counter()
+    make_runs(writer, args.runs, args.steps)
+    caller_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    await writer.flush()
+    flush_s = time.perf_counter() - t0
+    total = args.runs * args.steps
+    print(f"ingest    {total:,} steps: caller {total / caller_s:,.0f} steps/s, flush {flush_s:.2f}s "
+          f"({total / (caller_s + flush_s):,.0f} steps/s durable)")
+    expected = writer.stats()
+    await writer.close()
+
+    reader = PostgresDatabase(dsn, hydrate_runs=args.hydrate, payloads=BlobStore())
+    t0 = time.perf_counter()
+    await reader.start()
+    newest = writer.list_runs(1)[0].run_id
+    print(f"hydrate   {len(reader.runs):,} runs, {len(reader.steps):,} steps in {time.perf_counter() - t0:.2f}s; "
+          f"steps match: {same_steps(writer, reader, newest)}; stats match: {same_stats(reader.stats(), expected)}")
+
+    order = [r.run_id for r in writer.list_runs(args.runs + 1)]
+    for label, filters in (("all", {}), ("filtered", {"status": RunStatus.failed, "tags": ["even"]})):
+        want = [r.run_id for r in writer.list_runs(args.runs + 1, **filters)] if filters else order
+        down, up, in_memory, archived = await walk(reader, args.page, **filters)
+        print(f"paging    {label:<8} {len(down):,} runs; order matches: {down == want and up == want[::-1]}; "
+              f"page p50 {percentile_ms(in_memory, 0.5):.2f} ms in memory, "
+              f"{percentile_ms(archived, 0.5):.2f} ms past the horizon "
+              f"(p99 {percentile_ms(archived, 0.99):.2f} ms)")
+
+    oldest = order[-1]
+    t0 = time.perf_counter()
+    await reader.load_run(oldest)
+    print(f"load_run  archived run in {(time.perf_counter() - t0) * 1e3:.1f} ms; "
+          f"steps match: {same_steps(writer, reader, oldest)}; stats match: {same_stats(reader.stats(), expected)}")
+    await reader.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    url = os.getenv("DATABASE_URL", "")
+    if url.split("://")[0].split("+")[0] in ("postgres", "postgresql"):
+        scheme, _, rest = url.partition("://")
+        dsn = f"{scheme.split('+')[0]}://{rest}"
+        schema = f"uaop_bench_{os.getpid()}"
+        admin = await asyncpg.connect(dsn)
+        await admin.execute(f"CREATE SCHEMA {schema}")
+        try:
+            print(f"Postgres at {rest.rpartition('@')[2]}, schema {schema}")
+            # asyncpg passes unknown DSN parameters on as server settings.
+            await bench(f"{dsn}{'&' if '?' in dsn else '?'}search_path={schema}", args, None)
+        finally:
+            await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+            await admin.close()
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        stand_in = StandInAsyncpg(os.path.join(tmp, "standin.db"), refuse=2)
+        postgres_store.asyncpg = stand_in
+        print("In-process stand-in (set DATABASE_URL=postgresql://... for a real server)")
+        await bench("postgresql://stand-in/uaop", args, stand_in)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--hydrate", type=int, default=500)
+    parser.add_argument("--page", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,91 @@
+"""Bulk re-pricing: vectorized cost columns and the in-memory store.
+
+Prices ``--columns`` synthetic steps (mixed models, start times over a year,
+quarterly rate changes) with ``RateTable.price`` and checks a sample against
+the per-step ``RateTable.cost``. Then fills a ``Database`` with
+``--store-steps`` steps, changes a rate and times ``Database.reprice``.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_pricing --columns 10000000 --store-steps 500000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from database import Database
+from models import Run, Step, StepType
+from pricing import RateTable
+
+MODELS = ["gpt-4", "claude-3.5", None, "unknown-model"]
+
+
+def rate_table() -> RateTable:
+    rates = RateTable.with_defaults()
+    for quarter, month in enumerate(("01", "04", "07", "10")):
+        for model, (prompt, completion) in (("gpt-4", (0.03, 0.06)), ("claude-3.5", (0.003, 0.015))):
+            scale = 1 - 0.1 * quarter
+            rates.set_rate(model, prompt * scale, completion * scale, f"2026-{month}-01T00:00:00Z")
+    return rates
+
+
+def columns(n: int, seed: int = 7) -> tuple[list, np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    models = [MODELS[i] for i in rng.integers(0, len(MODELS), n).tolist()]
+    seconds = rng.integers(0, 365 * 86400, n)
+    started_at = np.datetime_as_string(np.datetime64("2026-01-01T00:00:00") + seconds, unit="s")
+    return models, started_at, rng.integers(0, 8000, n), rng.integers(0, 2000, n)
+
+
+def bench_columns(n: int) -> None:
+    rates = rate_table()
+    models, started_at, prompt, completion = columns(n)
+    t0 = time.perf_counter()
+    costs = rates.price(models, started_at, prompt, completion)
+    elapsed = time.perf_counter() - t0
+    print(f"price {n:,} steps: {elapsed:.2f} s ({n / elapsed:,.0f} steps/s)")
+
+    for i in np.random.default_rng(1).integers(0, n, 1000).tolist():
+        expected = rates.cost(int(prompt[i]), int(completion[i]), models[i], str(started_at[i]))
+        assert abs(costs[i] - expected) < 1e-9, (i, costs[i], expected)
+    print("  1,000 sampled rows match the per-step cost")
+
+
+def bench_store(n: int, per_run: int = 100) -> None:
+    db = Database()
+    models, started_at, prompt, completion = columns(n, seed=11)
+    rates = rate_table()
+    for r in range(0, n, per_run):
+        run = db.create_run(Run())
+        db.create_steps([
+            Step(
+                run_id=run.run_id, name="llm-call", type=StepType.llm, model=models[i],
+                started_at=str(started_at[i]), tokens_prompt=int(prompt[i]),
+                tokens_completion=int(completion[i]),
+                cost_usd=rates.cost(int(prompt[i]), int(completion[i]), models[i], str(started_at[i])),
+            )
+            for i in range(r, min(r + per_run, n))
+        ])
+    before = db.stats()["global"]["cost_usd"]
+
+    rates.set_rate("default", 0.02, 0.05, "2026-06-01")
+    t0 = time.perf_counter()
+    changed = db.reprice(rates)
+    elapsed = time.perf_counter() - t0
+    after = db.stats()["global"]["cost_usd"]
+    exact = round(sum(s.cost_usd for s in db.steps.values()), 6)
+    assert abs(after - exact) < 1e-6, (after, exact)
+    print(f"reprice store of {n:,} steps: {len(changed):,} changed in {elapsed:.2f} s "
+          f"({n / elapsed:,.0f} steps/s); global cost {before:,.2f} -> {after:,.2f} USD")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--columns", type=int, default=10_000_000)
+    parser.add_argument("--store-steps", type=int, default=500_000)
+    args = parser.parse_args()
+    bench_columns(args.columns)
+    bench_store(args.store_steps)
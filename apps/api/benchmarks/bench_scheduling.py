@@ -0,0 +1,66 @@
+"""Simulated wall time and step throughput per scheduling mode.
+
+Runs every demo scenario once per ``Scheduling`` mode with its delays scaled
+by ``--scale`` and reports wall time against the scenario's serial delay
+sum. Then starts ``--runs`` concurrent runs of every scenario with delays
+zeroed and reports steps emitted per second, which is the load concurrent
+fan-out puts on the step/broadcast pipeline.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_scheduling --scale 0.1 --runs 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+
+from database import db
+from models import Run, Scheduling
+from scenarios import SCENARIOS, ScenarioStep
+from simulator import run_simulation
+
+
+def delay_sum(step: ScenarioStep) -> float:
+    return step.delay_s + sum(delay_sum(child) for child in step.children)
+
+
+async def bench_wall_time(scale: float) -> None:
+    modes = list(Scheduling)
+    print(f"wall time, delays x{scale}")
+    print(f"{'scenario':<20} {'serial s':>9}" + "".join(f" {m.value:>11}" for m in modes))
+    for name, scenario in SCENARIOS.items():
+        times = []
+        for mode in modes:
+            run = db.create_run(Run())
+            t0 = time.perf_counter()
+            await run_simulation(run.run_id, name, mode, time_scale=scale)
+            times.append(time.perf_counter() - t0)
+        print(f"{name:<20} {delay_sum(scenario) * scale:>9.2f}" + "".join(f" {t:>11.2f}" for t in times))
+
+
+async def bench_throughput(runs: int) -> None:
+    print(f"\n{runs} concurrent runs per scenario, delays zeroed")
+    print(f"{'mode':<11} {'steps':>8} {'seconds':>8} {'steps/s':>9}")
+    for mode in Scheduling:
+        before = len(db.steps)
+        t0 = time.perf_counter()
+        run_ids = [db.create_run(Run()).run_id for _ in range(runs) for _ in SCENARIOS]
+        await asyncio.gather(*(
+            run_simulation(run_id, name, mode, time_scale=0) for run_id, name in zip(run_ids, list(SCENARIOS) * runs)
+        ))
+        elapsed = time.perf_counter() - t0
+        steps = len(db.steps) - before
+        print(f"{mode.value:<11} {steps:>8,} {elapsed:>8.2f} {steps / elapsed:>9,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=0.1)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    asyncio.run(bench_wall_time(args.scale))
+    asyncio.run(bench_throughput(args.runs))
@@ -0,0 +1,70 @@
+"""Serialize-once vs per-call model_dump for broadcasts and /steps polls.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_serialization
+"""
+from __future__ import annotations
+
+import json
+import time
+import tracemalloc
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+
+from database import Database
+from models import Step, StepStatus, StepType
+from serialization import envelope, join_array
+
+STEPS = 50
+
+
+def build() -> tuple[Database, list[Step]]:
+    db = Database()
+    steps = []
+    for i in range(STEPS):
+        step = Step(
+            run_id="bench", name=f"LLM call {i}", type=StepType.llm,
+            status=StepStatus.completed, tokens_prompt=1200, tokens_completion=400,
+            input={"prompt": "You are a helpful agent. " * 80, "tools": [{"name": f"t{j}"} for j in range(10)]},
+            output={"completion": "Here is the answer. " * 40},
+        )
+        steps.append(db.create_step(step))
+    return db, steps
+
+
+def measure(name: str, fn: Callable[[], object], repeat: int) -> None:
+    fn()  # warm caches
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - t0) / repeat * 1e6
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<34} {per_call:>9.1f} us/op   peak alloc {peak / 1024:>8.1f} KiB")
+
+
+def main() -> None:
+    db, steps = build()
+    step = steps[0]
+
+    # Previous broadcast: model_dump + json.dumps per message.
+    measure("broadcast: model_dump+json.dumps",
+            lambda: json.dumps({"type": "step_update", "step": step.model_dump()}, default=str), 2000)
+    measure("broadcast: cached encoding",
+            lambda: envelope("step_update", "step", db.step_json(step)).decode(), 2000)
+
+    # Previous /steps handler: model_dump per step, then FastAPI's encoder.
+    measure("/steps: model_dump+jsonable_encoder",
+            lambda: json.dumps(jsonable_encoder({"steps": [s.model_dump() for s in db.get_steps_for_run("bench")]})).encode(),
+            200)
+    measure("/steps: cached encodings",
+            lambda: b'{"steps":' + join_array([db.step_json(s) for s in db.get_steps_for_run("bench")]) + b"}",
+            200)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Ingest cost on the event loop, commit lag and read latency: in-memory vs
+SQLite store.
+
+Steps are written run by run from a coroutine that yields to the loop
+between runs, as request handlers do, while a ticker task measures how
+late the loop gets back to it (``asyncio.sleep(0)`` lag). Reports the
+caller rate (until the last write returns), the loop lag p99/max during
+ingest, the commit lag (from the last write until ``flush()`` returns,
+i.e. how far the writer trails) and the durable rate.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_sqlite --steps 100000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+from database import Database
+from models import Run, Step, StepStatus, StepType
+from payloads import BlobStore
+from sqlite_store import SQLiteDatabase
+
+STEPS_PER_RUN = 20
+
+
+async def ingest(db: Database, total_steps: int) -> list[str]:
+    """Create and complete ``total_steps`` steps, as emit_step does,
+    yielding to the loop after each run."""
+    run_ids = []
+    for _ in range(total_steps // STEPS_PER_RUN):
+        run = db.create_run(Run())
+        run_ids.append(run.run_id)
+        for i in range(STEPS_PER_RUN):
+            step = db.create_step(Step(
+                step_id=str(uuid.uuid4()), run_id=run.run_id, name=f"step-{i}",
+                type=StepType.llm, tokens_prompt=500, tokens_completion=200,
+                input={"system": "s" * 2000, "prompt": "x" * 400},
+            ))
+            step.status = StepStatus.completed
+            step.output = {"completion": "y" * 200}
+            db.update_step(step)
+        await asyncio.sleep(0)
+    return run_ids
+
+
+async def tick(lags: list[float], done: asyncio.Event) -> None:
+    """Record how long each pass around the loop takes."""
+    while not done.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0)
+        lags.append(time.perf_counter() - t0)
+
+
+def p99_read_us(db: Database, run_ids: list[str], samples: int = 5000) -> float:
+    timings = []
+    stride = max(1, len(run_ids) // samples)
+    for run_id in run_ids[::stride][:samples]:
+        t0 = time.perf_counter()
+        db.get_steps_for_run(run_id)
+        timings.append((time.perf_counter() - t0) * 1e6)
+    timings.sort()
+    return timings[int(len(timings) * 0.99) - 1]
+
+
+async def bench(name: str, db: Database, total_steps: int) -> None:
+    lags: list[float] = []
+    done = asyncio.Event()
+    ticker = asyncio.create_task(tick(lags, done))
+    t0 = time.perf_counter()
+    run_ids = await ingest(db, total_steps)
+    caller_s = time.perf_counter() - t0
+    done.set()
+    await ticker
+    if isinstance(db, SQLiteDatabase):
+        assert await asyncio.to_thread(db.flush)
+    durable_s = time.perf_counter() - t0
+    lags.sort()
+    print(
+        f"{name:<8} caller {total_steps / caller_s:>9,.0f} steps/s   "
+        f"loop lag p99 {lags[int(len(lags) * 0.99) - 1] * 1e3:>6.2f} ms "
+        f"max {lags[-1] * 1e3:>6.2f} ms   "
+        f"commit lag {(durable_s - caller_s) * 1e3:>7.0f} ms   "
+        f"durable {total_steps / durable_s:>9,.0f} steps/s   "
+        f"read p99 {p99_read_us(db, run_ids):>6.1f} us"
+    )
+    await db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=100_000)
+    args = parser.parse_args()
+
+    asyncio.run(bench("memory", Database(payloads=BlobStore()), args.steps))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        asyncio.run(bench("sqlite", SQLiteDatabase(path, payloads=BlobStore()), args.steps))
+        t0 = time.perf_counter()
+        reopened = SQLiteDatabase(path)
+        print(f"reload   {len(reopened.steps):,} steps in {time.perf_counter() - t0:.2f}s")
+        asyncio.run(reopened.close())
+
+
+if __name__ == "__main__":
+    main()
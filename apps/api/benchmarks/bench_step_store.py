@@ -0,0 +1,138 @@
+"""Step store memory and scan throughput: Step models vs. columns.
+
+Fills a ``StepDict`` (the ``dict[str, Step]`` store) and a ``StepColumns``
+with the same ``--steps`` steps, then reports traced bytes per step, insert
+and point-read rates, a full scan (cost and tokens of completed LLM steps)
+and a ``Database.reprice`` of every step on each store.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_step_store --steps 500000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from database import Database
+from models import Run, Step, StepStatus, StepType
+from pricing import RateTable
+from step_store import StepColumns, StepDict
+
+NAMES = ["Plan", "Search Flights", "Analyze Options", "Book Flight", "Summarize", "Final Answer"]
+MODELS = [None, "gpt-4", "claude-3.5"]
+
+
+def make_steps(n: int, per_run: int = 50) -> list[Step]:
+    rng = random.Random(3)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    steps: list[Step] = []
+    run_steps: list[str] = []
+    for i in range(n):
+        if i % per_run == 0:
+            run_id, run_steps = f"run-{i // per_run:08d}", []
+        started = start + timedelta(milliseconds=37 * i)
+        step_type = rng.choice((StepType.llm, StepType.tool, StepType.plan))
+        step = Step(
+            run_id=run_id, parent_step_id=rng.choice(run_steps) if run_steps else None,
+            name=rng.choice(NAMES), type=step_type,
+            status=StepStatus.completed if rng.random() < 0.95 else StepStatus.failed,
+            started_at=started.isoformat(),
+            ended_at=(started + timedelta(milliseconds=rng.randrange(50, 3000))).isoformat(),
+            duration_ms=rng.randrange(50, 3000),
+            tokens_prompt=rng.randrange(0, 4000) if step_type == StepType.llm else 0,
+            tokens_completion=rng.randrange(0, 1000) if step_type == StepType.llm else 0,
+            cost_usd=round(rng.random() / 10, 6), model=rng.choice(MODELS),
+            input={"prompt": f"Step {i}: compare the options and pick one"},
+            output={"completion": "Option B is the best value", "score": rng.random()},
+        )
+        steps.append(step)
+        run_steps.append(step.step_id)
+    return steps
+
+
+def fill(store, steps: list[Step]) -> tuple[float, int]:
+    """Insert steps as the database would; returns (seconds, traced bytes)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    for step in steps:
+        # Each store keeps its own copy, as a stored step outlives the request.
+        store[step.step_id] = step.model_copy(deep=True) if isinstance(store, StepDict) else step
+    elapsed = time.perf_counter() - t0
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return elapsed, used
+
+
+def scan_dict(store: StepDict) -> tuple[float, int]:
+    cost, tokens = 0.0, 0
+    for s in store.values():
+        if s.type == StepType.llm and s.status == StepStatus.completed:
+            cost += s.cost_usd
+            tokens += s.tokens_prompt + s.tokens_completion
+    return cost, tokens
+
+
+def scan_columns(store: StepColumns) -> tuple[float, int]:
+    mask = (store.column("type") == list(StepType).index(StepType.llm)) & (
+        store.column("status") == list(StepStatus).index(StepStatus.completed)
+    )
+    tokens = store.column("tokens_prompt")[mask].sum() + store.column("tokens_completion")[mask].sum()
+    return float(store.column("cost_usd")[mask].sum()), int(tokens)
+
+
+def timed(fn, *args, reps: int = 3):
+    best, result = float("inf"), None
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def bench_reprice(steps: list[Step], columnar: bool) -> float:
+    db = Database(columnar)
+    for run_id in dict.fromkeys(s.run_id for s in steps):
+        db.create_run(Run(run_id=run_id))
+    db.create_steps([s.model_copy() for s in steps])
+    rates = RateTable.with_defaults()
+    rates.set_rate("default", 0.02, 0.05)
+    t0 = time.perf_counter()
+    db.reprice(rates)
+    return time.perf_counter() - t0
+
+
+def main(n: int) -> None:
+    steps = make_steps(n)
+    stores = {"dict": StepDict(), "columns": StepColumns()}
+    print(f"{n:,} steps")
+    print(f"{'store':<8} {'B/step':>8} {'insert/s':>11} {'get/s':>11} {'scan steps/s':>14} {'reprice s':>10}")
+    results = {}
+    sample = [s.step_id for s in random.Random(5).sample(steps, min(n, 20_000))]
+    for name, store in stores.items():
+        insert_s, used = fill(store, steps)
+        get_s, _ = timed(lambda: [store[sid] for sid in sample])
+        scan_s, results[name] = timed(scan_dict if name == "dict" else scan_columns, store)
+        reprice_s = bench_reprice(steps, columnar=name == "columns")
+        print(f"{name:<8} {used / n:>8,.0f} {n / insert_s:>11,.0f} {len(sample) / get_s:>11,.0f} "
+              f"{n / scan_s:>14,.0f} {reprice_s:>10.2f}")
+    (cost_a, tokens_a), (cost_b, tokens_b) = results["dict"], results["columns"]
+    assert tokens_a == tokens_b and np.isclose(cost_a, cost_b), (results)
+    for sid in sample[:1000]:
+        assert stores["dict"][sid].model_dump() == stores["columns"][sid].model_dump()
+    print("scan results agree; sampled steps materialize identically")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=500_000)
+    args = parser.parse_args()
+    main(args.steps)
@@ -0,0 +1,69 @@
+"""Step lookup latency as the in-memory store grows.
+
+Run from ``apps/api``::
+
+    python -m benchmarks.bench_store --max-steps 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import uuid
+
+from database import Database
+from models import Step, StepType
+
+STEPS_PER_RUN = 20
+
+
+def populate(db: Database, total_steps: int) -> list[str]:
+    """Fill ``db`` with runs of STEPS_PER_RUN chained steps; return run ids."""
+    run_ids: list[str] = []
+    for r in range(total_steps // STEPS_PER_RUN):
+        run_id = str(uuid.uuid4())
+        run_ids.append(run_id)
+        parent = None
+        for i in range(STEPS_PER_RUN):
+            step = Step.model_construct(
+                step_id=str(uuid.uuid4()),
+                run_id=run_id,
+                parent_step_id=parent,
+                name=f"step-{i}",
+                type=StepType.tool,
+                started_at=f"2026-01-01T00:{r % 60:02d}:{i:02d}+00:00",
+            )
+            db.create_step(step)
+            parent = step.step_id
+    return run_ids
+
+
+def time_lookups(db: Database, run_ids: list[str], samples: int = 2000) -> tuple[float, float]:
+    """Return (median, p99) microseconds for get_steps_for_run."""
+    stride = max(1, len(run_ids) // samples)
+    timings = []
+    for run_id in run_ids[::stride][:samples]:
+        t0 = time.perf_counter()
+        db.get_steps_for_run(run_id)
+        timings.append((time.perf_counter() - t0) * 1e6)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-steps", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    size = 1_000
+    print(f"{'steps':>10} {'median_us':>10} {'p99_us':>10}")
+    while size <= args.max_steps:
+        db = Database()
+        run_ids = populate(db, size)
+        median, p99 = time_lookups(db, run_ids)
+        print(f"{size:>10} {median:>10.1f} {p99:>10.1f}")
+        size *= 10
+
+
+if __name__ == "__main__":
+    main()
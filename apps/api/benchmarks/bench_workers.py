@@ -0,0 +1,131 @@
+"""Cross-worker broadcast delivery over the pub/sub bus.
+
+Starts ``--workers`` uvicorn processes sharing one broadcast bus, attaches
+``--clients`` WebSocket subscribers to a run on *every* worker, then posts
+steps in batches to all workers concurrently. Checks that every client
+receives every step and that every worker's REST API returns them all, and
+reports end-to-end delivery throughput.
+
+Run from ``apps/api`` (needs ``httpx`` and ``websockets``)::
+
+    python -m benchmarks.bench_workers --workers 4 --steps 20000
+    python -m benchmarks.bench_workers --bus redis://localhost:6379/0
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+
+
+def spawn(workers: int, base_port: int, bus: str) -> list[subprocess.Popen]:
+    env = {**os.environ, "BROADCAST_BUS_URL": bus, "DATABASE_URL": ""}
+    return [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(base_port + i),
+             "--log-level", "warning"],
+            env=env,
+        )
+        for i in range(workers)
+    ]
+
+
+async def wait_healthy(client: httpx.AsyncClient, urls: list[str]) -> None:
+    for url in urls:
+        for _ in range(100):
+            try:
+                (await client.get(f"{url}/api/health")).raise_for_status()
+                break
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError(f"worker at {url} did not start")
+
+
+async def subscriber(url: str, run_id: str, total: int, done: list[float]) -> set[str]:
+    seen: set[str] = set()
+    async with websockets.connect(f"{url}/ws/runs/{run_id}", max_size=None) as ws:
+        done.append(0.0)  # connected
+        while len(seen) < total:
+            msg = json.loads(await ws.recv())
+            if msg["type"] == "step_batch":
+                seen.update(s["step_id"] for s in msg["steps"])
+            elif msg["type"] == "step_update":
+                seen.add(msg["step"]["step_id"])
+    done.append(time.perf_counter())
+    return seen
+
+
+async def main(workers: int, clients: int, total: int, batch: int, base_port: int, bus: str) -> None:
+    urls = [f"http://127.0.0.1:{base_port + i}" for i in range(workers)]
+    async with httpx.AsyncClient(timeout=30) as client:
+        await wait_healthy(client, urls)
+        await asyncio.sleep(0.5)  # let every worker join the bus
+        run_id = (await client.post(f"{urls[0]}/api/runs", json={})).json()["run_id"]
+        await asyncio.sleep(0.2)
+
+        connected: list[float] = []
+        tasks = [
+            asyncio.create_task(subscriber(url.replace("http", "ws"), run_id, total, connected))
+            for url in urls for _ in range(clients)
+        ]
+        while len(connected) < len(tasks):
+            await asyncio.sleep(0.01)
+
+        bodies = [
+            [
+                {"run_id": run_id, "name": f"step-{j}", "type": "tool", "input": {"i": j}}
+                for j in range(i, min(i + batch, total))
+            ]
+            for i in range(0, total, batch)
+        ]
+
+        async def ingest(worker: int) -> None:
+            # One sequential producer per worker, all running concurrently.
+            for body in bodies[worker::workers]:
+                (await client.post(f"{urls[worker]}/api/steps:batch", json=body)).raise_for_status()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(ingest(w) for w in range(workers)))
+        ingested = time.perf_counter() - t0
+        results = await asyncio.wait_for(asyncio.gather(*tasks), timeout=120)
+        delivered = max(connected) - t0
+
+        assert all(len(r) == total for r in results), [len(r) for r in results]
+        for url in urls:
+            steps = (await client.get(f"{url}/api/runs/{run_id}/steps")).json()["steps"]
+            assert len(steps) == total, f"{url} has {len(steps)}/{total} steps"
+
+    print(f"bus={bus} workers={workers} subscribers={len(tasks)} steps={total} batch={batch}")
+    print(f"  every subscriber got all {total} steps; every worker serves all of them")
+    print(f"  ingest   {total / ingested:>10,.0f} steps/s")
+    print(f"  delivery {total / delivered:>10,.0f} steps/s end-to-end "
+          f"({total * len(tasks) / delivered:,.0f} step deliveries/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=2, help="subscribers per worker")
+    parser.add_argument("--steps", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--bus", default=None, help="BROADCAST_BUS_URL (default: a temp Unix socket)")
+    args = parser.parse_args()
+    bus = args.bus or f"unix://{tempfile.mkdtemp()}/bus.sock"
+    procs = spawn(args.workers, args.port, bus)
+    try:
+        asyncio.run(main(args.workers, args.clients, args.steps, args.batch, args.port, bus))
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
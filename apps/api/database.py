@@ -1,53 +1,671 @@
-"""In-memory data store (swappable for Postgres later)."""
+"""In-memory data store and storage backend selection."""
 from __future__ import annotations
 
-from typing import Optional
-from models import Run, Step
+import logging
+import os
+import time
+from datetime import datetime
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+import numpy as np
+
+from analytics import LatencyAnalytics
+from models import Run, RunFilter, RunStatus, Step, StepStatus, SystemType
+from payloads import BlobStore, create_blob_store, escape
+from pricing import RateTable
+from rollups import Rollup, Stats
+from step_store import StepColumns, StepDict
+from serialization import dumps, join_array, model_bytes
+
+logger = logging.getLogger(__name__)
+
+# Sort key for a step inside an index: (started_at, insertion sequence).
+# The sequence keeps steps with identical timestamps in insertion order.
+_StepKey = tuple[str, int]
+
+# Position of a run in the creation-ordered index: (created_at, run_id).
+RunKey = tuple[str, str]
+
+# What a step last added to the rollups and aggregates:
+# (parent_step_id, own totals, run_id, type, status).
+_Contribution = tuple[Optional[str], Rollup, str, str, str]
+
+# Step statuses after which a duration is final and counted for latency.
+_FINISHED = (StepStatus.completed.value, StepStatus.failed.value)
+
+# Upper bound on cached encodings per kind; the oldest entries go first.
+JSON_CACHE_MAX = 100_000
 
 
 class Database:
     """Simple in-memory store that mirrors future Postgres schema."""
 
-    def __init__(self) -> None:
+    def __init__(self, columnar: bool = False, payloads: Optional[BlobStore] = None) -> None:
         self.runs: dict[str, Run] = {}
-        self.steps: dict[str, Step] = {}  # keyed by step_id
+        # Keyed by step_id; the columnar store trades per-read model
+        # construction for a few hundred bytes per step.
+        self.steps: StepDict | StepColumns = StepColumns() if columnar else StepDict()
+        # Large input/output values live here, referenced from the steps.
+        self.payloads = payloads
+
+        # Runs ordered by (created_at, run_id), oldest first.
+        self._runs_by_created: list[RunKey] = []
+        self._run_index_keys: dict[str, RunKey] = {}
+
+        # Secondary indexes, kept sorted by (started_at, seq) like the
+        # (run_id, started_at) / (parent_step_id, started_at) Postgres indexes.
+        self._steps_by_run: dict[str, list[tuple[str, int, str]]] = {}
+        self._children: dict[str, list[tuple[str, int, str]]] = {}
+        # What each step was indexed under, since callers mutate steps in place.
+        self._step_index_keys: dict[str, tuple[str, Optional[str], _StepKey]] = {}
+        self._seq = 0
+
+        # Encoded JSON per run/step, filled on first read and dropped on
+        # write, so all subscribers and polls share one encoding per version.
+        self._run_json: dict[str, bytes] = {}
+        self._step_json: dict[str, bytes] = {}
+
+        # Change log: every step write gets the next version, and each run
+        # keeps its steps ordered by last change. Versions start from the
+        # wall clock in microseconds so they keep increasing across restarts.
+        # Versions are numbered per process: ``epoch`` identifies this one,
+        # and a version handed out under another epoch means nothing here.
+        self.epoch = os.urandom(4).hex()
+        self._version = time.time_ns() // 1000
+        self._step_changes: dict[str, OrderedDict[str, int]] = {}
+
+        # Subtree totals per step, updated along the ancestor chain on every
+        # step write. Steps are mutated in place, so each step's own last
+        # contribution (and the parent it was added under) is kept to
+        # compute the delta on its next write.
+        self._own_rollup: dict[str, _Contribution] = {}
+        self._subtree_rollup: dict[str, Rollup] = {}
+
+        # Aggregates per run, per system_type and overall, adjusted by the
+        # same per-step deltas plus each run's last (status, system_type).
+        self._run_stats: dict[str, Stats] = {}
+        self._type_stats: dict[str, Stats] = {}
+        self._global_stats = Stats()
+        self._run_stats_keys: dict[str, tuple[str, str]] = {}
+
+        # Latency percentiles per step name/type, fed as steps finish.
+        self.latency = LatencyAnalytics()
 
     # ── Runs ─────────────────────────────────────────────────────────────
 
     def create_run(self, run: Run) -> Run:
         self.runs[run.run_id] = run
+        self._run_json.pop(run.run_id, None)
+        self._index_run(run)
+        self._update_run_stats(run)
         return run
 
     def get_run(self, run_id: str) -> Optional[Run]:
         return self.runs.get(run_id)
 
-    def list_runs(self, limit: int = 50) -> list[Run]:
-        runs = sorted(self.runs.values(), key=lambda r: r.created_at, reverse=True)
-        return runs[:limit]
+    def list_runs(
+        self,
+        limit: int = 50,
+        *,
+        before: Optional[RunKey] = None,
+        after: Optional[RunKey] = None,
+        status: Optional[RunStatus] = None,
+        system_type: Optional[SystemType] = None,
+        user_id: Optional[str] = None,
+        tags: Optional[list[str]] = None,
+    ) -> list[Run]:
+        """Newest-first page of runs, walking the creation-ordered index.
+
+        ``before`` returns runs older than the given key, ``after`` the
+        ``limit`` runs immediately newer than it. Without filters a page
+        costs O(limit); filters skip non-matching runs as they are walked.
+        """
+        run_filter = RunFilter(status=status, system_type=system_type, user_id=user_id, tags=tags or [])
+        page: list[Run] = []
+        for run in self._walk_runs(before=before, after=after):
+            if run_filter.matches(run):
+                page.append(run)
+                if len(page) >= limit:
+                    break
+        if after is not None:
+            page.reverse()
+        return page
 
     def update_run(self, run: Run) -> Run:
         self.runs[run.run_id] = run
+        self._run_json.pop(run.run_id, None)
+        self._index_run(run)
+        self._update_run_stats(run)
         return run
 
+    def run_json(self, run: Run) -> bytes:
+        """Encoded JSON for the stored version of ``run``."""
+        return self._cached_json(self._run_json, run.run_id, run)
+
+    def _walk_runs(
+        self,
+        before: Optional[RunKey] = None,
+        after: Optional[RunKey] = None,
+    ) -> Iterator[Run]:
+        """Yield runs moving away from the cursor (newest-first by default)."""
+        index = self._runs_by_created
+        if after is not None:
+            for i in range(bisect_right(index, after), len(index)):
+                yield self.runs[index[i][1]]
+            return
+        start = bisect_left(index, before) if before is not None else len(index)
+        for i in range(start - 1, -1, -1):
+            yield self.runs[index[i][1]]
+
+    def _index_run(self, run: Run) -> None:
+        key = (run.created_at, run.run_id)
+        previous = self._run_index_keys.get(run.run_id)
+        if previous == key:
+            return
+        index = self._runs_by_created
+        if previous is not None:
+            i = bisect_left(index, previous)
+            if i < len(index) and index[i] == previous:
+                del index[i]
+        if not index or index[-1] < key:
+            index.append(key)  # common case: runs arrive in creation order
+        else:
+            insort(index, key)
+        self._run_index_keys[run.run_id] = key
+
     # ── Steps ────────────────────────────────────────────────────────────
 
     def create_step(self, step: Step) -> Step:
+        self._externalize(step)
         self.steps[step.step_id] = step
+        self._step_json.pop(step.step_id, None)
+        self._index_step(step)
+        self._update_rollups(step)
+        self._record_change(step.run_id, step.step_id)
         return step
 
+    def create_steps(self, steps: list[Step]) -> list[Step]:
+        """Bulk insert; backends override this to persist in one write."""
+        for step in steps:
+            self._externalize(step)
+            self.steps[step.step_id] = step
+            self._step_json.pop(step.step_id, None)
+            self._index_step(step)
+            self._update_rollups(step)
+            self._record_change(step.run_id, step.step_id)
+        return steps
+
     def get_step(self, step_id: str) -> Optional[Step]:
         return self.steps.get(step_id)
 
     def get_steps_for_run(self, run_id: str) -> list[Step]:
-        return sorted(
-            [s for s in self.steps.values() if s.run_id == run_id],
-            key=lambda s: s.started_at,
-        )
+        """Steps of a run ordered by started_at, in O(steps in run)."""
+        return [self.steps[sid] for sid in self.step_ids_for_run(run_id)]
+
+    def step_ids_for_run(self, run_id: str) -> list[str]:
+        return [sid for _, _, sid in self._steps_by_run.get(run_id, ())]
+
+    def get_children(self, step_id: str) -> list[Step]:
+        """Direct children of a step ordered by started_at."""
+        return [self.steps[sid] for _, _, sid in self._children.get(step_id, ())]
 
     def update_step(self, step: Step) -> Step:
+        self._externalize(step)
         self.steps[step.step_id] = step
+        self._step_json.pop(step.step_id, None)
+        self._index_step(step)
+        self._update_rollups(step)
+        self._record_change(step.run_id, step.step_id)
         return step
 
+    def escape_payloads(self, step: Step) -> Step:
+        """Escape the payloads of a step built from client input or a
+        durable row (see ``payloads.escape``), before it is stored. Steps
+        already in a store, here or on another worker, are escaped."""
+        if self.payloads is not None:
+            step.input = escape(step.input)
+            step.output = escape(step.output)
+        return step
+
+    def _externalize(self, step: Step) -> None:
+        """Move the step's large payload values to the payload store."""
+        if self.payloads is not None:
+            step.input = self.payloads.externalize(step.input)
+            step.output = self.payloads.externalize(step.output)
+
+    def payload_json(self, step_id: str) -> Optional[bytes]:
+        """Encoded ``input`` and ``output`` of a stored step with payload
+        references resolved, or None if there is no such step. Raises
+        KeyError if a referenced blob is not in the payload store."""
+        step = self.steps.get(step_id)
+        if step is None:
+            return None
+        if self.payloads is None:
+            input_, output = dumps(step.input), dumps(step.output)
+        else:
+            input_, output = self.payloads.payload_json(step.input), self.payloads.payload_json(step.output)
+        return b'{"step_id":%s,"input":%s,"output":%s}' % (dumps(step_id), input_, output)
+
+    def reprice(self, rates: RateTable, run_id: Optional[str] = None) -> dict[str, list[str]]:
+        """Re-price one run's steps, or every stored step, under ``rates``.
+
+        Costs are computed in bulk over the store's token columns; changed
+        costs are written back and their deltas applied to the rollups and
+        aggregates. Returns the changed step ids per run.
+        """
+        if run_id is not None:
+            step_ids = self.step_ids_for_run(run_id)
+            if not step_ids:
+                return {}
+            columns = self.steps.pricing_columns(step_ids)
+        else:
+            step_ids = list(self.steps)
+            columns = self.steps.pricing_columns()
+        *priced, old = columns
+        new = rates.price_coded(*priced)
+        changed_rows = np.flatnonzero(np.abs(new - old) > 1e-9)
+
+        changed: dict[str, list[str]] = {}
+        by_run: dict[str, float] = {}
+        for i, cost, delta in zip(
+            changed_rows.tolist(), new[changed_rows].tolist(), (new - old)[changed_rows].tolist(),
+        ):
+            step_id = step_ids[i]
+            step_run = self._own_rollup[step_id][2]
+            self.steps.set_cost(step_id, cost)
+            self._step_json.pop(step_id, None)
+            self._add_cost(step_id, delta)
+            by_run[step_run] = by_run.get(step_run, 0.0) + delta
+            self._record_change(step_run, step_id)
+            changed.setdefault(step_run, []).append(step_id)
+        for changed_run, delta in by_run.items():
+            self._add_run_cost(changed_run, delta)
+        return changed
+
+    def steps_version(self, run_id: str) -> int:
+        """Version of the latest step write in a run (0 if it has none)."""
+        changes = self._step_changes.get(run_id)
+        return next(reversed(changes.values())) if changes else 0
+
+    def get_steps_changed_since(self, run_id: str, since: int) -> list[Step]:
+        """Steps of a run written after version ``since``, oldest change
+        first. Costs O(changed steps), not O(steps in run)."""
+        return [self.steps[sid] for sid in self.step_ids_changed_since(run_id, since)]
+
+    def step_ids_changed_since(self, run_id: str, since: int) -> list[str]:
+        changed: list[str] = []
+        for step_id, version in reversed(self._step_changes.get(run_id, {}).items()):
+            if version <= since:
+                break
+            changed.append(step_id)
+        changed.reverse()
+        return changed
+
+    def step_json(self, step: Step) -> bytes:
+        """Encoded JSON for the stored version of ``step``."""
+        return self._cached_json(self._step_json, step.step_id, step)
+
+    def cache_step_json(self, step: Step, data: bytes) -> bytes:
+        """Record ``data`` as the encoded JSON of the stored ``step``, for
+        writers that encode steps themselves; returns it."""
+        cache = self._step_json
+        if step.step_id not in cache and len(cache) >= JSON_CACHE_MAX:
+            del cache[next(iter(cache))]
+        cache[step.step_id] = data
+        return data
+
+    def step_json_by_id(self, step_id: str) -> bytes:
+        """Encoded JSON of a stored step, read from its id. The step is
+        only materialized (for the columnar store) on a cache miss."""
+        data = self._step_json.get(step_id)
+        return data if data is not None else self.step_json(self.steps[step_id])
+
+    def resolved_step_json(self, step_id: str) -> bytes:
+        """Encoded JSON of a stored step with payload references resolved.
+        References to blobs missing from the payload store are left as is."""
+        step = self.steps[step_id]
+        if self.payloads is None:
+            return self.step_json_by_id(step_id)
+        try:
+            input_, output = self.payloads.resolve(step.input), self.payloads.resolve(step.output)
+        except KeyError:
+            return self.step_json_by_id(step_id)
+        if input_ is step.input and output is step.output:
+            return self.step_json_by_id(step_id)
+        return model_bytes(step.model_copy(update={"input": input_, "output": output}))
+
+    def subtree_rollup(self, step_id: str) -> Optional[Rollup]:
+        """Totals of a step and all its descendants."""
+        return self._subtree_rollup.get(step_id)
+
+    def tree_json(self, run_id: str) -> bytes:
+        """The run's steps as a nested tree, each node with subtree totals.
+
+        Steps whose parent is not part of the run are roots. Totals come
+        from the maintained rollups, so this only walks and joins cached
+        step encodings.
+        """
+        # Run and parent of each step, read from the index keys so the
+        # columnar store only materializes steps whose JSON is not cached.
+        keys = self._step_index_keys
+        roots = [
+            sid for _, _, sid in self._steps_by_run.get(run_id, ())
+            if keys[sid][1] is None or keys.get(keys[sid][1], (None,))[0] != run_id
+        ]
+        total = Rollup()
+        for step_id in roots:
+            total.add(self._subtree_rollup[step_id])
+
+        # Iterative post-order walk, so deep chains cannot hit the recursion limit.
+        encoded: dict[str, bytes] = {}
+        stack = [(step_id, False) for step_id in reversed(roots)]
+        while stack:
+            step_id, expanded = stack.pop()
+            children = [
+                child for _, _, child in self._children.get(step_id, ())
+                if child != step_id and keys[child][0] == run_id
+            ]
+            if not expanded:
+                stack.append((step_id, True))
+                stack.extend((child, False) for child in reversed(children))
+                continue
+            encoded[step_id] = b'{"step":%s,"totals":%s,"children":%s}' % (
+                self.step_json_by_id(step_id),
+                self._subtree_rollup[step_id].to_json(),
+                join_array([encoded.pop(child) for child in children]),
+            )
+        return b'{"run_id":%s,"totals":%s,"roots":%s}' % (
+            dumps(run_id), total.to_json(), join_array([encoded.pop(r) for r in roots]),
+        )
+
+    @staticmethod
+    def _cached_json(cache: dict[str, bytes], key: str, model: Run | Step) -> bytes:
+        data = cache.get(key)
+        if data is None:
+            if len(cache) >= JSON_CACHE_MAX:
+                del cache[next(iter(cache))]
+            data = cache[key] = model_bytes(model)
+        return data
+
+    # ── Index maintenance ────────────────────────────────────────────────
+
+    def _update_rollups(self, step: Step) -> None:
+        """Apply a step write to its own and its ancestors' subtree totals.
+
+        Costs O(depth). Children stored before their parent are folded in
+        when the parent arrives.
+        """
+        own = Rollup.of_step(step)
+        previous = self._own_rollup.get(step.step_id)
+        self._own_rollup[step.step_id] = (
+            step.parent_step_id, own, step.run_id, step.type.value, step.status.value,
+        )
+        if previous is not None:
+            self._add_step_stats(*previous[1:], -1)
+        self._add_step_stats(own, step.run_id, step.type.value, step.status.value)
+        if step.status.value in _FINISHED and (previous is None or previous[4] not in _FINISHED):
+            self._record_latency(step)
+        if previous is None:
+            total = own.copy()
+            for _, _, child in self._children.get(step.step_id, ()):
+                if child != step.step_id:
+                    total.add(self._subtree_rollup[child])
+            self._subtree_rollup[step.step_id] = total
+            self._add_to_ancestors(step.step_id, step.parent_step_id, total)
+            return
+
+        old_parent, old_own = previous[:2]
+        total = self._subtree_rollup[step.step_id]
+        if old_parent != step.parent_step_id:
+            # Re-parented: move the whole subtree between ancestor chains.
+            self._add_to_ancestors(step.step_id, old_parent, total, -1)
+            total.add(own.minus(old_own))
+            self._add_to_ancestors(step.step_id, step.parent_step_id, total)
+        else:
+            delta = own.minus(old_own)
+            total.add(delta)
+            self._add_to_ancestors(step.step_id, step.parent_step_id, delta)
+
+    def _add_cost(self, step_id: str, delta: float) -> None:
+        """Apply a cost-only change to a step's own and subtree totals."""
+        parent_id, own = self._own_rollup[step_id][:2]
+        own.cost_usd += delta
+        self._subtree_rollup[step_id].cost_usd += delta
+        for total in self._ancestor_totals(step_id, parent_id):
+            total.cost_usd += delta
+
+    def _add_run_cost(self, run_id: str, delta: float) -> None:
+        """Apply a run's summed step cost change to the aggregates."""
+        change = Rollup(cost_usd=delta)
+        self._run_stats[run_id].totals.add(change)
+        self._global_stats.totals.add(change)
+        key = self._run_stats_keys.get(run_id)
+        if key is not None:
+            self._type_stats[key[1]].totals.add(change)
+
+    def _record_latency(self, step: Step) -> None:
+        ended_at = None
+        if step.ended_at:
+            try:
+                ended_at = datetime.fromisoformat(step.ended_at).timestamp()
+            except ValueError:
+                pass
+        self.latency.record(step.name, step.type.value, step.duration_ms, ended_at)
+
+    def _add_step_stats(
+        self, own: Rollup, run_id: str, step_type: str, status: str, sign: int = 1,
+    ) -> None:
+        run_stats = self._run_stats.get(run_id)
+        if run_stats is None:
+            run_stats = self._run_stats[run_id] = Stats()
+        run_stats.add_step(own, step_type, status, sign)
+        self._global_stats.add_step(own, step_type, status, sign)
+        key = self._run_stats_keys.get(run_id)
+        if key is not None:
+            self._type_stats[key[1]].add_step(own, step_type, status, sign)
+
+    def _update_run_stats(self, run: Run) -> None:
+        """Move a run between status/system_type buckets if either changed."""
+        key = (run.status.value, run.system_type.value)
+        previous = self._run_stats_keys.get(run.run_id)
+        if previous == key:
+            return
+        run_stats = self._run_stats.get(run.run_id)
+        if run_stats is None:
+            run_stats = self._run_stats[run.run_id] = Stats()
+        if previous is not None:
+            run_stats.add_run(previous[0], -1)
+            self._global_stats.add_run(previous[0], -1)
+            self._type_stats[previous[1]].add_run(previous[0], -1)
+        run_stats.add_run(key[0])
+        self._global_stats.add_run(key[0])
+        type_stats = self._type_stats.get(key[1])
+        if type_stats is None:
+            type_stats = self._type_stats[key[1]] = Stats()
+        type_stats.add_run(key[0])
+        if previous is None or previous[1] != key[1]:
+            # Steps stored before the run, or under its old system_type.
+            if previous is not None:
+                self._type_stats[previous[1]].add_steps_of(run_stats, -1)
+            type_stats.add_steps_of(run_stats)
+        self._run_stats_keys[run.run_id] = key
+
+    def stats(self) -> dict:
+        """Global and per-system_type aggregates."""
+        return {
+            "global": self._global_stats.as_dict(),
+            "by_system_type": {k: v.as_dict() for k, v in self._type_stats.items() if v.runs or v.steps},
+        }
+
+    def run_stats(self, run_id: str) -> Optional[dict]:
+        stats = self._run_stats.get(run_id)
+        return stats.as_dict() if stats is not None else None
+
+    def _add_to_ancestors(
+        self,
+        step_id: str,
+        parent_id: Optional[str],
+        delta: Rollup,
+        sign: int = 1,
+    ) -> None:
+        for total in self._ancestor_totals(step_id, parent_id):
+            total.add(delta, sign)
+
+    def _ancestor_totals(self, step_id: str, parent_id: Optional[str]) -> Iterator[Rollup]:
+        """Subtree totals of the stored ancestors, nearest first."""
+        hops = 0
+        while parent_id is not None and parent_id != step_id and hops <= len(self._own_rollup):
+            total = self._subtree_rollup.get(parent_id)
+            if total is None:
+                return  # parent not stored yet; it picks this subtree up on arrival
+            yield total
+            parent_id = self._own_rollup[parent_id][0]
+            hops += 1  # bounded even if bad parent ids form a cycle
+
+    def _record_change(self, run_id: str, step_id: str) -> None:
+        self._version += 1
+        changes = self._step_changes.setdefault(run_id, OrderedDict())
+        changes[step_id] = self._version
+        changes.move_to_end(step_id)
+
+    def _index_step(self, step: Step) -> None:
+        """(Re)index a step if its run, parent or start time changed."""
+        previous = self._step_index_keys.get(step.step_id)
+        if previous is not None:
+            run_id, parent_step_id, (started_at, seq) = previous
+            if (run_id, parent_step_id, started_at) == (
+                step.run_id, step.parent_step_id, step.started_at,
+            ):
+                return
+            self._unindex(self._steps_by_run, run_id, (started_at, seq, step.step_id))
+            if parent_step_id is not None:
+                self._unindex(self._children, parent_step_id, (started_at, seq, step.step_id))
+        else:
+            self._seq += 1
+            seq = self._seq
+
+        entry = (step.started_at, seq, step.step_id)
+        insort(self._steps_by_run.setdefault(step.run_id, []), entry)
+        if step.parent_step_id is not None:
+            insort(self._children.setdefault(step.parent_step_id, []), entry)
+        self._step_index_keys[step.step_id] = (
+            step.run_id, step.parent_step_id, (step.started_at, seq),
+        )
+
+    @staticmethod
+    def _unindex(
+        index: dict[str, list[tuple[str, int, str]]],
+        key: str,
+        entry: tuple[str, int, str],
+    ) -> None:
+        bucket = index.get(key)
+        if not bucket:
+            return
+        i = bisect_left(bucket, entry)
+        if i < len(bucket) and bucket[i] == entry:
+            del bucket[i]
+        if not bucket:
+            del index[key]
+
+    # ── Replication ──────────────────────────────────────────────────────
+
+    def replicate_run(self, run: Run) -> None:
+        """Mirror a run written (and persisted) by another worker.
+
+        Calls the in-memory implementation directly, so backends with
+        write-behind do not persist the same write a second time.
+        """
+        Database.update_run(self, run)
+
+    def replicate_steps(self, steps: list[Step]) -> None:
+        """Mirror steps written (and persisted) by another worker."""
+        Database.create_steps(self, steps)
+
+    # ── Lifecycle ────────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        """Open connections and load state (no-op in memory)."""
+
+    async def close(self) -> None:
+        """Flush pending writes and release resources (no-op in memory)."""
+
+    async def wait_for_capacity(self) -> None:
+        """Wait until the backend's write backlog is below its high-water
+        mark. Streaming ingestion awaits this between chunks so a slow
+        store pushes back on the client instead of buffering unboundedly."""
+
+    async def load_runs(
+        self,
+        limit: int = 50,
+        *,
+        before: Optional[RunKey] = None,
+        after: Optional[RunKey] = None,
+        status: Optional[RunStatus] = None,
+        system_type: Optional[SystemType] = None,
+        user_id: Optional[str] = None,
+        tags: Optional[list[str]] = None,
+    ) -> list[Run]:
+        """A page of runs like ``list_runs``, including runs backing storage
+        holds but this process has not loaded. In memory that is list_runs."""
+        return self.list_runs(
+            limit, before=before, after=after, status=status,
+            system_type=system_type, user_id=user_id, tags=tags,
+        )
+
+    async def load_step_owners(self, step_ids: list[str]) -> dict[str, str]:
+        """Run id of each stored step among ``step_ids``, including steps
+        backing storage holds but this process has not loaded."""
+        keys = self._step_index_keys
+        return {sid: keys[sid][0] for sid in step_ids if sid in keys}
+
+    async def load_run(self, run_id: str) -> Optional[Run]:
+        """Return a run, fetching it and its steps from backing storage if
+        this process has not seen it yet. In memory that is just get_run."""
+        return self.get_run(run_id)
+
+
+def create_database(
+    url: Optional[str] = None, columnar: bool = False, payloads: Optional[BlobStore] = None,
+) -> Database:
+    """Pick a storage backend from a ``DATABASE_URL``-style string.
+
+    ``sqlite:///path/to/uaop.db`` selects the durable SQLite store,
+    ``postgresql://`` (or ``postgresql+asyncpg://``) the asyncpg-backed
+    Postgres store; an empty URL or ``memory://`` keeps everything in
+    process memory. ``columnar`` keeps steps in the compact column store
+    (``STEP_STORE=columnar``) instead of as Step models. ``payloads`` holds
+    large step payload values (see payloads.py); None keeps them inline.
+    """
+    if columnar:
+        logger.info("Using columnar step store")
+    if not url or url.startswith("memory://"):
+        return Database(columnar, payloads)
+
+    if url.split("://")[0].split("+")[0] in ("postgres", "postgresql"):
+        from postgres_store import PostgresDatabase
+
+        logger.info("Using Postgres store")
+        return PostgresDatabase(url, columnar=columnar, payloads=payloads)
+
+    from sqlite_store import SQLiteDatabase, sqlite_path
+
+    path = sqlite_path(url)
+    if path is not None:
+        logger.info(f"Using SQLite store at {path}")
+        return SQLiteDatabase(path, columnar=columnar, payloads=payloads)
+
+    logger.warning(f"Unsupported DATABASE_URL scheme {url.split('://')[0]!r}; using in-memory store")
+    return Database(columnar, payloads)
+
 
 # Singleton
-db = Database()
+db = create_database(
+    os.environ.get("DATABASE_URL"), columnar=os.environ.get("STEP_STORE") == "columnar",
+    payloads=create_blob_store(
+        os.environ.get("PAYLOAD_STORE"),
+        inline_max=int(os.environ.get("PAYLOAD_INLINE_MAX", "1024")),
+        compress=os.environ.get("PAYLOAD_COMPRESS") == "1",
+    ),
+)
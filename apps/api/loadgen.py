@@ -0,0 +1,252 @@
+"""Headless load generator: many concurrent simulated runs, time-scaled.
+
+Starts ``--runs`` runs drawn at random (seeded) from ``SCENARIOS``, or
+from the ``scenario_gen`` presets named in ``--scenarios``. New runs arrive
+at ``--rate`` per second (0 starts them all at once). Scenario delays are
+multiplied by ``--time-scale``, so 0 replays with no delays. Each run gets
+``--subscribers`` synthetic WebSocket subscribers on the
+``ConnectionManager``. Everything runs in this process against the
+configured store (``DATABASE_URL``, ``STEP_STORE``), with the same code
+paths the API uses.
+
+Reports ingest rate, broadcast latency percentiles and memory growth.
+Broadcast latency is measured from a step's event time (``started_at`` for
+a running step, ``ended_at`` for a finished one) to the moment a subscriber
+is handed the frame.
+
+Run from ``apps/api``::
+
+    python loadgen.py --runs 2000 --rate 500 --time-scale 0 --subscribers 3
+    python loadgen.py --runs 5000 --time-scale 0.05 --json report.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import time
+from datetime import datetime
+from typing import Optional
+
+from analytics import QUANTILES, DDSketch
+from database import db
+from models import Run, RunMetadata, RunStatus, Scheduling
+from scenario_gen import PRESETS, register_presets
+from scenarios import SCENARIOS
+from serialization import loads
+from simulator import run_simulation
+from websocket_manager import Subscriber, manager
+
+_UNSEEN = object()
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def event_time(frame: str) -> Optional[float]:
+    """Epoch seconds of the event a step_update frame reports, else None."""
+    message = loads(frame)
+    if message.get("type") != "step_update":
+        return None
+    step = message["step"]
+    return datetime.fromisoformat(step["ended_at"] or step["started_at"]).timestamp()
+
+
+class LatencyProbe:
+    """Broadcast latency of one run's frames, in microseconds.
+
+    All subscribers of a run are handed the same frame object, so each
+    frame is decoded once and its event time is looked up by the others.
+    """
+
+    def __init__(self, subscribers: int) -> None:
+        self.subscribers = subscribers
+        self.sketch = DDSketch()
+        self.frames = 0
+        self.bytes = 0
+        self._pending: dict[str, list] = {}  # frame -> [event time, subscribers left]
+
+    def observe(self, frame: str) -> None:
+        now = time.time()
+        self.frames += 1
+        self.bytes += len(frame)
+        entry = self._pending.get(frame, _UNSEEN)
+        if entry is _UNSEEN:
+            entry = self._pending[frame] = [event_time(frame), self.subscribers]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._pending[frame]
+        if entry[0] is not None:
+            self.sketch.add((now - entry[0]) * 1e6)
+
+
+class SyntheticWebSocket:
+    """Stands in for a browser: accepts every frame and reports it to a probe."""
+
+    def __init__(self, probe: LatencyProbe) -> None:
+        self.probe = probe
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.probe.observe(data)
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+class LoadReport:
+    """Totals across runs, merged as each run finishes."""
+
+    def __init__(self) -> None:
+        self.latency_us = DDSketch()
+        self.runs = 0
+        self.failed = 0
+        self.frames = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.peak_rss = 0
+
+    def add(self, run: Optional[Run], probe: LatencyProbe, subscribers: list[Subscriber]) -> None:
+        self.runs += 1
+        self.failed += run is None or run.status == RunStatus.failed
+        self.latency_us.merge(probe.sketch)
+        self.frames += probe.frames
+        self.bytes += probe.bytes
+        self.dropped += sum(sub.dropped for sub in subscribers)
+
+
+async def play(
+    scenario: str, args: argparse.Namespace, scheduling: Scheduling, report: LoadReport,
+) -> None:
+    """One run, created and watched the way the API and a browser would."""
+    run = db.create_run(Run(metadata=RunMetadata(user_id="loadgen", tags=["loadgen", scenario])))
+    probe = LatencyProbe(args.subscribers)
+    sockets = [SyntheticWebSocket(probe) for _ in range(args.subscribers)]
+    subscribers = [await manager.connect(run.run_id, ws) for ws in sockets]
+    await manager.broadcast_run(run, db.run_json(run))
+    await run_simulation(run.run_id, scenario, scheduling, args.max_concurrency, args.time_scale)
+
+    # Let subscribers receive everything before they leave.
+    if manager.coalesce_ms:
+        await asyncio.sleep(manager.coalesce_ms / 1000)
+    while any(sub.backlog for sub in subscribers):
+        await asyncio.sleep(0.001)
+    await asyncio.sleep(0)
+    for ws in sockets:
+        manager.disconnect(run.run_id, ws)
+    report.add(db.get_run(run.run_id), probe, subscribers)
+
+
+async def sample_rss(report: LoadReport, interval_s: float = 0.25) -> None:
+    while True:
+        report.peak_rss = max(report.peak_rss, rss_bytes())
+        await asyncio.sleep(interval_s)
+
+
+async def generate(args: argparse.Namespace) -> dict:
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    register_presets([n for n in names if n in PRESETS and n not in SCENARIOS])
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    rng = random.Random(args.seed)
+    scheduling = Scheduling(args.scheduling)
+    report = LoadReport()
+
+    await db.start()
+    await manager.start()
+    steps_before, rss_before = len(db.steps), rss_bytes()
+    sampler = asyncio.create_task(sample_rss(report))
+    t0 = time.perf_counter()
+    tasks = []
+    for i in range(args.runs):
+        if args.rate > 0:
+            await asyncio.sleep(max(0.0, t0 + i / args.rate - time.perf_counter()))
+        tasks.append(asyncio.create_task(play(rng.choice(names), args, scheduling, report)))
+    arrival_s = time.perf_counter() - t0
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+    sampler.cancel()
+    steps = len(db.steps) - steps_before
+    rss_after = rss_bytes()
+    await manager.close()
+    await db.close()
+
+    p = dict(zip(QUANTILES, report.latency_us.quantiles(QUANTILES)))
+    return {
+        "runs": report.runs,
+        "failed_runs": report.failed,
+        "steps": steps,
+        "seconds": round(elapsed, 3),
+        "arrival_seconds": round(arrival_s, 3),
+        "runs_per_s": round(report.runs / elapsed, 1),
+        "steps_per_s": round(steps / elapsed, 1),
+        # Each simulated step is written twice: created running, then finished.
+        "step_writes_per_s": round(2 * steps / elapsed, 1),
+        "frames_delivered": report.frames,
+        "frames_per_s": round(report.frames / elapsed, 1),
+        "frames_dropped": report.dropped,
+        "delivered_mb": round(report.bytes / 1e6, 2),
+        "latency_ms": {
+            f"p{round(q * 100)}": round(v / 1000, 3) if v is not None else None for q, v in p.items()
+        },
+        "rss_mb": {
+            "before": round(rss_before / 1e6, 1),
+            "after": round(rss_after / 1e6, 1),
+            "peak": round(max(report.peak_rss, rss_after) / 1e6, 1),
+        },
+        "rss_bytes_per_step": round((rss_after - rss_before) / steps) if steps else None,
+    }
+
+
+def print_report(args: argparse.Namespace, r: dict) -> None:
+    print(
+        f"{r['runs']:,} runs ({r['failed_runs']} failed), {r['steps']:,} steps in {r['seconds']:.2f} s "
+        f"(time scale {args.time_scale}, {f'{args.rate:g} runs/s' if args.rate else 'all at once'}, "
+        f"{args.subscribers} subscribers/run, {args.scheduling} scheduling)"
+    )
+    print(f"  ingest     {r['runs_per_s']:,.1f} runs/s, {r['steps_per_s']:,.0f} steps/s "
+          f"({r['step_writes_per_s']:,.0f} step writes/s)")
+    print(f"  broadcast  {r['frames_delivered']:,} frames ({r['frames_per_s']:,.0f}/s, "
+          f"{r['delivered_mb']:,.1f} MB), {r['frames_dropped']:,} dropped")
+    print("  latency    " + "  ".join(f"{k} {v:.2f} ms" for k, v in r["latency_ms"].items() if v is not None))
+    m = r["rss_mb"]
+    print(f"  memory     RSS {m['before']:,.1f} -> {m['after']:,.1f} MB (peak {m['peak']:,.1f}), "
+          f"{r['rss_bytes_per_step'] or 0:,} B/step")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=1000, help="runs to start")
+    parser.add_argument("--rate", type=float, default=0, help="new runs per second (0: all at once)")
+    parser.add_argument("--time-scale", type=float, default=0, help="delay multiplier (0: no delays)")
+    parser.add_argument("--subscribers", type=int, default=1, help="WebSocket subscribers per run")
+    parser.add_argument("--scenarios", default="", help="comma-separated names, synthetic presets included (default: the demos)")
+    parser.add_argument("--scheduling", choices=[m.value for m in Scheduling], default=Scheduling.scenario.value)
+    parser.add_argument("--max-concurrency", type=int, default=None, help="emitting steps per run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(generate(args))
+    print_report(args, report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
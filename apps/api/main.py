@@ -2,20 +2,34 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+import json
 import logging
+import os
+import time
+import uuid
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Literal, Optional
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, Query
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import TypeAdapter, ValidationError
 
 from models import (
-    Run, Step, CreateRunRequest, CreateStepRequest,
-    RunStatus, StepStatus, StepType, RunMetadata,
+    Run, Step, CreateRunRequest, CreateStepRequest, RunFilter, SetRateRequest,
+    RunStatus, StepStatus, StepType, RunMetadata, SystemType,
 )
-from database import db
-from websocket_manager import manager
+from analytics import BUCKET_S
+from database import db, RunKey
+from websocket_manager import StreamMode, manager
 from simulator import run_simulation
 from scenarios import SCENARIOS, SCENARIO_LABELS
+from scenario_gen import register_presets
+from plans import compile_plans
+from pricing import rates
+from serialization import FrameEncoding, dumps, join_array
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,8 +38,21 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("UAOP API starting up")
+    await db.start()
+    synthetic = register_presets(os.getenv("SYNTHETIC_SCENARIOS", ""))
+    if synthetic:
+        logger.info(f"Registered synthetic scenarios: {', '.join(synthetic)}")
+    compiled = compile_plans()
+    logger.info(f"Compiled {len(SCENARIOS)} scenario plans ({compiled:,} steps)")
+    # Writes made on other workers arrive over the broadcast bus.
+    manager.on_remote_run = db.replicate_run
+    manager.on_remote_steps = db.replicate_steps
+    manager.on_remote_rate = rates.set_rate
+    await manager.start()
     yield
     logger.info("UAOP API shutting down")
+    await manager.close()
+    await db.close()
 
 
 app = FastAPI(
@@ -44,6 +71,11 @@ app.add_middleware(
 )
 
 
+def json_response(body: bytes) -> Response:
+    """Return pre-encoded JSON as-is, bypassing FastAPI's encoder."""
+    return Response(content=body, media_type="application/json")
+
+
 # ── REST Endpoints ─────────────────────────────────────────────────────────────
 
 @app.get("/api/health")
@@ -71,75 +103,479 @@ async def create_run(req: CreateRunRequest):
     )
     db.create_run(run)
     logger.info(f"Created run {run.run_id} (scenario={req.scenario})")
+    if req.ws_coalesce_ms is not None:
+        manager.set_coalesce_window(run.run_id, req.ws_coalesce_ms)
+    await manager.broadcast_run(run, db.run_json(run))
 
-    # Start simulation in background if a scenario is provided
+    # Start simulation in background if a scenario is provided. Clients that
+    # connect late catch up with ?from_seq=0 on the WebSocket.
     if req.scenario and req.scenario in SCENARIOS:
-        async def delayed_simulation(rid: str, scenario: str):
-            await asyncio.sleep(1.5)  # Give client time to connect WebSocket
-            await run_simulation(rid, scenario)
-        asyncio.create_task(delayed_simulation(run.run_id, req.scenario))
+        asyncio.create_task(run_simulation(run.run_id, req.scenario, req.scheduling, req.max_concurrency))
+
+    return json_response(db.run_json(run))
+
+
+def encode_cursor(run: Run) -> str:
+    """Opaque pagination cursor pointing at a run's position in the list."""
+    raw = json.dumps([run.created_at, run.run_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
 
-    return run.model_dump()
+def decode_cursor(cursor: str) -> RunKey:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, run_id = json.loads(base64.urlsafe_b64decode(padded))
+        datetime.fromisoformat(created_at)  # Postgres compares it as a timestamp
+        return str(created_at), str(run_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @app.get("/api/runs")
-async def list_runs(limit: int = Query(50, ge=1, le=200)):
-    """List recent runs."""
-    runs = db.list_runs(limit)
-    return {"runs": [r.model_dump() for r in runs]}
+async def list_runs(
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None, description="Cursor: return older runs"),
+    after: Optional[str] = Query(None, description="Cursor: return newer runs"),
+    status: Optional[RunStatus] = None,
+    system_type: Optional[SystemType] = None,
+    user_id: Optional[str] = None,
+    tag: Optional[list[str]] = Query(None, description="Require every given tag"),
+):
+    """List recent runs, newest first, with cursor pagination."""
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+    runs = await db.load_runs(
+        limit + 1,
+        before=decode_cursor(before) if before else None,
+        after=decode_cursor(after) if after else None,
+        status=status,
+        system_type=system_type,
+        user_id=user_id,
+        tags=tag,
+    )
+    has_more = len(runs) > limit
+    if has_more:
+        # The extra run sits furthest from the cursor: oldest unless paging forward.
+        runs = runs[1:] if after else runs[:limit]
+    next_cursor = encode_cursor(runs[-1]) if runs and (has_more or after) else None
+    prev_cursor = encode_cursor(runs[0]) if runs else (after or before)
+    return json_response(b'{"runs":%s,"next_cursor":%s,"prev_cursor":%s}' % (
+        join_array([db.run_json(r) for r in runs]), dumps(next_cursor), dumps(prev_cursor),
+    ))
 
 
 @app.get("/api/runs/{run_id}")
 async def get_run(run_id: str):
     """Get a single run by ID."""
-    run = db.get_run(run_id)
+    run = await db.load_run(run_id)
     if not run:
         return {"error": "Run not found"}, 404
-    return run.model_dump()
+    return json_response(db.run_json(run))
 
 
 @app.get("/api/runs/{run_id}/steps")
-async def get_run_steps(run_id: str):
-    """Get all steps for a run."""
-    steps = db.get_steps_for_run(run_id)
-    return {"steps": [s.model_dump() for s in steps]}
+async def get_run_steps(
+    request: Request,
+    run_id: str,
+    since: Optional[int] = Query(None, ge=0, description="Only steps changed after this version"),
+    epoch: Optional[str] = Query(None, description="epoch of the response that gave ``since``"),
+    payloads: Literal["ref", "inline"] = Query("ref", description="inline: resolve payload references"),
+):
+    """Get all steps for a run, or only those changed after ``since``.
+
+    ``version`` in the response is the run's step high-water mark to pass
+    as ``since`` next time, together with ``epoch``. Versions are numbered
+    per worker process, so a ``since`` from another epoch gets all steps.
+    The ETag tracks the epoch and version, so polling an idle run with
+    If-None-Match costs a 304 and no body.
+
+    Large payload values come as references (``{"$blob": ..., "bytes": ...}``)
+    to fetch from ``/api/steps/{step_id}/payload``, unless ``payloads=inline``.
+    Values of the step's own with a ``$blob`` key come escaped, as
+    ``{"$blob": null, "value": ...}``, and resolve the same way.
+    """
+    await db.load_run(run_id)
+    version = db.steps_version(run_id)
+    etag = f'"{db.epoch}.{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    if since is None or epoch != db.epoch:
+        step_ids = db.step_ids_for_run(run_id)
+    else:
+        step_ids = db.step_ids_changed_since(run_id, since)
+    encode = db.step_json_by_id if payloads == "ref" else db.resolved_step_json
+    body = b'{"steps":%s,"version":%d,"epoch":"%s"}' % (
+        join_array([encode(sid) for sid in step_ids]), version, db.epoch.encode(),
+    )
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/stats")
+async def get_stats(run_id: Optional[str] = None):
+    """Aggregates maintained on write: overall and per system_type, or for
+    one run with ``?run_id=``. Cost is O(1) in the number of steps."""
+    if run_id is None:
+        return json_response(dumps(db.stats()))
+    await db.load_run(run_id)
+    stats = db.run_stats(run_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return json_response(dumps(stats))
+
+
+@app.get("/api/analytics/latency")
+async def latency_percentiles(
+    group: Literal["type", "name"] = "type",
+    window: Literal["1m", "5m", "15m", "1h"] = "5m",
+    key: Optional[str] = Query(None, description="One step type/name; all when omitted"),
+):
+    """p50/p95/p99 of step ``duration_ms`` per step type or name over a
+    trailing window, read from streaming sketches (~1% relative error)."""
+    return json_response(dumps({
+        "group": group, "window": window,
+        "series": db.latency.percentiles(group, window, key),
+    }))
+
+
+@app.get("/api/analytics/latency/timeseries")
+async def latency_timeseries(
+    group: Literal["type", "name"] = "type",
+    window: Literal["1m", "5m", "15m", "1h"] = "15m",
+    key: Optional[str] = Query(None, description="One step type/name; all when omitted"),
+):
+    """Per-time-bucket p50/p95/p99 of step ``duration_ms`` over a window."""
+    return json_response(dumps({
+        "group": group, "window": window, "bucket_s": BUCKET_S,
+        "series": db.latency.timeseries(group, window, key),
+    }))
+
+
+@app.get("/api/rates")
+async def list_rates():
+    """Rate history per model (USD per 1K tokens, with effective dates)."""
+    return json_response(dumps({"rates": rates.as_dict()}))
+
+
+@app.post("/api/rates")
+async def set_rate(req: SetRateRequest):
+    """Add a model's rate from ``effective_from`` on. New steps use it right
+    away; stored costs change only when re-priced (``POST /api/steps:reprice``)."""
+    try:
+        rate = rates.set_rate(req.model, req.prompt, req.completion, req.effective_from)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid effective_from")
+    manager.publish_rate(req.model, rate.prompt, rate.completion, rate.effective_from)
+    return json_response(dumps({"model": req.model, "rates": rates.as_dict()[req.model]}))
 
 
-@app.post("/api/steps")
-async def create_step(req: CreateStepRequest):
-    """Create a step manually (for non-simulated use)."""
-    from datetime import datetime, timezone
+@app.get("/api/runs/{run_id}/tree")
+async def get_run_tree(request: Request, run_id: str):
+    """Get a run's steps as a nested tree with subtree totals per node.
+
+    Totals (tokens, cost, duration, error count) are maintained by the
+    store as steps are written. Shares the ETag of the steps endpoint.
+    """
+    run = await db.load_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    etag = f'"{db.epoch}.{db.steps_version(run_id)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=db.tree_json(run_id), media_type="application/json", headers=headers)
+
 
-    step = Step(
+@app.get("/api/steps/{step_id}/payload")
+async def get_step_payload(step_id: str):
+    """A step's ``input`` and ``output`` with payload references resolved."""
+    try:
+        body = db.payload_json(step_id)
+    except KeyError:
+        # With the in-memory payload store, each worker only has the blobs
+        # of steps written on it; PAYLOAD_STORE=file://... shares them.
+        raise HTTPException(status_code=404, detail="Payload not available on this worker")
+    if body is None:
+        raise HTTPException(status_code=404, detail="Step not found")
+    return json_response(body)
+
+
+def step_from_request(req: CreateStepRequest, started_at: str) -> Step:
+    """Build a Step from an already-validated request without re-validating."""
+    return db.escape_payloads(Step.model_construct(
+        step_id=req.step_id or str(uuid.uuid4()),
         run_id=req.run_id,
         parent_step_id=req.parent_step_id,
         name=req.name,
-        type=StepType(req.type),
+        type=req.type,
+        started_at=started_at,
+        model=req.model,
         input=req.input,
+    ))
+
+
+async def foreign_step_ids(named: list[tuple[str, str]]) -> list[int]:
+    """Positions in ``named`` (caller-assigned step_id, run_id) whose id
+    already belongs to a step of another run, stored or earlier in the list.
+
+    Caller ids may re-send a step of the same run, but never take over
+    another run's step.
+    """
+    if not named:
+        return []
+    owners = await db.load_step_owners([sid for sid, _ in named])
+    return [i for i, (sid, run_id) in enumerate(named) if owners.setdefault(sid, run_id) != run_id]
+
+
+def step_id_conflict(step_ids: list[str]) -> HTTPException:
+    return HTTPException(
+        status_code=409, detail=f"step_id already used by another run: {', '.join(step_ids)}",
     )
+
+
+_step_batch_adapter = TypeAdapter(list[CreateStepRequest])
+
+
+@app.post("/api/steps")
+async def create_step(req: CreateStepRequest):
+    """Create a step manually (for non-simulated use)."""
+    if req.step_id is not None and await foreign_step_ids([(req.step_id, req.run_id)]):
+        raise step_id_conflict([req.step_id])
+    step = step_from_request(req, datetime.now(timezone.utc).isoformat())
     db.create_step(step)
 
-    await manager.broadcast(req.run_id, {
-        "type": "step_update",
-        "step": step.model_dump(),
-    })
+    encoded = db.step_json(step)
+    await manager.broadcast_step(step, encoded)
+
+    return json_response(encoded)
+
 
-    return step.model_dump()
+async def broadcast_step_batch(steps: list[Step]) -> None:
+    """Send one step_batch message to each run touched by ``steps``."""
+    by_run: dict[str, list[Step]] = {}
+    for step in steps:
+        by_run.setdefault(step.run_id, []).append(step)
+    for run_id, run_steps in by_run.items():
+        await manager.broadcast_steps(run_id, [db.step_json(s) for s in run_steps])
+
+
+@app.post("/api/steps:batch")
+async def create_steps_batch(request: Request):
+    """Create many steps, possibly across runs, in one request.
+
+    The body is a JSON array of step requests, validated in a single pass
+    straight from the raw bytes and written to the store in bulk. Each
+    affected run receives one ``step_batch`` broadcast. A step_id already
+    used by another run rejects the whole batch with 409.
+    """
+    try:
+        reqs = _step_batch_adapter.validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    named = [(r.step_id, r.run_id) for r in reqs if r.step_id is not None]
+    foreign = await foreign_step_ids(named)
+    if foreign:
+        raise step_id_conflict(list(dict.fromkeys(named[i][0] for i in foreign)))
+
+    now = datetime.now(timezone.utc).isoformat()
+    steps = db.create_steps([step_from_request(r, now) for r in reqs])
+    await broadcast_step_batch(steps)
+
+    return {"accepted": len(steps), "step_ids": [s.step_id for s in steps]}
+
+
+# Streaming ingestion limits: lines longer than this are rejected without
+# being buffered, and parsed steps are written in chunks of this many.
+STREAM_MAX_LINE_BYTES = 1 << 20
+STREAM_CHUNK_STEPS = 500
+STREAM_MAX_ERRORS = 100
+
+
+@app.post("/api/steps:stream")
+async def create_steps_stream(request: Request):
+    """Ingest newline-delimited JSON step requests from a long-lived upload.
+
+    The body is parsed incrementally, so memory stays bounded by one line
+    plus one chunk of steps. Between chunks the handler waits for the store
+    to drain its write backlog, which stops reading from the socket and
+    lets TCP flow control slow the exporter down. The response summarizes
+    accepted and rejected lines, with the first errors by line number.
+    """
+    accepted = 0
+    rejected = 0
+    errors: list[dict] = []
+    pending: list[Step] = []
+    # (step_id, run_id) and (position in pending, line) of caller-assigned ids.
+    named: list[tuple[str, str]] = []
+    named_at: list[tuple[int, int]] = []
+    buffer = bytearray()
+    line_no = 0
+    skipping = False  # inside an oversized line, discarding until newline
+
+    def reject(message: str, line: Optional[int] = None) -> None:
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < STREAM_MAX_ERRORS:
+            errors.append({"line": line_no if line is None else line, "error": message})
+
+    def take(line: bytes) -> None:
+        nonlocal line_no
+        line_no += 1
+        if not line.strip():
+            return
+        try:
+            req = CreateStepRequest.model_validate_json(line)
+        except ValidationError as e:
+            reject("; ".join(f"{'.'.join(map(str, err['loc'])) or 'body'}: {err['msg']}" for err in e.errors()))
+            return
+        if req.step_id is not None:
+            named.append((req.step_id, req.run_id))
+            named_at.append((len(pending), line_no))
+        pending.append(step_from_request(req, datetime.now(timezone.utc).isoformat()))
+
+    def oversized() -> None:
+        nonlocal line_no
+        line_no += 1
+        reject(f"line exceeds {STREAM_MAX_LINE_BYTES} bytes")
+
+    async def flush() -> None:
+        nonlocal accepted, pending
+        if not pending:
+            return
+        await db.wait_for_capacity()
+        steps, pending = pending, []
+        dropped = set()
+        for i in await foreign_step_ids(named):
+            position, line = named_at[i]
+            reject(f"step_id {named[i][0]} already used by another run", line)
+            dropped.add(position)
+        if dropped:
+            steps = [s for k, s in enumerate(steps) if k not in dropped]
+        named.clear()
+        named_at.clear()
+        db.create_steps(steps)
+        accepted += len(steps)
+        await broadcast_step_batch(steps)
+
+    async for chunk in request.stream():
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            if skipping:
+                skipping = False
+            elif len(buffer) + end - start > STREAM_MAX_LINE_BYTES:
+                oversized()
+            else:
+                buffer += chunk[start:end]
+                take(bytes(buffer))
+            buffer.clear()
+            start = end + 1
+        if not skipping:
+            buffer += chunk[start:]
+            if len(buffer) > STREAM_MAX_LINE_BYTES:
+                oversized()
+                buffer.clear()
+                skipping = True
+        if len(pending) >= STREAM_CHUNK_STEPS:
+            await flush()
+    if buffer and not skipping:
+        take(bytes(buffer))
+    await flush()
+
+    return {
+        "accepted": accepted,
+        "rejected": rejected,
+        "lines": line_no,
+        "errors": errors,
+        "errors_truncated": rejected > len(errors),
+    }
+
+
+@app.post("/api/steps:reprice")
+async def reprice_steps(run_id: Optional[str] = None):
+    """Re-price stored steps, one run's with ``?run_id=`` or all of them,
+    under the current rates. Rollups and aggregates follow the new costs."""
+    if run_id is not None and await db.load_run(run_id) is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    t0 = time.perf_counter()
+    changed = db.reprice(rates, run_id)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    repriced = sum(len(ids) for ids in changed.values())
+    logger.info(f"Re-priced {repriced} steps (run={run_id or 'all'}) in {elapsed_ms:.0f} ms")
+    # Published for every changed run: other workers mirror the new costs
+    # even for runs nobody is watching here.
+    for changed_run, step_ids in changed.items():
+        await manager.broadcast_steps(changed_run, [db.step_json_by_id(sid) for sid in step_ids])
+    return {"repriced": repriced, "elapsed_ms": round(elapsed_ms, 1)}
 
 
 # ── WebSocket ──────────────────────────────────────────────────────────────────
 
+@app.websocket("/ws/runs")
+async def runs_firehose(
+    ws: WebSocket,
+    limit: int = Query(50, ge=0, le=200),
+    status: Optional[RunStatus] = None,
+    system_type: Optional[SystemType] = None,
+    user_id: Optional[str] = None,
+    tag: Optional[list[str]] = Query(None),
+    encoding: FrameEncoding = FrameEncoding.json,
+):
+    """Subscribe to updates of all runs, optionally filtered.
+
+    Sends a ``runs_snapshot`` of the ``limit`` newest matching runs, then a
+    ``run_update`` whenever a matching run changes and a ``run_removed``
+    when a run the client was shown stops matching.
+    """
+    if not encoding.available:
+        await ws.close(code=1003)
+        return
+    run_filter = RunFilter(status=status, system_type=system_type, user_id=user_id, tags=tag or [])
+
+    def snapshot() -> tuple[list[Run], list[bytes]]:
+        runs = db.list_runs(limit, status=status, system_type=system_type, user_id=user_id, tags=tag)
+        return runs, [db.run_json(r) for r in runs]
+
+    sub = await manager.connect_firehose(ws, run_filter, snapshot, encoding)
+    try:
+        while True:
+            if await ws.receive_text() == "ping":
+                sub.offer("pong")
+    except Exception:
+        manager.disconnect(None, ws)
+
+
 @app.websocket("/ws/runs/{run_id}")
-async def websocket_endpoint(ws: WebSocket, run_id: str):
-    """Subscribe to real-time updates for a specific run."""
-    await manager.connect(run_id, ws)
+async def websocket_endpoint(
+    ws: WebSocket,
+    run_id: str,
+    from_seq: Optional[int] = Query(None, ge=0),
+    epoch: Optional[str] = None,
+    mode: StreamMode = StreamMode.full,
+    encoding: FrameEncoding = FrameEncoding.json,
+):
+    """Subscribe to real-time updates for a specific run.
+
+    Every frame carries the run's ``seq``, numbered per worker process;
+    the first frame is a ``hello`` naming the worker's ``epoch``.
+    Reconnecting with ``?from_seq=<last seen seq>&epoch=<epoch>`` replays
+    what was missed before live frames resume, or sends a ``resync`` if
+    the seq came from another worker. ``?mode=delta`` sends step completions as
+    ``step_delta`` frames holding only the changed fields, and
+    ``?encoding=`` picks the wire format (see ``FrameEncoding``).
+    """
+    if not encoding.available:
+        # Rejects the handshake (HTTP 403) rather than silently sending JSON.
+        await ws.close(code=1003)
+        return
+    sub = await manager.connect(run_id, ws, from_seq, mode, encoding, epoch)
     try:
         while True:
             # Keep connection alive; client can send ping/pong
             data = await ws.receive_text()
-            # Echo back as acknowledgment
+            # Echo back as acknowledgment, queued behind pending updates
             if data == "ping":
-                await ws.send_text("pong")
+                sub.offer("pong")
     except WebSocketDisconnect:
         manager.disconnect(run_id, ws)
     except Exception:
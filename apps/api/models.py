@@ -39,6 +39,13 @@ class StepStatus(str, Enum):
     retrying = "retrying"
 
 
+class Scheduling(str, Enum):
+    """How the simulator walks sibling scenario steps."""
+    sequential = "sequential"  # one at a time, in dependency order
+    scenario = "scenario"      # concurrently where the scenario marks them parallel
+    parallel = "parallel"      # every independent sibling concurrently
+
+
 # ── Shared sub-models ──────────────────────────────────────────────────────────
 
 class RunMetadata(BaseModel):
@@ -77,6 +84,7 @@ class Step(BaseModel):
     tokens_prompt: int = 0
     tokens_completion: int = 0
     cost_usd: float = 0.0
+    model: Optional[str] = None  # rate table key; None prices at "default"
     input: dict[str, Any] = Field(default_factory=dict)
     output: dict[str, Any] = Field(default_factory=dict)
     error: Optional[StepError] = None
@@ -84,15 +92,46 @@ class Step(BaseModel):
 
 # ── Request / Response helpers ─────────────────────────────────────────────────
 
+class RunFilter(BaseModel):
+    """Run criteria shared by list queries and the runs firehose."""
+    status: Optional[RunStatus] = None
+    system_type: Optional[SystemType] = None
+    user_id: Optional[str] = None
+    tags: list[str] = Field(default_factory=list)  # all must be present
+
+    def matches(self, run: Run) -> bool:
+        if self.status is not None and run.status != self.status:
+            return False
+        if self.system_type is not None and run.system_type != self.system_type:
+            return False
+        if self.user_id is not None and run.metadata.user_id != self.user_id:
+            return False
+        return all(t in run.metadata.tags for t in self.tags)
+
+
 class CreateRunRequest(BaseModel):
     system_type: SystemType = SystemType.mock
     scenario: Optional[str] = None
     metadata: Optional[RunMetadata] = None
+    # WebSocket coalescing window for this run in ms (None: server default).
+    ws_coalesce_ms: Optional[int] = Field(None, ge=0, le=10_000)
+    scheduling: Scheduling = Scheduling.scenario
+    # Steps of this run emitting at once (None: SIM_MAX_CONCURRENCY).
+    max_concurrency: Optional[int] = Field(None, ge=1, le=256)
 
 
 class CreateStepRequest(BaseModel):
+    step_id: Optional[str] = None  # client-assigned ids let a batch reference its own parents
     run_id: str
     parent_step_id: Optional[str] = None
     name: str
     type: StepType
+    model: Optional[str] = None
     input: dict[str, Any] = Field(default_factory=dict)
+
+
+class SetRateRequest(BaseModel):
+    model: str
+    prompt: float = Field(ge=0)  # USD per 1K prompt tokens
+    completion: float = Field(ge=0)  # USD per 1K completion tokens
+    effective_from: Optional[str] = None  # ISO-8601; None: since forever
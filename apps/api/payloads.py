@@ -0,0 +1,241 @@
+"""Content-addressed store for large step payload values.
+
+Steps keep small ``input``/``output`` values inline. A top-level value whose
+JSON encoding is at least ``inline_max`` bytes is stored once, keyed by a
+hash of that encoding, and the step holds a reference in its place::
+
+    {"system": {"$blob": "9f86d081884c7d65...", "bytes": 4002}}
+
+Identical system prompts, tool schemas and retrieved documents repeated
+across steps then share one copy, and step lists, run trees and WebSocket
+frames carry the reference instead of the value. ``GET
+/api/steps/{step_id}/payload`` returns a step's payloads resolved.
+
+So that no user value is taken for a reference, top-level values that
+have a ``$blob`` key of their own are escaped when payloads enter the
+store (see ``escape``)::
+
+    {"meta": {"$blob": null, "value": {"$blob": "not a reference"}}}
+
+and unwrapped again wherever payloads are resolved.
+
+Blobs are never removed: the store, like the step store, only grows.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import zlib
+from hashlib import blake2b
+from typing import Any, Optional
+
+from serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+REF_KEY = "$blob"
+
+# Every zlib stream starts with 0x78 ("x"), which no JSON value does, so
+# stored blobs say for themselves whether they are compressed.
+_ZLIB_HEADER = b"x"
+
+
+def is_ref(value: Any) -> bool:
+    return type(value) is dict and type(value.get(REF_KEY)) is str
+
+
+def is_escaped(value: Any) -> bool:
+    return type(value) is dict and REF_KEY in value and value[REF_KEY] is None
+
+
+def escape(payload: dict) -> dict:
+    """Raw ``payload`` with each top-level value that has a ``$blob`` key
+    wrapped as ``{"$blob": None, "value": value}``.
+
+    Applied once, to payloads from clients and from durable rows, before
+    they reach ``externalize``; after that every ``$blob`` key at the top
+    level is a reference or an escape. Returns ``payload`` itself when
+    nothing needs escaping.
+    """
+    escaped: Optional[dict] = None
+    for key, value in payload.items():
+        if type(value) is dict and REF_KEY in value:
+            if escaped is None:
+                escaped = dict(payload)
+            escaped[key] = {REF_KEY: None, "value": value}
+    return payload if escaped is None else escaped
+
+
+class BlobStore:
+    """Blobs in process memory, keyed by content hash."""
+
+    def __init__(self, inline_max: int = 1024, compress: bool = False) -> None:
+        self.inline_max = inline_max
+        self.compress = compress
+        self._blobs: dict[str, bytes] = {}
+        # One reference object per blob, shared by every step that holds it.
+        self._refs: dict[str, dict] = {}
+        self.stored_bytes = 0  # after compression
+        self.raw_bytes = 0
+        self.refs = 0  # values moved out of steps, duplicates included
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._blobs
+
+    def _read(self, key: str) -> Optional[bytes]:
+        return self._blobs.get(key)
+
+    def _write(self, key: str, data: bytes) -> None:
+        self._blobs[key] = data
+
+    def put(self, data: bytes) -> str:
+        """Store encoded JSON once; returns its key."""
+        key = blake2b(data, digest_size=16).hexdigest()
+        self.refs += 1
+        if key not in self:
+            # Copied to an exact-size object: orjson's output keeps its
+            # write buffer allocated (see step_store._payload).
+            stored = zlib.compress(data) if self.compress else bytes(memoryview(data))
+            self._write(key, stored)
+            self.stored_bytes += len(stored)
+            self.raw_bytes += len(data)
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Encoded JSON stored under ``key``, or None if it is not here."""
+        data = self._read(key)
+        if data is not None and data[:1] == _ZLIB_HEADER:
+            return zlib.decompress(data)
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "blobs": len(self), "refs": self.refs,
+            "raw_bytes": self.raw_bytes, "stored_bytes": self.stored_bytes,
+        }
+
+    # ── Payloads ─────────────────────────────────────────────────────────
+
+    def externalize(self, payload: dict) -> dict:
+        """``payload`` with its large values replaced by references.
+
+        Returns ``payload`` itself when nothing is moved, so payloads that
+        are already externalized cost a scan of their top-level values.
+        """
+        moved: Optional[dict] = None
+        for key, value in payload.items():
+            if type(value) is str:
+                # A string encodes to at least its length plus quotes.
+                if len(value) + 2 < self.inline_max:
+                    continue
+            elif not isinstance(value, (dict, list)) or (type(value) is dict and REF_KEY in value):
+                continue  # references and escaped values stay as they are
+            data = dumps(value)
+            if len(data) < self.inline_max:
+                continue
+            if moved is None:
+                moved = dict(payload)
+            blob = self.put(data)
+            ref = self._refs.get(blob)
+            if ref is None:
+                ref = self._refs[blob] = {REF_KEY: blob, "bytes": len(data)}
+            moved[key] = ref
+        return payload if moved is None else moved
+
+    def resolve(self, payload: dict) -> dict:
+        """``payload`` with references replaced by their values and escaped
+        values unwrapped.
+
+        Raises KeyError for a reference to a blob that is not here.
+        """
+        if not any(type(v) is dict and REF_KEY in v for v in payload.values()):
+            return payload
+        return {k: self._resolve_value(v) for k, v in payload.items()}
+
+    def payload_json(self, payload: dict) -> bytes:
+        """Encoded JSON of the resolved ``payload``, spliced from the stored
+        blobs without decoding them. Raises KeyError like ``resolve``."""
+        if not any(type(v) is dict and REF_KEY in v for v in payload.values()):
+            return dumps(payload)
+        return b"{%s}" % b",".join(
+            b"%s:%s" % (dumps(k), self._blob(v[REF_KEY]) if is_ref(v) else dumps(self._resolve_value(v)))
+            for k, v in payload.items()
+        )
+
+    def _resolve_value(self, value: Any) -> Any:
+        if is_ref(value):
+            return loads(self._blob(value[REF_KEY]))
+        if is_escaped(value):
+            return value["value"]
+        return value
+
+    def _blob(self, key: str) -> bytes:
+        data = self.get(key)
+        if data is None:
+            raise KeyError(key)
+        return data
+
+
+class FileBlobStore(BlobStore):
+    """Blobs as files under a directory, one per key, which workers on the
+    same host (or a shared volume) can all read."""
+
+    def __init__(self, root: str, inline_max: int = 1024, compress: bool = False) -> None:
+        super().__init__(inline_max, compress)
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._known: set[str] = set()
+
+    def __len__(self) -> int:
+        return sum(len(files) for _, _, files in os.walk(self.root))
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._known:
+            return True
+        if os.path.exists(self._path(key)):
+            self._known.add(key)
+            return True
+        return False
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so readers never see a partial blob.
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._known.add(key)
+
+
+def create_blob_store(url: Optional[str] = None, inline_max: int = 1024, compress: bool = False) -> Optional[BlobStore]:
+    """Pick a payload store from a ``PAYLOAD_STORE``-style string.
+
+    ``file:///var/lib/uaop/blobs`` keeps blobs on disk, ``off`` keeps every
+    payload inline in its step; empty or ``memory://`` keeps blobs in
+    process memory.
+    """
+    if url == "off":
+        return None
+    if not url or url.startswith("memory://"):
+        return BlobStore(inline_max, compress)
+    scheme, _, rest = url.partition("://")
+    if scheme == "file":
+        logger.info(f"Using payload store at {rest}")
+        return FileBlobStore(rest, inline_max, compress)
+    logger.warning(f"Unsupported PAYLOAD_STORE scheme {scheme!r}; using in-memory payload store")
+    return BlobStore(inline_max, compress)
@@ -0,0 +1,234 @@
+"""Scenarios compiled into flat, immutable execution plans.
+
+Compiling walks a ``ScenarioStep`` tree once and settles everything an
+emitted step needs that does not depend on the run: step types and end
+statuses as enums, ``StepError`` models, sibling order and dependency
+edges, and ``input``/``output``/``error`` encoded as JSON bytes, with large
+payload values already moved to the payload store. Replaying a
+plan then only stamps ids and timestamps. Costs are priced for the whole
+plan at once and priced again only when the rate table changes or one of
+its rates takes effect.
+
+Plans are cached per scenario object. Scenarios are not edited in place
+once compiled; replace one in ``SCENARIOS`` to change it.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from pydantic_core import to_json
+
+from database import db
+from models import Step, StepError, StepStatus, StepType
+from payloads import BlobStore, escape
+from pricing import rates
+from scenarios import SCENARIOS, ScenarioStep
+from serialization import model_bytes
+
+logger = logging.getLogger(__name__)
+
+# Encoded steps are the other fields followed by pre-encoded payloads,
+# which relies on the payloads being Step's last fields, in this order.
+_PAYLOAD_FIELDS = ("input", "output", "error")
+assert tuple(Step.model_fields)[-3:] == _PAYLOAD_FIELDS
+_HEAD_FIELDS = set(Step.model_fields) - set(_PAYLOAD_FIELDS)
+# Fields a completion changes besides output and error (see COMPLETION_FIELDS).
+_END_FIELDS = {"type", "status", "ended_at", "duration_ms"}
+_EMPTY = b"{}"
+_NULL = b"null"
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedStep:
+    """One step of a plan, ready to emit."""
+    name: str
+    type: StepType
+    end_type: StepType
+    end_status: StepStatus
+    delay_s: float
+    duration_ms: int
+    tokens_prompt: int
+    tokens_completion: int
+    model: Optional[str]
+    input: dict
+    output: dict
+    error: Optional[StepError]
+    input_json: bytes
+    output_json: bytes
+    error_json: bytes
+    parallel: bool
+    children: tuple[int, ...]  # plan indices, in dependency order
+    depends_on: tuple[int, ...]  # sibling indices to finish first
+
+    def running_json(self, step: Step) -> bytes:
+        """Encoded JSON of ``step`` as created from this plan step."""
+        return b'%s,"input":%s,"output":%s,"error":%s}' % (
+            model_bytes(step, include=_HEAD_FIELDS)[:-1], self.input_json, _EMPTY, _NULL,
+        )
+
+    def ended_json(self, step: Step) -> bytes:
+        """Encoded JSON of ``step`` once it has ended."""
+        return b'%s,"input":%s,"output":%s,"error":%s}' % (
+            model_bytes(step, include=_HEAD_FIELDS)[:-1],
+            self.input_json, self.output_json, self.error_json,
+        )
+
+    def end_changes(self, step: Step) -> bytes:
+        """Encoded fields that ending ``step`` changed, for delta frames."""
+        return b'%s,"output":%s,"error":%s}' % (
+            model_bytes(step, include=_END_FIELDS)[:-1], self.output_json, self.error_json,
+        )
+
+
+def dependency_order(children: list[ScenarioStep]) -> list[ScenarioStep]:
+    """Siblings ordered so each comes after the siblings it depends on,
+    otherwise keeping scenario order. Raises ValueError on an unknown
+    sibling name or a dependency cycle."""
+    names = {child.name for child in children}
+    for child in children:
+        unknown = set(child.depends_on) - names
+        if unknown:
+            raise ValueError(f"{child.name!r} depends on unknown siblings {sorted(unknown)}")
+    ordered: list[ScenarioStep] = []
+    pending = list(children)
+    while pending:
+        waiting = {child.name for child in pending}
+        ready = [child for child in pending if waiting.isdisjoint(child.depends_on)]
+        if not ready:
+            raise ValueError(f"Dependency cycle among {sorted(waiting)}")
+        ordered.extend(ready)
+        pending = [child for child in pending if child not in ready]
+    return ordered
+
+
+class ScenarioPlan:
+    """A compiled scenario: its steps in a flat tuple, root first."""
+
+    def __init__(self, name: str, steps: tuple[PlannedStep, ...]) -> None:
+        self.name = name
+        self.steps = steps
+        self._models = [s.model for s in steps]
+        self._tokens_prompt = np.array([s.tokens_prompt for s in steps], np.int64)
+        self._tokens_completion = np.array([s.tokens_completion for s in steps], np.int64)
+        self._costs: list[float] = []
+        self._rates_version = -1
+        self._priced_until: Optional[str] = None
+
+    def costs(self, at: str) -> list[float]:
+        """Cost of each step when started at ``at`` (a UTC ISO timestamp)."""
+        if rates.version != self._rates_version or (
+            self._priced_until is not None and at >= self._priced_until
+        ):
+            self._costs = rates.price(
+                self._models, [at] * len(self.steps), self._tokens_prompt, self._tokens_completion,
+            ).tolist()
+            self._rates_version = rates.version
+            self._priced_until = rates.next_change(self._models, at)
+        return self._costs
+
+
+def _plan_step(
+    scenario_step: ScenarioStep,
+    children: tuple[int, ...],
+    depends_on: tuple[int, ...],
+    payloads: Optional[BlobStore],
+) -> PlannedStep:
+    if scenario_step.should_fail:
+        end_type, end_status, output = StepType.error, StepStatus.failed, {}
+        error = StepError(**scenario_step.error_data) if scenario_step.error_data else StepError(
+            message="Step failed unexpectedly",
+        )
+    else:
+        end_type, end_status = StepType(scenario_step.type), StepStatus.completed
+        output, error = scenario_step.output_data, None
+    input_ = scenario_step.input_data
+    if payloads is not None:
+        input_, output = payloads.externalize(escape(input_)), payloads.externalize(escape(output))
+    return PlannedStep(
+        name=scenario_step.name,
+        type=StepType(scenario_step.type),
+        end_type=end_type,
+        end_status=end_status,
+        delay_s=scenario_step.delay_s,
+        duration_ms=scenario_step.duration_ms,
+        tokens_prompt=scenario_step.tokens_prompt,
+        tokens_completion=scenario_step.tokens_completion,
+        model=scenario_step.model,
+        input=input_,
+        output=output,
+        error=error,
+        input_json=to_json(input_, fallback=str),
+        output_json=to_json(output, fallback=str),
+        error_json=model_bytes(error) if error is not None else _NULL,
+        parallel=scenario_step.parallel,
+        children=children,
+        depends_on=depends_on,
+    )
+
+
+def compile_scenario(
+    scenario: ScenarioStep, name: str = "", payloads: Optional[BlobStore] = None,
+) -> ScenarioPlan:
+    """Flatten a scenario tree into a plan (depth first, root at index 0).
+    Large payload values are put in ``payloads``, if given.
+
+    Raises ValueError if siblings have unknown or cyclic dependencies.
+    """
+    # Indices first, so children and dependency edges can refer to them.
+    index: dict[int, int] = {}
+    order: list[ScenarioStep] = []
+    sorted_children: dict[int, list[ScenarioStep]] = {}
+    stack = [scenario]
+    while stack:
+        step = stack.pop()
+        index[id(step)] = len(order)
+        order.append(step)
+        children = sorted_children[id(step)] = dependency_order(step.children)
+        stack.extend(reversed(children))
+
+    depends_on: dict[int, tuple[int, ...]] = {}
+    for step in order:
+        by_name: dict[str, list[int]] = {}
+        for child in step.children:
+            by_name.setdefault(child.name, []).append(index[id(child)])
+        for child in step.children:
+            depends_on[id(child)] = tuple(i for dep in child.depends_on for i in by_name[dep])
+
+    return ScenarioPlan(name, tuple(
+        _plan_step(
+            step,
+            tuple(index[id(child)] for child in sorted_children[id(step)]),
+            depends_on.get(id(step), ()),
+            payloads,
+        )
+        for step in order
+    ))
+
+
+_plans: dict[str, tuple[ScenarioStep, ScenarioPlan]] = {}
+
+
+def plan_for(name: str) -> ScenarioPlan:
+    """The plan of ``SCENARIOS[name]``, compiled on first use and again if
+    the scenario has been replaced."""
+    scenario = SCENARIOS[name]
+    cached = _plans.get(name)
+    if cached is None or cached[0] is not scenario:
+        cached = _plans[name] = (scenario, compile_scenario(scenario, name, db.payloads))
+    return cached[1]
+
+
+def compile_plans() -> int:
+    """Compile every registered scenario ahead of its first run; returns the
+    number of steps compiled. A scenario that does not compile is logged
+    here and fails its runs."""
+    total = 0
+    for name in list(SCENARIOS):
+        try:
+            total += len(plan_for(name).steps)
+        except ValueError:
+            logger.exception(f"Scenario {name} does not compile")
+    return total
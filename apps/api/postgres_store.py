@@ -0,0 +1,477 @@
+"""Postgres-backed durable store (asyncpg pool, COPY-based write-behind)."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Optional
+
+import asyncpg
+
+from database import Database, RunKey
+from models import Run, RunFilter, RunStatus, Step, SystemType
+from payloads import BlobStore
+from pricing import RateTable
+from rollups import Rollup, Stats
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        TEXT PRIMARY KEY,
+    created_at    TIMESTAMPTZ NOT NULL,
+    updated_at    TIMESTAMPTZ NOT NULL,
+    status        TEXT NOT NULL,
+    system_type   TEXT NOT NULL,
+    root_step_id  TEXT,
+    metadata      JSONB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs (created_at DESC, run_id DESC);
+
+CREATE TABLE IF NOT EXISTS steps (
+    step_id            TEXT PRIMARY KEY,
+    run_id             TEXT NOT NULL,
+    parent_step_id     TEXT,
+    name               TEXT NOT NULL,
+    type               TEXT NOT NULL,
+    status             TEXT NOT NULL,
+    started_at         TIMESTAMPTZ NOT NULL,
+    ended_at           TIMESTAMPTZ,
+    duration_ms        INTEGER NOT NULL,
+    tokens_prompt      INTEGER NOT NULL,
+    tokens_completion  INTEGER NOT NULL,
+    cost_usd           DOUBLE PRECISION NOT NULL,
+    input              JSONB NOT NULL,
+    output             JSONB NOT NULL,
+    error              JSONB,
+    model              TEXT
+);
+ALTER TABLE steps ADD COLUMN IF NOT EXISTS model TEXT;
+CREATE INDEX IF NOT EXISTS idx_steps_run_started ON steps (run_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_steps_parent ON steps (parent_step_id);
+"""
+
+RUN_COLUMNS = (
+    "run_id", "created_at", "updated_at", "status", "system_type", "root_step_id", "metadata",
+)
+STEP_COLUMNS = (
+    "step_id", "run_id", "parent_step_id", "name", "type", "status", "started_at",
+    "ended_at", "duration_ms", "tokens_prompt", "tokens_completion", "cost_usd",
+    "input", "output", "error", "model",
+)
+
+# asyncpg prepares each query on first use and keeps it in the
+# connection's statement cache, so repeated reads skip parse/plan.
+GET_RUN = "SELECT * FROM runs WHERE run_id = $1"
+GET_STEPS_FOR_RUN = "SELECT * FROM steps WHERE run_id = $1 ORDER BY started_at"
+GET_STEPS_FOR_RUNS = "SELECT * FROM steps WHERE run_id = ANY($1::text[]) ORDER BY started_at"
+LIST_RUNS = "SELECT * FROM runs ORDER BY created_at DESC, run_id DESC LIMIT $1"
+GET_STEP_OWNERS = "SELECT step_id, run_id FROM steps WHERE step_id = ANY($1::text[])"
+
+# Aggregates of the runs at or older than the hydration horizon, which
+# stay in Postgres until something loads them.
+ARCHIVED_RUNS = """
+SELECT system_type, status, count(*) AS runs FROM runs
+WHERE (created_at, run_id) <= ($1, $2)
+GROUP BY system_type, status
+"""
+ARCHIVED_STEPS = """
+SELECT r.system_type, s.type, s.status, count(*) AS steps,
+       sum(s.tokens_prompt) AS tokens_prompt, sum(s.tokens_completion) AS tokens_completion,
+       sum(s.cost_usd) AS cost_usd, sum(s.duration_ms) AS duration_ms
+FROM steps s JOIN runs r ON r.run_id = s.run_id
+WHERE (r.created_at, r.run_id) <= ($1, $2)
+GROUP BY r.system_type, s.type, s.status
+"""
+
+
+def _upsert(table: str, source: str, columns: tuple[str, ...]) -> str:
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns[1:])
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {source} "
+        f"ON CONFLICT ({columns[0]}) DO UPDATE SET {updates}"
+    )
+
+
+UPSERT_RUNS = _upsert("runs", "runs_stage", RUN_COLUMNS)
+UPSERT_STEPS = _upsert("steps", "steps_stage", STEP_COLUMNS)
+
+
+def _ts(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def run_record(run: Run) -> tuple:
+    return (
+        run.run_id, _ts(run.created_at), _ts(run.updated_at), run.status.value,
+        run.system_type.value, run.root_step_id, run.metadata.model_dump_json(),
+    )
+
+
+def step_record(step: Step, payloads: Optional[BlobStore] = None) -> tuple:
+    """Record of ``step`` with its payloads resolved, so the table holds
+    whole steps whatever the payload store."""
+    input_, output = step.input, step.output
+    if payloads is not None:
+        input_, output = payloads.resolve(input_), payloads.resolve(output)
+    return (
+        step.step_id, step.run_id, step.parent_step_id, step.name, step.type.value,
+        step.status.value, _ts(step.started_at), _ts(step.ended_at), step.duration_ms,
+        step.tokens_prompt, step.tokens_completion, step.cost_usd,
+        json.dumps(input_, default=str), json.dumps(output, default=str),
+        step.error.model_dump_json() if step.error else None, step.model,
+    )
+
+
+def run_from_record(row: asyncpg.Record) -> Run:
+    return Run(
+        run_id=row["run_id"], created_at=_iso(row["created_at"]),
+        updated_at=_iso(row["updated_at"]), status=row["status"],
+        system_type=row["system_type"], root_step_id=row["root_step_id"],
+        metadata=json.loads(row["metadata"]),
+    )
+
+
+def step_from_record(row: asyncpg.Record) -> Step:
+    return Step(
+        step_id=row["step_id"], run_id=row["run_id"], parent_step_id=row["parent_step_id"],
+        name=row["name"], type=row["type"], status=row["status"],
+        started_at=_iso(row["started_at"]), ended_at=_iso(row["ended_at"]),
+        duration_ms=row["duration_ms"], tokens_prompt=row["tokens_prompt"],
+        tokens_completion=row["tokens_completion"], cost_usd=row["cost_usd"], model=row["model"],
+        input=json.loads(row["input"]), output=json.loads(row["output"]),
+        error=json.loads(row["error"]) if row["error"] else None,
+    )
+
+
+class PostgresDatabase(Database):
+    """Durable store on Postgres via a bounded asyncpg connection pool.
+
+    Like the SQLite store, reads are served from the in-memory indexes and
+    writes are handed to a background flusher. Pending writes are keyed by
+    id, so a step created and completed between flushes is written once.
+    Each flush COPYs the pending rows into a temporary staging table and
+    upserts them in a single transaction.
+
+    ``start()`` loads the ``hydrate_runs`` most recent runs. Older runs
+    stay in Postgres behind a horizon (the newest run not loaded):
+    ``load_runs`` pages through them with SQL, ``load_run`` fetches one on
+    demand, and ``stats()`` adds their totals, summed in SQL at start.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        min_pool_size: int = 2,
+        max_pool_size: int = 10,
+        flush_interval_s: float = 0.05,
+        hydrate_runs: int = 1000,
+        max_backlog: int = 50_000,
+        connect_attempts: int = 10,
+        columnar: bool = False,
+        payloads: Optional[BlobStore] = None,
+    ) -> None:
+        super().__init__(columnar, payloads)
+        # asyncpg takes a plain libpq DSN, not the SQLAlchemy dialect form.
+        scheme, _, rest = url.partition("://")
+        self.dsn = f"{scheme.split('+')[0]}://{rest}"
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.flush_interval_s = flush_interval_s
+        self.hydrate_runs = hydrate_runs
+        self.max_backlog = max_backlog
+        self.connect_attempts = connect_attempts
+
+        # Key of the newest run left in Postgres at start, None if all were
+        # loaded, and the totals of the runs at or behind it by system_type.
+        self._horizon: Optional[RunKey] = None
+        self._archived: dict[str, Stats] = {}
+
+        self._pool: Optional[asyncpg.Pool] = None
+        self._pending_runs: dict[str, Run] = {}
+        self._pending_steps: dict[str, Step] = {}
+        self._wake = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    # ── Lifecycle ────────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        conn = await self._connect()
+        try:
+            await conn.execute(SCHEMA)
+        finally:
+            await conn.close()
+        self._pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_pool_size,
+            max_size=self.max_pool_size,
+        )
+        async with self._pool.acquire() as conn:
+            # One extra run tells whether any are left behind.
+            rows = await conn.fetch(LIST_RUNS, self.hydrate_runs + 1)
+            if len(rows) > self.hydrate_runs:
+                horizon = rows.pop()
+                self._horizon = (_iso(horizon["created_at"]), horizon["run_id"])
+                await self._load_archived_stats(conn, horizon["created_at"], horizon["run_id"])
+            for row in reversed(rows):
+                Database.create_run(self, run_from_record(row))
+            for step_row in await conn.fetch(GET_STEPS_FOR_RUNS, [row["run_id"] for row in rows]):
+                Database.create_step(self, self.escape_payloads(step_from_record(step_row)))
+        logger.info(f"Postgres store: loaded {len(self.runs)} runs, {len(self.steps)} steps")
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _connect(self) -> asyncpg.Connection:
+        """Connect, retrying with backoff while the server is still starting."""
+        delay = 0.5
+        for _ in range(self.connect_attempts - 1):
+            try:
+                return await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.CannotConnectNowError) as exc:
+                logger.warning(f"Postgres not reachable ({exc}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10.0)
+        return await asyncpg.connect(self.dsn)
+
+    async def _load_archived_stats(self, conn: asyncpg.Connection, created_at: datetime, run_id: str) -> None:
+        for row in await conn.fetch(ARCHIVED_RUNS, created_at, run_id):
+            stats = self._archived.setdefault(row["system_type"], Stats())
+            stats.runs += row["runs"]
+            stats.runs_by_status[row["status"]] += row["runs"]
+        for row in await conn.fetch(ARCHIVED_STEPS, created_at, run_id):
+            stats = self._archived.setdefault(row["system_type"], Stats())
+            stats.totals.add(Rollup(
+                row["tokens_prompt"], row["tokens_completion"], row["cost_usd"], row["duration_ms"],
+                row["steps"] if row["status"] == "failed" else 0,
+            ))
+            stats.steps += row["steps"]
+            stats.steps_by_type[row["type"]] += row["steps"]
+            stats.steps_by_status[row["status"]] += row["steps"]
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._pool is not None:
+            await self.flush()
+            await self._pool.close()
+            self._pool = None
+
+    # ── Reads ────────────────────────────────────────────────────────────
+
+    async def load_run(self, run_id: str) -> Optional[Run]:
+        run = self.get_run(run_id)
+        if run is not None or self._pool is None:
+            return run
+        async with self._pool.acquire() as conn:
+            row = await conn.fetchrow(GET_RUN, run_id)
+            if row is None:
+                return None
+            run = Database.create_run(self, run_from_record(row))
+            for step_row in await conn.fetch(GET_STEPS_FOR_RUN, run_id):
+                Database.create_step(self, self.escape_payloads(step_from_record(step_row)))
+        if self._horizon is not None and (run.created_at, run.run_id) <= self._horizon:
+            # Counted in memory from now on, so no longer among the archived.
+            archived = self._archived.get(run.system_type.value)
+            if archived is not None:
+                archived.add(self._run_stats[run_id], -1)
+        return run
+
+    async def load_runs(
+        self,
+        limit: int = 50,
+        *,
+        before: Optional[RunKey] = None,
+        after: Optional[RunKey] = None,
+        status: Optional[RunStatus] = None,
+        system_type: Optional[SystemType] = None,
+        user_id: Optional[str] = None,
+        tags: Optional[list[str]] = None,
+    ) -> list[Run]:
+        """Runs newer than the horizon come from memory, older ones from
+        Postgres, so pages continue past the runs loaded at start."""
+        horizon = self._horizon
+        filters = dict(status=status, system_type=system_type, user_id=user_id, tags=tags)
+        if horizon is None or self._pool is None:
+            return self.list_runs(limit, before=before, after=after, **filters)
+        run_filter = RunFilter(status=status, system_type=system_type, user_id=user_id, tags=tags or [])
+        if after is not None:
+            older = await self._fetch_runs(limit, run_filter, after=after) if after < horizon else []
+            newer = []
+            if len(older) < limit:
+                newer = self.list_runs(limit - len(older), after=max(after, horizon), **filters)
+            return newer + older[::-1]
+        page = []
+        if before is None or before > horizon:
+            page = [
+                run for run in self.list_runs(limit, before=before, **filters)
+                if (run.created_at, run.run_id) > horizon
+            ]
+        if len(page) < limit:
+            page += await self._fetch_runs(limit - len(page), run_filter, before=before)
+        return page
+
+    async def _fetch_runs(
+        self,
+        limit: int,
+        run_filter: RunFilter,
+        *,
+        before: Optional[RunKey] = None,
+        after: Optional[RunKey] = None,
+    ) -> list[Run]:
+        """Up to ``limit`` runs at or behind the horizon, moving away from
+        the cursor like ``Database._walk_runs``."""
+        args: list = []
+
+        def arg(value) -> str:
+            args.append(value)
+            return f"${len(args)}"
+
+        clauses = [f"(created_at, run_id) <= ({arg(_ts(self._horizon[0]))}, {arg(self._horizon[1])})"]
+        if before is not None:
+            clauses.append(f"(created_at, run_id) < ({arg(_ts(before[0]))}, {arg(before[1])})")
+        if after is not None:
+            clauses.append(f"(created_at, run_id) > ({arg(_ts(after[0]))}, {arg(after[1])})")
+        if run_filter.status is not None:
+            clauses.append(f"status = {arg(run_filter.status.value)}")
+        if run_filter.system_type is not None:
+            clauses.append(f"system_type = {arg(run_filter.system_type.value)}")
+        if run_filter.user_id is not None:
+            clauses.append(f"metadata->>'user_id' = {arg(run_filter.user_id)}")
+        if run_filter.tags:
+            clauses.append(f"metadata->'tags' @> {arg(json.dumps(run_filter.tags))}::jsonb")
+        order = "ASC" if after is not None else "DESC"
+        query = (
+            f"SELECT * FROM runs WHERE {' AND '.join(clauses)} "
+            f"ORDER BY created_at {order}, run_id {order} LIMIT {arg(limit)}"
+        )
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(query, *args)
+        # A run loaded since start may have newer writes still pending.
+        return [self.runs.get(row["run_id"]) or run_from_record(row) for row in rows]
+
+    async def load_step_owners(self, step_ids: list[str]) -> dict[str, str]:
+        owners = await super().load_step_owners(step_ids)
+        missing = [sid for sid in step_ids if sid not in owners]
+        if missing and self._horizon is not None and self._pool is not None:
+            async with self._pool.acquire() as conn:
+                rows = await conn.fetch(GET_STEP_OWNERS, missing)
+            owners.update((row["step_id"], row["run_id"]) for row in rows)
+        return owners
+
+    def stats(self) -> dict:
+        if not self._archived:
+            return super().stats()
+        overall = Stats()
+        overall.add(self._global_stats)
+        by_type: dict[str, Stats] = {}
+        for source in (self._type_stats, self._archived):
+            for key, stats in source.items():
+                by_type.setdefault(key, Stats()).add(stats)
+        for stats in self._archived.values():
+            overall.add(stats)
+        return {
+            "global": overall.as_dict(),
+            "by_system_type": {k: v.as_dict() for k, v in by_type.items() if v.runs or v.steps},
+        }
+
+    # ── Write-behind ─────────────────────────────────────────────────────
+
+    def create_run(self, run: Run) -> Run:
+        super().create_run(run)
+        self._pending_runs[run.run_id] = run
+        self._wake.set()
+        return run
+
+    def update_run(self, run: Run) -> Run:
+        super().update_run(run)
+        self._pending_runs[run.run_id] = run
+        self._wake.set()
+        return run
+
+    def create_step(self, step: Step) -> Step:
+        super().create_step(step)
+        self._pending_steps[step.step_id] = step
+        self._wake.set()
+        return step
+
+    def update_step(self, step: Step) -> Step:
+        super().update_step(step)
+        self._pending_steps[step.step_id] = step
+        self._wake.set()
+        return step
+
+    def create_steps(self, steps: list[Step]) -> list[Step]:
+        super().create_steps(steps)
+        self._pending_steps.update((s.step_id, s) for s in steps)
+        self._wake.set()
+        return steps
+
+    def reprice(self, rates: RateTable, run_id: Optional[str] = None) -> dict[str, list[str]]:
+        changed = super().reprice(rates, run_id)
+        if changed:
+            self._pending_steps.update(
+                (sid, self.steps[sid]) for ids in changed.values() for sid in ids
+            )
+            self._wake.set()
+        return changed
+
+    async def wait_for_capacity(self) -> None:
+        while len(self._pending_steps) > self.max_backlog:
+            self._wake.set()
+            await asyncio.sleep(self.flush_interval_s)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Postgres flush failed; retrying")
+            # Let more writes accumulate so each COPY carries a real batch.
+            await asyncio.sleep(self.flush_interval_s)
+
+    async def flush(self) -> None:
+        """Write all pending runs and steps in one transaction."""
+        if not (self._pending_runs or self._pending_steps) or self._pool is None:
+            return
+        runs, self._pending_runs = self._pending_runs, {}
+        steps, self._pending_steps = self._pending_steps, {}
+        try:
+            async with self._pool.acquire() as conn, conn.transaction():
+                if runs:
+                    await self._copy_upsert(conn, "runs", RUN_COLUMNS, UPSERT_RUNS,
+                                            [run_record(r) for r in runs.values()])
+                if steps:
+                    await self._copy_upsert(conn, "steps", STEP_COLUMNS, UPSERT_STEPS,
+                                            [step_record(s, self.payloads) for s in steps.values()])
+        except BaseException:
+            # Put the batch back unless newer versions were queued meanwhile.
+            self._pending_runs = {**runs, **self._pending_runs}
+            self._pending_steps = {**steps, **self._pending_steps}
+            self._wake.set()
+            raise
+
+    @staticmethod
+    async def _copy_upsert(
+        conn: asyncpg.Connection,
+        table: str,
+        columns: tuple[str, ...],
+        upsert: str,
+        records: list[tuple],
+    ) -> None:
+        stage = f"{table}_stage"
+        await conn.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table}) ON COMMIT DELETE ROWS"
+        )
+        await conn.copy_records_to_table(stage, records=records, columns=columns)
+        await conn.execute(upsert)
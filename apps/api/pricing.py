@@ -0,0 +1,207 @@
+"""Per-model token rates with effective dates, and vectorized (re)pricing.
+
+A ``RateTable`` keeps, per model, a history of per-1K-token rates, each
+effective from a UTC timestamp; a step is priced at the rate in effect when
+it started. ``cost`` prices one step as it is written, ``price`` prices
+whole token columns with NumPy, which is what bulk re-pricing uses after a
+rate change.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from bisect import bisect_right
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "default"
+
+# Cost per 1K tokens (USD), effective since forever unless overridden.
+DEFAULT_RATES = {
+    "gpt-4": (0.03, 0.06),
+    "claude-3.5": (0.003, 0.015),
+    DEFAULT_MODEL: (0.01, 0.03),
+}
+
+# Timestamps are compared as UTC ISO-8601 strings cut to whole seconds,
+# which sort chronologically, so millions of them need no datetime parsing.
+_TS_LEN = 19
+_TS_DTYPE = f"U{_TS_LEN}"
+EPOCH = "1970-01-01T00:00:00"
+
+
+def _normalize(value: Optional[str]) -> str:
+    """An effective date as a UTC ``YYYY-MM-DDTHH:MM:SS`` string."""
+    if not value:
+        return EPOCH
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+@dataclass(frozen=True)
+class Rate:
+    """USD per 1K prompt/completion tokens from ``effective_from`` on."""
+    effective_from: str
+    prompt: float
+    completion: float
+
+
+class RateTable:
+    """Rate history per model. Unknown (or missing) models are priced at
+    ``default``; steps older than a model's first rate get that rate."""
+
+    def __init__(self) -> None:
+        self._history: dict[str, list[Rate]] = {}
+        self._starts: dict[str, list[str]] = {}
+        self.version = 0  # bumped on every change, for caches of computed costs
+
+    @classmethod
+    def with_defaults(cls) -> RateTable:
+        table = cls()
+        for model, (prompt, completion) in DEFAULT_RATES.items():
+            table.set_rate(model, prompt, completion)
+        return table
+
+    @classmethod
+    def from_dict(cls, data: dict) -> RateTable:
+        """Build from ``{model: [{"prompt", "completion", "effective_from"?}, ...]}``
+        (a single object instead of a list is one rate effective since forever)."""
+        table = cls()
+        for model, entries in data.items():
+            for entry in entries if isinstance(entries, list) else [entries]:
+                table.set_rate(model, entry["prompt"], entry["completion"], entry.get("effective_from"))
+        if DEFAULT_MODEL not in table._history:
+            prompt, completion = DEFAULT_RATES[DEFAULT_MODEL]
+            table.set_rate(DEFAULT_MODEL, prompt, completion)
+        return table
+
+    def set_rate(
+        self, model: str, prompt: float, completion: float, effective_from: Optional[str] = None,
+    ) -> Rate:
+        """Add a rate (replacing one with the same effective date)."""
+        rate = Rate(_normalize(effective_from), prompt, completion)
+        history = self._history.setdefault(model, [])
+        starts = self._starts.setdefault(model, [])
+        i = bisect_right(starts, rate.effective_from)
+        if i and starts[i - 1] == rate.effective_from:
+            history[i - 1] = rate
+        else:
+            history.insert(i, rate)
+            starts.insert(i, rate.effective_from)
+        self.version += 1
+        return rate
+
+    def _model(self, model: Optional[str]) -> str:
+        return model if model in self._history else DEFAULT_MODEL
+
+    def rate(self, model: Optional[str], at: Optional[str] = None) -> Rate:
+        """The rate in effect at ``at`` (a UTC ISO timestamp; now if omitted)."""
+        model = self._model(model)
+        at = (at or datetime.now(timezone.utc).isoformat())[:_TS_LEN]
+        i = bisect_right(self._starts[model], at) - 1
+        return self._history[model][max(i, 0)]
+
+    def next_change(self, models: Iterable[Optional[str]], at: str) -> Optional[str]:
+        """The first effective date after ``at`` among the rates of ``models``
+        (None if none is scheduled): costs priced at ``at`` hold until then."""
+        at = at[:_TS_LEN]
+        upcoming = []
+        for model in {self._model(m) for m in models}:
+            starts = self._starts[model]
+            i = bisect_right(starts, at)
+            if i < len(starts):
+                upcoming.append(starts[i])
+        return min(upcoming, default=None)
+
+    def cost(
+        self,
+        tokens_prompt: int,
+        tokens_completion: int,
+        model: Optional[str] = None,
+        at: Optional[str] = None,
+    ) -> float:
+        """Cost in USD of one step started at ``at`` (now if omitted)."""
+        rate = self.rate(model, at)
+        # NumPy rounding, so bulk re-pricing reproduces the same values.
+        return float(np.round(
+            (tokens_prompt / 1000) * rate.prompt
+            + (tokens_completion / 1000) * rate.completion,
+            6,
+        ))
+
+    def price(
+        self,
+        models: Sequence[Optional[str]],
+        started_at: Sequence[str],
+        tokens_prompt: np.ndarray,
+        tokens_completion: np.ndarray,
+    ) -> np.ndarray:
+        """Costs of many steps at once, given as parallel columns."""
+        codes = {m: i for i, m in enumerate(set(models))}
+        return self.price_coded(
+            np.fromiter(map(codes.__getitem__, models), np.intp, len(models)), list(codes),
+            np.asarray(started_at, dtype=_TS_DTYPE), tokens_prompt, tokens_completion,
+        )
+
+    def price_coded(
+        self,
+        model_codes: np.ndarray,
+        model_names: Sequence[Optional[str]],
+        started_at: np.ndarray,
+        tokens_prompt: np.ndarray,
+        tokens_completion: np.ndarray,
+    ) -> np.ndarray:
+        """Costs of steps whose models are codes into ``model_names`` and
+        whose start times are UTC ISO strings or int64 epoch microseconds.
+
+        Each table model its steps resolve to costs one ``searchsorted`` of
+        their start times over its rate history; the rest is array math.
+        """
+        n = len(model_codes)
+        resolved: dict[str, int] = {}
+        # Map input codes to the table model each is priced under.
+        to_resolved = np.array(
+            [resolved.setdefault(self._model(m), len(resolved)) for m in model_names], np.intp,
+        )
+        codes = to_resolved[model_codes] if len(resolved) > 1 else None
+        prompt_rate = np.empty(n)
+        completion_rate = np.empty(n)
+        for model, code in resolved.items():
+            history = self._history[model]
+            starts = self._starts[model]
+            if started_at.dtype.kind == "U":
+                edges = np.asarray(starts, dtype=_TS_DTYPE)
+            else:
+                edges = np.asarray(starts, dtype="datetime64[us]").astype(np.int64)
+            rows = slice(None) if codes is None else codes == code
+            i = np.searchsorted(edges, started_at[rows], side="right") - 1
+            np.maximum(i, 0, out=i)
+            prompt_rate[rows] = np.array([r.prompt for r in history])[i]
+            completion_rate[rows] = np.array([r.completion for r in history])[i]
+        costs = (tokens_prompt / 1000) * prompt_rate + (tokens_completion / 1000) * completion_rate
+        return np.round(costs, 6)
+
+    def as_dict(self) -> dict[str, list[dict]]:
+        return {model: [asdict(r) for r in history] for model, history in self._history.items()}
+
+
+def load_rates(path: Optional[str] = None) -> RateTable:
+    """The built-in rates, or the table in the JSON file at ``path``."""
+    if not path:
+        return RateTable.with_defaults()
+    with open(path) as f:
+        table = RateTable.from_dict(json.load(f))
+    logger.info(f"Loaded cost rates for {len(table.as_dict())} models from {path}")
+    return table
+
+
+# Singleton
+rates = load_rates(os.getenv("COST_RATES_FILE"))
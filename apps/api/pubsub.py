@@ -0,0 +1,293 @@
+"""Pub/sub buses that carry broadcasts between API worker processes.
+
+Each worker keeps its own WebSocket subscribers and in-memory store. A bus
+relays every broadcast to the *other* workers, so a client connected to
+worker A sees steps ingested on worker B. The in-process bus does nothing
+(one worker needs no relay); the Unix-socket bus uses a tiny broker hosted
+by one of the workers; the Redis bus uses Redis pub/sub.
+"""
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+import uuid
+from typing import Callable, Optional
+
+from serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[bytes], None]
+
+_LENGTH = struct.Struct(">I")
+
+
+# ── Message format ─────────────────────────────────────────────────────────────
+
+def pack(header: dict, parts: list[bytes]) -> bytes:
+    """A JSON header line followed by raw byte parts (already-encoded JSON,
+    so nothing is re-encoded on the way through)."""
+    header["parts"] = [len(p) for p in parts]
+    return dumps(header) + b"\n" + b"".join(parts)
+
+
+def unpack(data: bytes) -> tuple[dict, list[bytes]]:
+    end = data.index(b"\n")
+    header = loads(data[:end])
+    parts, offset = [], end + 1
+    for length in header["parts"]:
+        parts.append(data[offset:offset + length])
+        offset += length
+    return header, parts
+
+
+# ── Buses ──────────────────────────────────────────────────────────────────────
+
+class Bus:
+    """In-process bus: with a single worker there is nobody to relay to.
+
+    Cross-process buses override ``publish`` to send a message to every
+    other worker and call the ``start`` handler for messages from them.
+    Messages are never echoed back to the worker that published them.
+    """
+
+    remote = False
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+
+    def publish(self, data: bytes) -> None:
+        """Queue a message for the other workers; never blocks."""
+
+    async def close(self) -> None:
+        pass
+
+
+class UnixSocketBus(Bus):
+    """Cross-process bus over a Unix socket, for workers on one host.
+
+    Whichever worker holds ``<path>.lock`` hosts the broker, which relays
+    each length-prefixed message to every other connection. Every worker,
+    the host included, connects as a client. If the host exits, the lock is
+    released and the survivors elect a new one when they reconnect.
+    Messages published while disconnected are dropped.
+
+    Writes are bounded by ``max_buffer`` bytes per connection: past it, a
+    worker drops what it publishes until the broker catches up, and the
+    broker disconnects a peer that stops reading (it reconnects and
+    starts over) rather than buffering for it without limit.
+    """
+
+    remote = True
+
+    def __init__(self, path: str, reconnect_s: float = 0.2, max_buffer: int = 8 << 20) -> None:
+        self.path = path
+        self.reconnect_s = reconnect_s
+        self.max_buffer = max_buffer
+        self._overflowing = False
+        self._lock_fd: Optional[int] = None
+        self._broker: Optional[asyncio.AbstractServer] = None
+        self._peers: set[asyncio.StreamWriter] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler) -> None:
+        await super().start(handler)
+        self._task = asyncio.create_task(self._run())
+        await self._connected.wait()
+
+    def publish(self, data: bytes) -> None:
+        if self._writer is None:
+            logger.warning("Bus disconnected; dropping broadcast")
+            return
+        if self._writer.transport.get_write_buffer_size() > self.max_buffer:
+            if not self._overflowing:
+                logger.warning("Bus broker is not keeping up; dropping broadcasts")
+                self._overflowing = True
+            return
+        self._overflowing = False
+        self._writer.write(_LENGTH.pack(len(data)) + data)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._broker is not None:
+            self._broker.close()
+            for peer in list(self._peers):
+                peer.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+
+    async def _run(self) -> None:
+        while True:
+            await self._maybe_host_broker()
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(self.reconnect_s)
+                continue
+            self._connected.set()
+            try:
+                while True:
+                    self._deliver(await self._read(reader))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.warning("Lost connection to the bus broker; reconnecting")
+            finally:
+                self._writer.close()
+                self._writer = None
+
+    def _deliver(self, data: bytes) -> None:
+        # A bad message or a failing handler must not end the relay.
+        try:
+            self._handler(data)
+        except Exception:
+            logger.exception("Failed to handle a bus message; skipping it")
+
+    @staticmethod
+    async def _read(reader: asyncio.StreamReader) -> bytes:
+        (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+        return await reader.readexactly(length)
+
+    async def _maybe_host_broker(self) -> None:
+        if self._broker is not None:
+            return
+        fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        self._lock_fd = fd
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left behind by a broker that died
+        self._broker = await asyncio.start_unix_server(self._relay, path=self.path)
+        logger.info(f"Hosting broadcast bus broker at {self.path}")
+
+    async def _relay(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._peers.add(writer)
+        try:
+            while True:
+                data = await self._read(reader)
+                frame = _LENGTH.pack(len(data)) + data
+                for peer in list(self._peers):
+                    if peer is writer:
+                        continue
+                    if peer.transport.get_write_buffer_size() > self.max_buffer:
+                        logger.warning("Bus peer is not reading; disconnecting it")
+                        self._peers.discard(peer)
+                        peer.transport.abort()
+                        continue
+                    peer.write(frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+
+class RedisBus(Bus):
+    """Cross-host bus over Redis pub/sub (needs the optional ``redis`` package).
+
+    If the subscription drops, it is re-established with backoff; messages
+    published meanwhile are missed, as Redis pub/sub does not store them.
+    """
+
+    remote = True
+
+    def __init__(self, url: str, channel: str = "uaop:broadcasts", reconnect_s: float = 0.2) -> None:
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.channel = channel
+        self.reconnect_s = reconnect_s
+        # Redis echoes a publisher's own messages; tag ours to skip them.
+        self.origin = uuid.uuid4().bytes
+        self._outbox: asyncio.Queue[bytes] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self, handler: Handler) -> None:
+        await super().start(handler)
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        self._tasks = [
+            asyncio.create_task(self._receive(pubsub)),
+            asyncio.create_task(self._send()),
+        ]
+
+    def publish(self, data: bytes) -> None:
+        self._outbox.put_nowait(self.origin + data)
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await self.client.aclose()
+
+    async def _send(self) -> None:
+        while True:
+            data = await self._outbox.get()
+            try:
+                await self.client.publish(self.channel, data)
+            except Exception:
+                logger.exception("Redis publish failed; dropping broadcast")
+
+    async def _receive(self, pubsub) -> None:
+        backoff_s = self.reconnect_s
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self.client.pubsub()
+                    await pubsub.subscribe(self.channel)
+                    logger.info("Resubscribed to the Redis broadcast channel")
+                backoff_s = self.reconnect_s
+                async for message in pubsub.listen():
+                    data = message.get("data")
+                    if message.get("type") != "message" or data[:16] == self.origin:
+                        continue
+                    try:
+                        self._handler(data[16:])
+                    except Exception:
+                        logger.exception("Failed to handle a bus message; skipping it")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Lost the Redis subscription; retrying in {backoff_s:.1f}s")
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+                pubsub = None
+            await asyncio.sleep(backoff_s)
+            backoff_s = min(backoff_s * 2, 10.0)
+
+
+def create_bus(url: Optional[str] = None) -> Bus:
+    """Pick a bus from a ``BROADCAST_BUS_URL``-style string.
+
+    ``unix:///tmp/uaop-bus.sock`` relays between workers on one host,
+    ``redis://host:6379/0`` across hosts; empty or ``memory://`` keeps
+    broadcasts in-process (single worker).
+    """
+    if not url or url.startswith("memory://"):
+        return Bus()
+    scheme, _, rest = url.partition("://")
+    if scheme == "unix":
+        logger.info(f"Using Unix-socket broadcast bus at {rest}")
+        return UnixSocketBus(rest)
+    if scheme in ("redis", "rediss"):
+        logger.info("Using Redis broadcast bus")
+        return RedisBus(url)
+    logger.warning(f"Unsupported BROADCAST_BUS_URL scheme {scheme!r}; using in-process bus")
+    return Bus()
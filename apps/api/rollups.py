@@ -0,0 +1,120 @@
+"""Token/cost/duration/error totals and counts summed over steps and runs."""
+from __future__ import annotations
+
+from collections import Counter
+
+from models import Step, StepStatus
+from serialization import dumps
+
+
+class Rollup:
+    """Additive totals of one step, a subtree or any other group of steps."""
+
+    __slots__ = ("tokens_prompt", "tokens_completion", "cost_usd", "duration_ms", "errors")
+
+    def __init__(
+        self,
+        tokens_prompt: int = 0,
+        tokens_completion: int = 0,
+        cost_usd: float = 0.0,
+        duration_ms: int = 0,
+        errors: int = 0,
+    ) -> None:
+        self.tokens_prompt = tokens_prompt
+        self.tokens_completion = tokens_completion
+        self.cost_usd = cost_usd
+        self.duration_ms = duration_ms
+        self.errors = errors
+
+    @classmethod
+    def of_step(cls, step: Step) -> Rollup:
+        """What a step contributes on its own, as currently stored."""
+        return cls(
+            step.tokens_prompt, step.tokens_completion, step.cost_usd, step.duration_ms,
+            1 if step.status == StepStatus.failed else 0,
+        )
+
+    def copy(self) -> Rollup:
+        return Rollup(
+            self.tokens_prompt, self.tokens_completion, self.cost_usd, self.duration_ms, self.errors,
+        )
+
+    def add(self, other: Rollup, sign: int = 1) -> None:
+        self.tokens_prompt += sign * other.tokens_prompt
+        self.tokens_completion += sign * other.tokens_completion
+        self.cost_usd += sign * other.cost_usd
+        self.duration_ms += sign * other.duration_ms
+        self.errors += sign * other.errors
+
+    def minus(self, other: Rollup) -> Rollup:
+        delta = self.copy()
+        delta.add(other, -1)
+        return delta
+
+    def as_dict(self) -> dict:
+        return {
+            "tokens_prompt": self.tokens_prompt,
+            "tokens_completion": self.tokens_completion,
+            # Repeated += / -= leaves float noise below the rate precision.
+            "cost_usd": round(self.cost_usd, 10),
+            "duration_ms": self.duration_ms,
+            "errors": self.errors,
+        }
+
+    def to_json(self) -> bytes:
+        return dumps(self.as_dict())
+
+
+class Stats:
+    """Running aggregates over a set of runs and their steps.
+
+    Kept per run, per system_type and globally; every step or run write
+    adjusts them by its delta, so reading them never scans steps.
+    """
+
+    __slots__ = ("totals", "steps", "steps_by_type", "steps_by_status", "runs", "runs_by_status")
+
+    def __init__(self) -> None:
+        self.totals = Rollup()
+        self.steps = 0
+        self.steps_by_type: Counter[str] = Counter()
+        self.steps_by_status: Counter[str] = Counter()
+        self.runs = 0
+        self.runs_by_status: Counter[str] = Counter()
+
+    def add_step(self, own: Rollup, step_type: str, status: str, sign: int = 1) -> None:
+        self.totals.add(own, sign)
+        self.steps += sign
+        self.steps_by_type[step_type] += sign
+        self.steps_by_status[status] += sign
+
+    def add_steps_of(self, other: Stats, sign: int = 1) -> None:
+        """Add (or remove) the step part of another aggregate."""
+        self.totals.add(other.totals, sign)
+        self.steps += sign * other.steps
+        for key, count in other.steps_by_type.items():
+            self.steps_by_type[key] += sign * count
+        for key, count in other.steps_by_status.items():
+            self.steps_by_status[key] += sign * count
+
+    def add_run(self, status: str, sign: int = 1) -> None:
+        self.runs += sign
+        self.runs_by_status[status] += sign
+
+    def add(self, other: Stats, sign: int = 1) -> None:
+        """Add (or remove) another aggregate, runs and steps alike."""
+        self.add_steps_of(other, sign)
+        self.runs += sign * other.runs
+        for key, count in other.runs_by_status.items():
+            self.runs_by_status[key] += sign * count
+
+    def as_dict(self) -> dict:
+        return {
+            **self.totals.as_dict(),
+            "tokens_total": self.totals.tokens_prompt + self.totals.tokens_completion,
+            "steps": self.steps,
+            "steps_by_type": {k: v for k, v in self.steps_by_type.items() if v},
+            "steps_by_status": {k: v for k, v in self.steps_by_status.items() if v},
+            "runs": self.runs,
+            "runs_by_status": {k: v for k, v in self.runs_by_status.items() if v},
+        }
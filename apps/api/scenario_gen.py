@@ -0,0 +1,265 @@
+"""Seeded synthetic scenarios: large, wide and deep ``ScenarioStep`` trees.
+
+The hand-written demo scenarios have about a dozen steps. ``generate`` builds
+trees the size of production agent runs from a ``GeneratorConfig``: depth and
+branching, parallel groups with joins, failures with retry chains, and
+lognormal payload sizes, token counts and delays. The same config and seed
+always give the same tree.
+
+``register`` adds a generated tree to ``SCENARIOS``, so ``run_simulation``,
+``POST /api/runs`` and ``loadgen.py`` can play it like any other scenario.
+``PRESETS`` are named configs. The ``SYNTHETIC_SCENARIOS`` environment
+variable (comma-separated preset names, or ``all``) registers them at API
+startup.
+
+    python scenario_gen.py            # shape of every preset
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import Iterable, Optional
+
+from scenarios import SCENARIO_LABELS, SCENARIOS, ScenarioStep
+
+WORDS = (
+    "agent context retrieval latency summary customer invoice policy model token "
+    "search result document schema request response analysis report cache index "
+    "query vector embedding plan tool output input error retry fallback user"
+).split()
+TOOLS = ("web_search", "sql_query", "http_get", "read_file", "vector_search", "crm_lookup", "run_tests")
+TASKS = ("Summarize", "Classify", "Extract", "Draft", "Review", "Rank", "Reason about", "Rewrite")
+
+
+@dataclass(frozen=True)
+class GeneratorConfig:
+    """Shape and content of a generated scenario.
+
+    Distributions given as ``(median, sigma)`` are lognormal.
+    """
+    seed: int = 0
+    depth: int = 6  # levels below the root (retries add levels on top)
+    branching: float = 2.5  # mean children of a step that has any
+    max_branching: int = 50
+    leaf_probability: float = 0.2  # a step ends its branch early
+    max_steps: int = 1000
+    parallel_probability: float = 0.5  # a step's children run concurrently
+    join_probability: float = 0.5  # a parallel group ends in a step that waits for the rest
+    failure_probability: float = 0.05
+    retry_probability: float = 0.8  # a failed step is retried (else its branch ends)
+    max_retries: int = 3
+    type_weights: tuple[tuple[str, float], ...] = (("llm", 0.5), ("tool", 0.35), ("plan", 0.15))
+    models: tuple[Optional[str], ...] = (None, "gpt-4", "claude-3.5")
+    payload_bytes: tuple[float, float] = (600, 1.0)
+    prompt_tokens: tuple[float, float] = (800, 0.8)
+    completion_tokens: tuple[float, float] = (250, 0.8)
+    delay_s: tuple[float, float] = (0.3, 0.6)
+    # LLM steps share one of this many system prompts (0: none), the way
+    # real agents resend the same instructions on every call.
+    system_prompts: int = 4
+    system_prompt_bytes: int = 4000
+
+
+@dataclass
+class _Builder:
+    config: GeneratorConfig
+    rng: random.Random
+    steps: int = 0
+    system_prompts: list[str] = field(default_factory=list)
+
+    def lognormal(self, median_sigma: tuple[float, float]) -> float:
+        median, sigma = median_sigma
+        return self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+    def text(self, size: float) -> str:
+        words = self.rng.choices(WORDS, k=max(1, int(size) // 6 + 1))
+        return " ".join(words)[: max(1, int(size))]
+
+    def step(self, step_type: Optional[str] = None) -> ScenarioStep:
+        cfg = self.config
+        self.steps += 1
+        n = self.steps
+        if step_type is None:
+            types, weights = zip(*cfg.type_weights)
+            step_type = self.rng.choices(types, weights)[0]
+        size = self.lognormal(cfg.payload_bytes)
+        delay_s = self.lognormal(cfg.delay_s)
+        step = ScenarioStep(
+            name=f"Step #{n}", type=step_type, delay_s=round(delay_s, 3),
+            duration_ms=int(delay_s * 1000 * self.rng.uniform(0.8, 3.0)),
+        )
+        if step_type == "tool":
+            tool = self.rng.choice(TOOLS)
+            step.name = f"Tool: {tool} #{n}"
+            step.input_data = {"tool": tool, "args": {"query": self.text(min(size, 200))}}
+            step.output_data = {"results": [{"id": f"r{i}", "snippet": self.text(size / 3)} for i in range(3)]}
+            return step
+        step.tokens_prompt = int(self.lognormal(cfg.prompt_tokens))
+        step.tokens_completion = int(self.lognormal(cfg.completion_tokens))
+        if step_type == "llm":
+            step.name = f"LLM: {self.rng.choice(TASKS)} #{n}"
+            step.model = self.rng.choice(cfg.models)
+            step.input_data = {"prompt": self.text(size / 2)}
+            if self.system_prompts:
+                step.input_data["system"] = self.rng.choice(self.system_prompts)
+            step.output_data = {"completion": self.text(size / 2)}
+        elif step_type == "plan":
+            step.name = f"Plan #{n}"
+            step.input_data = {"task": self.text(min(size, 300))}
+            step.output_data = {"plan": []}  # filled with child names
+        else:
+            step.name = f"Final Output #{n}" if step_type == "final" else f"{step_type.title()} #{n}"
+            step.input_data = {"summary": self.text(min(size, 200))}
+            step.output_data = {"result": self.text(size)}
+        return step
+
+    def fail(self, step: ScenarioStep) -> None:
+        step.should_fail = True
+        step.output_data = {}
+        step.error_data = {
+            "message": f"{step.name} failed: upstream returned an error",
+            "code": self.rng.choice(("TIMEOUT", "RATE_LIMITED", "UPSTREAM_5XX", "INVALID_OUTPUT")),
+            "stack": None,
+        }
+
+    def retries(self, step: ScenarioStep) -> tuple[ScenarioStep, bool]:
+        """Fail ``step`` and chain retries below it; returns the last
+        attempt and whether it succeeded."""
+        cfg = self.config
+        self.fail(step)
+        attempt = step
+        for k in range(1, cfg.max_retries + 1):
+            if self.steps >= cfg.max_steps - 1 or self.rng.random() >= cfg.retry_probability:
+                break
+            retry = self.step(step.type)
+            retry.name = f"Retry {k}: {step.name}"
+            retry.retry_of = step.name
+            retry.input_data = {**step.input_data, "retry": k}
+            attempt.children.append(retry)
+            attempt = retry
+            if self.rng.random() >= cfg.failure_probability:
+                return retry, True
+            self.fail(retry)
+        return attempt, False
+
+    def fan_out(self) -> int:
+        cfg = self.config
+        n = int(self.rng.expovariate(1 / cfg.branching) + 0.5)
+        return max(1, min(n, cfg.max_branching, cfg.max_steps - 1 - self.steps))
+
+
+def generate(config: GeneratorConfig = GeneratorConfig()) -> ScenarioStep:
+    """Build a scenario tree, breadth first, until ``depth`` or ``max_steps``."""
+    cfg = config
+    b = _Builder(cfg, random.Random(cfg.seed))
+    b.system_prompts = [b.text(cfg.system_prompt_bytes) for _ in range(cfg.system_prompts)]
+    root = b.step("plan")
+    root.name = "Synthetic Agent"
+    queue: deque[tuple[ScenarioStep, int]] = deque([(root, 0)])
+    while queue and b.steps < cfg.max_steps - 1:  # room for the final step
+        parent, level = queue.popleft()
+        # A branch ends early only while others go on, so a tree never dies out.
+        if level >= cfg.depth or (level and queue and b.rng.random() < cfg.leaf_probability):
+            continue
+        children = [b.step() for _ in range(b.fan_out())]
+        parent.parallel = len(children) > 1 and b.rng.random() < cfg.parallel_probability
+        if parent.parallel and b.steps < cfg.max_steps - 1 and b.rng.random() < cfg.join_probability:
+            join = b.step("llm")
+            join.name = f"Combine #{b.steps}"
+            join.depends_on = [c.name for c in children]
+            children.append(join)
+        parent.children.extend(children)
+        if parent.type == "plan":
+            parent.output_data["plan"] = [c.name for c in children]
+        gave_up: Optional[ScenarioStep] = None
+        for child in children:
+            if b.rng.random() < cfg.failure_probability:
+                child, succeeded = b.retries(child)
+                if not succeeded:
+                    gave_up = child  # the branch ends failed
+                    continue
+            queue.append((child, level + 1))
+        if not queue and gave_up is not None:
+            # Nothing else goes on, so the agent carries on past the failure.
+            queue.append((gave_up, level + 1))
+
+    final = b.step("final")
+    final.name = "Final Output"
+    final.depends_on = [c.name for c in root.children]
+    root.children.append(final)
+    return root
+
+
+def tree_stats(scenario: ScenarioStep) -> dict:
+    """Size and shape of a scenario tree."""
+    stats = {"steps": 0, "depth": 0, "max_fanout": 0, "failing": 0, "retries": 0,
+             "parallel_groups": 0, "payload_bytes": 0, "tokens": 0, "serial_delay_s": 0.0}
+    stack = [(scenario, 1)]
+    while stack:
+        step, level = stack.pop()
+        stats["steps"] += 1
+        stats["depth"] = max(stats["depth"], level)
+        stats["max_fanout"] = max(stats["max_fanout"], len(step.children))
+        stats["failing"] += step.should_fail
+        stats["retries"] += step.retry_of is not None
+        stats["parallel_groups"] += step.parallel
+        stats["payload_bytes"] += len(json.dumps(step.input_data)) + len(json.dumps(step.output_data))
+        stats["tokens"] += step.tokens_prompt + step.tokens_completion
+        stats["serial_delay_s"] += step.delay_s
+        stack.extend((child, level + 1) for child in step.children)
+    stats["serial_delay_s"] = round(stats["serial_delay_s"], 1)
+    return stats
+
+
+# ── Registration ─────────────────────────────────────────────────────────────
+
+PRESETS: dict[str, tuple[str, GeneratorConfig]] = {
+    "synthetic_wide": ("Synthetic: wide parallel fan-out", GeneratorConfig(
+        seed=1, depth=3, branching=25, max_branching=200, leaf_probability=0.1,
+        max_steps=1500, parallel_probability=0.9, join_probability=0.8,
+    )),
+    "synthetic_deep": ("Synthetic: deep chains with retries", GeneratorConfig(
+        seed=2, depth=150, branching=0.5, max_branching=2, leaf_probability=0.03, max_steps=400,
+        failure_probability=0.15, retry_probability=0.9, max_retries=5,
+    )),
+    "synthetic_large": ("Synthetic: 3,000-step agent run", GeneratorConfig(
+        seed=3, depth=10, branching=3.0, max_steps=3000, payload_bytes=(1500, 1.2),
+    )),
+}
+
+
+def register(name: str, config: GeneratorConfig, label: Optional[str] = None) -> ScenarioStep:
+    """Generate a scenario and add it to ``SCENARIOS`` under ``name``."""
+    scenario = SCENARIOS[name] = generate(config)
+    SCENARIO_LABELS[name] = label or f"Synthetic ({tree_stats(scenario)['steps']:,} steps)"
+    return scenario
+
+
+def register_presets(names: Iterable[str] | str) -> list[str]:
+    """Register presets by name (``"all"`` for every one); returns the names."""
+    if isinstance(names, str):
+        names = [n.strip() for n in names.split(",") if n.strip()]
+    names = list(PRESETS) if "all" in names else list(names)
+    unknown = set(names) - set(PRESETS)
+    if unknown:
+        raise ValueError(f"Unknown synthetic scenarios: {', '.join(sorted(unknown))}")
+    for name in names:
+        label, config = PRESETS[name]
+        register(name, config, label)
+    return names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("presets", nargs="*", default=list(PRESETS))
+    parser.add_argument("--seed", type=int, default=None, help="override each preset's seed")
+    args = parser.parse_args()
+    for name in args.presets:
+        _, config = PRESETS[name]
+        if args.seed is not None:
+            config = replace(config, seed=args.seed)
+        print(name, tree_stats(generate(config)))
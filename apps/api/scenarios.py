@@ -14,7 +14,10 @@ class ScenarioStep:
     duration_ms: int = 0  # simulated processing duration
     tokens_prompt: int = 0
     tokens_completion: int = 0
+    model: Optional[str] = None  # priced at the "default" rate if None
     children: list["ScenarioStep"] = field(default_factory=list)
+    parallel: bool = False  # children may run concurrently
+    depends_on: list[str] = field(default_factory=list)  # sibling names to finish first
     should_fail: bool = False
     retry_of: Optional[str] = None  # name of step this retries
     input_data: dict = field(default_factory=dict)
@@ -124,6 +127,7 @@ SCENARIOS: dict[str, ScenarioStep] = {
         tokens_completion=120,
         input_data={"task": "Research and summarize recent advances in quantum computing"},
         output_data={"plan": ["parallel_web_search", "synthesize", "write_summary"]},
+        parallel=True,
         children=[
             ScenarioStep(
                 name="Web Search: Quantum Overview",
@@ -172,38 +176,37 @@ SCENARIOS: dict[str, ScenarioStep] = {
                 duration_ms=1950,
                 input_data={"tool": "web_search", "args": {"query": "quantum computing industry market analysis 2026"}},
                 output_data={"results": [{"title": "Quantum Computing Market Report 2026", "url": "https://example.com/market", "snippet": "Market expected to reach $12.5B..."}]},
+            ),
+            ScenarioStep(
+                name="Synthesize All Findings",
+                type="llm",
+                depends_on=["Web Search: Quantum Overview", "Web Search: Recent Papers", "Web Search: Industry Analysis"],
+                delay_s=1.0,
+                duration_ms=2800,
+                tokens_prompt=2400,
+                tokens_completion=900,
+                input_data={"prompt": "Synthesize findings from all three research tracks into a coherent summary..."},
+                output_data={"completion": "Quantum computing in 2026 has reached an inflection point. IBM's Starling processor demonstrates that scale is achievable, while academic research confirms fault tolerance. The market has grown to $12.5B..."},
                 children=[
                     ScenarioStep(
-                        name="Synthesize All Findings",
+                        name="Write Final Summary",
                         type="llm",
-                        delay_s=1.0,
-                        duration_ms=2800,
-                        tokens_prompt=2400,
-                        tokens_completion=900,
-                        input_data={"prompt": "Synthesize findings from all three research tracks into a coherent summary..."},
-                        output_data={"completion": "Quantum computing in 2026 has reached an inflection point. IBM's Starling processor demonstrates that scale is achievable, while academic research confirms fault tolerance. The market has grown to $12.5B..."},
+                        delay_s=0.8,
+                        duration_ms=3200,
+                        tokens_prompt=1800,
+                        tokens_completion=1200,
+                        input_data={"prompt": "Write a polished executive summary of quantum computing advances in 2026..."},
+                        output_data={"completion": "# Quantum Computing: 2026 State of the Art\\n\\n## Executive Summary\\nQuantum computing has reached a critical milestone in 2026..."},
                         children=[
                             ScenarioStep(
-                                name="Write Final Summary",
-                                type="llm",
-                                delay_s=0.8,
-                                duration_ms=3200,
-                                tokens_prompt=1800,
-                                tokens_completion=1200,
-                                input_data={"prompt": "Write a polished executive summary of quantum computing advances in 2026..."},
-                                output_data={"completion": "# Quantum Computing: 2026 State of the Art\\n\\n## Executive Summary\\nQuantum computing has reached a critical milestone in 2026..."},
-                                children=[
-                                    ScenarioStep(
-                                        name="Final Output",
-                                        type="final",
-                                        delay_s=0.4,
-                                        duration_ms=80,
-                                        tokens_prompt=50,
-                                        tokens_completion=30,
-                                        input_data={"summary": "Research summary completed"},
-                                        output_data={"result": "Generated comprehensive quantum computing research summary with 3 source tracks, 6 key findings, and executive overview."},
-                                    ),
-                                ],
+                                name="Final Output",
+                                type="final",
+                                delay_s=0.4,
+                                duration_ms=80,
+                                tokens_prompt=50,
+                                tokens_completion=30,
+                                input_data={"summary": "Research summary completed"},
+                                output_data={"result": "Generated comprehensive quantum computing research summary with 3 source tracks, 6 key findings, and executive overview."},
                             ),
                         ],
                     ),
@@ -222,6 +225,7 @@ SCENARIOS: dict[str, ScenarioStep] = {
         tokens_completion=90,
         input_data={"task": "Fix the failing test in auth_service.py - TypeError on line 42"},
         output_data={"plan": ["read_files", "analyze", "search_docs", "generate_fix", "test"]},
+        parallel=True,
         children=[
             ScenarioStep(
                 name="Read Source File",
@@ -238,80 +242,79 @@ SCENARIOS: dict[str, ScenarioStep] = {
                 duration_ms=150,
                 input_data={"tool": "read_file", "args": {"path": "tests/test_auth.py"}},
                 output_data={"content": "def test_authenticate():\\n    service = AuthService()\\n    result = service.authenticate(mock_token)\\n    assert result == 'user_123'"},
+            ),
+            ScenarioStep(
+                name="Analyze Error Pattern",
+                type="llm",
+                depends_on=["Read Source File", "Read Test File"],
+                delay_s=0.8,
+                duration_ms=2100,
+                tokens_prompt=1200,
+                tokens_completion=450,
+                input_data={"prompt": "Analyze the TypeError in auth_service.py line 42. The code tries to access .user_id as an attribute but jwt.decode() returns a dict..."},
+                output_data={"completion": "The bug is on line 42 of auth_service.py. jwt.decode() returns a dictionary, not an object with attributes. The code uses decoded.user_id (attribute access) instead of decoded['user_id'] (dict key access).\\n\\nFix: Change `decoded.user_id` to `decoded['user_id']`"},
                 children=[
                     ScenarioStep(
-                        name="Analyze Error Pattern",
-                        type="llm",
-                        delay_s=0.8,
-                        duration_ms=2100,
-                        tokens_prompt=1200,
-                        tokens_completion=450,
-                        input_data={"prompt": "Analyze the TypeError in auth_service.py line 42. The code tries to access .user_id as an attribute but jwt.decode() returns a dict..."},
-                        output_data={"completion": "The bug is on line 42 of auth_service.py. jwt.decode() returns a dictionary, not an object with attributes. The code uses decoded.user_id (attribute access) instead of decoded['user_id'] (dict key access).\\n\\nFix: Change `decoded.user_id` to `decoded['user_id']`"},
+                        name="Search JWT Documentation",
+                        type="tool",
+                        delay_s=0.5,
+                        duration_ms=1400,
+                        input_data={"tool": "search_docs", "args": {"query": "PyJWT decode return type"}},
+                        output_data={"results": [{"doc": "jwt.decode() -> dict: Returns the decoded token payload as a dictionary"}]},
+                    ),
+                    ScenarioStep(
+                        name="Search Similar Issues",
+                        type="tool",
+                        delay_s=0.5,
+                        duration_ms=980,
+                        input_data={"tool": "search_codebase", "args": {"query": "jwt.decode attribute access pattern"}},
+                        output_data={"results": [{"file": "src/middleware.py", "line": 15, "code": "user = decoded['sub']  # correct pattern"}]},
                         children=[
                             ScenarioStep(
-                                name="Search JWT Documentation",
-                                type="tool",
-                                delay_s=0.5,
-                                duration_ms=1400,
-                                input_data={"tool": "search_docs", "args": {"query": "PyJWT decode return type"}},
-                                output_data={"results": [{"doc": "jwt.decode() -> dict: Returns the decoded token payload as a dictionary"}]},
-                            ),
-                            ScenarioStep(
-                                name="Search Similar Issues",
-                                type="tool",
-                                delay_s=0.5,
-                                duration_ms=980,
-                                input_data={"tool": "search_codebase", "args": {"query": "jwt.decode attribute access pattern"}},
-                                output_data={"results": [{"file": "src/middleware.py", "line": 15, "code": "user = decoded['sub']  # correct pattern"}]},
+                                name="Generate Fix",
+                                type="llm",
+                                delay_s=0.6,
+                                duration_ms=1800,
+                                tokens_prompt=1500,
+                                tokens_completion=380,
+                                input_data={"prompt": "Generate a code fix for the auth_service.py TypeError. Change attribute access to dictionary key access..."},
+                                output_data={"completion": "```python\\n# auth_service.py - Fixed\\nclass AuthService:\\n    def authenticate(self, token: str) -> str:\\n        decoded = jwt.decode(token, options={'verify_signature': True})\\n        return decoded['user_id']  # Fixed: dict access instead of attribute\\n```"},
                                 children=[
                                     ScenarioStep(
-                                        name="Generate Fix",
-                                        type="llm",
-                                        delay_s=0.6,
-                                        duration_ms=1800,
-                                        tokens_prompt=1500,
-                                        tokens_completion=380,
-                                        input_data={"prompt": "Generate a code fix for the auth_service.py TypeError. Change attribute access to dictionary key access..."},
-                                        output_data={"completion": "```python\\n# auth_service.py - Fixed\\nclass AuthService:\\n    def authenticate(self, token: str) -> str:\\n        decoded = jwt.decode(token, options={'verify_signature': True})\\n        return decoded['user_id']  # Fixed: dict access instead of attribute\\n```"},
+                                        name="Apply Patch",
+                                        type="tool",
+                                        delay_s=0.5,
+                                        duration_ms=220,
+                                        input_data={"tool": "apply_edit", "args": {"file": "src/auth_service.py", "line": 42, "old": "return decoded.user_id", "new": "return decoded['user_id']"}},
+                                        output_data={"applied": True, "file": "src/auth_service.py"},
                                         children=[
                                             ScenarioStep(
-                                                name="Apply Patch",
+                                                name="Run Tests",
                                                 type="tool",
-                                                delay_s=0.5,
-                                                duration_ms=220,
-                                                input_data={"tool": "apply_edit", "args": {"file": "src/auth_service.py", "line": 42, "old": "return decoded.user_id", "new": "return decoded['user_id']"}},
-                                                output_data={"applied": True, "file": "src/auth_service.py"},
+                                                delay_s=0.8,
+                                                duration_ms=3400,
+                                                input_data={"tool": "run_tests", "args": {"path": "tests/test_auth.py"}},
+                                                output_data={"passed": 5, "failed": 0, "total": 5, "output": "All 5 tests passed ✓"},
                                                 children=[
                                                     ScenarioStep(
-                                                        name="Run Tests",
-                                                        type="tool",
-                                                        delay_s=0.8,
-                                                        duration_ms=3400,
-                                                        input_data={"tool": "run_tests", "args": {"path": "tests/test_auth.py"}},
-                                                        output_data={"passed": 5, "failed": 0, "total": 5, "output": "All 5 tests passed ✓"},
+                                                        name="Format Response",
+                                                        type="llm",
+                                                        delay_s=0.4,
+                                                        duration_ms=900,
+                                                        tokens_prompt=600,
+                                                        tokens_completion=200,
+                                                        input_data={"prompt": "Summarize the bug fix and test results for the user..."},
+                                                        output_data={"completion": "Fixed the TypeError in auth_service.py. The issue was using attribute access (.user_id) on a dictionary returned by jwt.decode(). Changed to dictionary key access (['user_id']). All 5 tests now pass."},
                                                         children=[
                                                             ScenarioStep(
-                                                                name="Format Response",
-                                                                type="llm",
-                                                                delay_s=0.4,
-                                                                duration_ms=900,
-                                                                tokens_prompt=600,
-                                                                tokens_completion=200,
-                                                                input_data={"prompt": "Summarize the bug fix and test results for the user..."},
-                                                                output_data={"completion": "Fixed the TypeError in auth_service.py. The issue was using attribute access (.user_id) on a dictionary returned by jwt.decode(). Changed to dictionary key access (['user_id']). All 5 tests now pass."},
-                                                                children=[
-                                                                    ScenarioStep(
-                                                                        name="Final Output",
-                                                                        type="final",
-                                                                        delay_s=0.3,
-                                                                        duration_ms=60,
-                                                                        tokens_prompt=80,
-                                                                        tokens_completion=40,
-                                                                        input_data={"summary": "Bug fix completed"},
-                                                                        output_data={"result": "Fixed TypeError in auth_service.py:42. Changed decoded.user_id to decoded['user_id']. All 5 tests passing."},
-                                                                    ),
-                                                                ],
+                                                                name="Final Output",
+                                                                type="final",
+                                                                delay_s=0.3,
+                                                                duration_ms=60,
+                                                                tokens_prompt=80,
+                                                                tokens_completion=40,
+                                                                input_data={"summary": "Bug fix completed"},
+                                                                output_data={"result": "Fixed TypeError in auth_service.py:42. Changed decoded.user_id to decoded['user_id']. All 5 tests passing."},
                                                             ),
                                                         ],
                                                     ),
@@ -348,6 +351,7 @@ SCENARIOS: dict[str, ScenarioStep] = {
                 tokens_completion=120,
                 input_data={"prompt": "Classify this customer inquiry: 'I was charged twice for my subscription'. Categories: billing, technical, account, general"},
                 output_data={"completion": "Classification: BILLING\\nSub-category: DUPLICATE_CHARGE\\nSentiment: FRUSTRATED\\nPriority: HIGH\\nUrgency: MEDIUM"},
+                parallel=True,
                 children=[
                     ScenarioStep(
                         name="Retrieve KB Articles",
@@ -374,38 +378,37 @@ SCENARIOS: dict[str, ScenarioStep] = {
                         tokens_completion=90,
                         input_data={"prompt": "Analyze customer sentiment and determine appropriate tone for response..."},
                         output_data={"completion": "Sentiment: Frustrated but not angry. Tone recommendation: Empathetic, apologetic, action-oriented. Avoid: Blame language, excessive formality."},
+                    ),
+                    ScenarioStep(
+                        name="Draft Response",
+                        type="llm",
+                        depends_on=["Retrieve KB Articles", "Search Customer History", "Sentiment Analysis"],
+                        delay_s=0.8,
+                        duration_ms=2200,
+                        tokens_prompt=1600,
+                        tokens_completion=550,
+                        input_data={"prompt": "Draft a customer support response addressing the duplicate charge. Use KB article KB-1042 and customer billing history. Be empathetic and solution-oriented..."},
+                        output_data={"completion": "Hi there,\\n\\nI'm sorry about the duplicate charge on your account — I can see it happened on Feb 18th and completely understand your frustration.\\n\\nI've already initiated a refund of $29.99 for the duplicate charge. You should see it back in your account within 3-5 business days.\\n\\nTo prevent this from happening again, I've also flagged your account for our billing team to review.\\n\\nIs there anything else I can help you with?\\n\\nBest,\\nSupport Team"},
                         children=[
                             ScenarioStep(
-                                name="Draft Response",
+                                name="Quality Check",
                                 type="llm",
-                                delay_s=0.8,
-                                duration_ms=2200,
-                                tokens_prompt=1600,
-                                tokens_completion=550,
-                                input_data={"prompt": "Draft a customer support response addressing the duplicate charge. Use KB article KB-1042 and customer billing history. Be empathetic and solution-oriented..."},
-                                output_data={"completion": "Hi there,\\n\\nI'm sorry about the duplicate charge on your account — I can see it happened on Feb 18th and completely understand your frustration.\\n\\nI've already initiated a refund of $29.99 for the duplicate charge. You should see it back in your account within 3-5 business days.\\n\\nTo prevent this from happening again, I've also flagged your account for our billing team to review.\\n\\nIs there anything else I can help you with?\\n\\nBest,\\nSupport Team"},
+                                delay_s=0.5,
+                                duration_ms=1400,
+                                tokens_prompt=900,
+                                tokens_completion=180,
+                                input_data={"prompt": "Review this customer support response for: accuracy, tone, completeness, policy compliance..."},
+                                output_data={"completion": "Quality check PASSED:\\n✓ Accurate: References correct charge amount and date\\n✓ Tone: Empathetic and professional\\n✓ Complete: Addresses issue + provides timeline\\n✓ Policy: Follows KB-1042 refund process\\nScore: 95/100"},
                                 children=[
                                     ScenarioStep(
-                                        name="Quality Check",
-                                        type="llm",
-                                        delay_s=0.5,
-                                        duration_ms=1400,
-                                        tokens_prompt=900,
-                                        tokens_completion=180,
-                                        input_data={"prompt": "Review this customer support response for: accuracy, tone, completeness, policy compliance..."},
-                                        output_data={"completion": "Quality check PASSED:\\n✓ Accurate: References correct charge amount and date\\n✓ Tone: Empathetic and professional\\n✓ Complete: Addresses issue + provides timeline\\n✓ Policy: Follows KB-1042 refund process\\nScore: 95/100"},
-                                        children=[
-                                            ScenarioStep(
-                                                name="Final Output",
-                                                type="final",
-                                                delay_s=0.3,
-                                                duration_ms=90,
-                                                tokens_prompt=60,
-                                                tokens_completion=30,
-                                                input_data={"summary": "Customer support response ready"},
-                                                output_data={"result": "Response drafted and quality-checked (95/100). Duplicate charge of $29.99 identified and refund initiated. Ready to send to customer."},
-                                            ),
-                                        ],
+                                        name="Final Output",
+                                        type="final",
+                                        delay_s=0.3,
+                                        duration_ms=90,
+                                        tokens_prompt=60,
+                                        tokens_completion=30,
+                                        input_data={"summary": "Customer support response ready"},
+                                        output_data={"result": "Response drafted and quality-checked (95/100). Duplicate charge of $29.99 identified and refund initiated. Ready to send to customer."},
                                     ),
                                 ],
                             ),
@@ -0,0 +1,75 @@
+"""JSON encoding helpers shared by REST responses and WebSocket frames."""
+from __future__ import annotations
+
+import json
+import zlib
+from enum import Enum
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional; needed only for msgpack WebSocket frames
+    msgpack = None
+
+
+def dumps(value: Any) -> bytes:
+    """Encode plain Python data to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+
+def model_bytes(model: BaseModel, include: Optional[set[str]] = None) -> bytes:
+    """Encode a model (optionally only ``include`` fields) with
+    pydantic-core's serializer, skipping model_dump."""
+    return model.__pydantic_serializer__.to_json(model, include=include, fallback=str)
+
+
+def join_array(items: list[bytes]) -> bytes:
+    """JSON array from already-encoded elements."""
+    return b"[" + b",".join(items) + b"]"
+
+
+def envelope(msg_type: str, field: str, body: bytes) -> bytes:
+    """``{"type": msg_type, field: <body>}`` around pre-encoded JSON."""
+    return b'{"type":"%s","%s":%s}' % (msg_type.encode(), field.encode(), body)
+
+
+def loads(data: str | bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class FrameEncoding(str, Enum):
+    """Wire format of WebSocket frames, negotiated per connection."""
+    json = "json"                        # JSON text frames
+    json_deflate = "json-deflate"        # raw-deflated JSON, binary frames
+    msgpack = "msgpack"                  # MessagePack, binary frames
+    msgpack_deflate = "msgpack-deflate"  # raw-deflated MessagePack, binary frames
+
+    @property
+    def available(self) -> bool:
+        return msgpack is not None or not self.value.startswith("msgpack")
+
+
+def encode_frame(text: str, encoding: FrameEncoding) -> str | bytes:
+    """Re-encode a JSON text frame for the wire.
+
+    Deflated frames are compressed on their own (no shared window), so one
+    encoding serves every subscriber; clients inflate them with raw deflate.
+    """
+    if encoding is FrameEncoding.json:
+        return text
+    if encoding in (FrameEncoding.msgpack, FrameEncoding.msgpack_deflate):
+        data = msgpack.packb(loads(text))
+    else:
+        data = text.encode()
+    if encoding in (FrameEncoding.json_deflate, FrameEncoding.msgpack_deflate):
+        data = zlib.compress(data, 6, wbits=-15)
+    return data
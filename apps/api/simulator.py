@@ -1,119 +1,132 @@
-"""Simulator that walks a scenario tree and emits steps over time."""
+"""Simulator that replays compiled scenario plans and emits steps over time."""
 from __future__ import annotations
 
 import asyncio
+import os
 import uuid
 import logging
 from datetime import datetime, timezone
+from typing import Optional
 
-from models import Run, Step, RunStatus, StepStatus, StepType, StepError
+from models import Step, RunStatus, Scheduling, StepStatus
 from database import db
 from websocket_manager import manager
-from scenarios import ScenarioStep, SCENARIOS
+from scenarios import SCENARIOS
+from plans import PlannedStep, ScenarioPlan, plan_for
 
 logger = logging.getLogger(__name__)
 
-# Cost per 1K tokens (USD)
-COST_RATES = {
-    "gpt-4": {"prompt": 0.03, "completion": 0.06},
-    "claude-3.5": {"prompt": 0.003, "completion": 0.015},
-    "default": {"prompt": 0.01, "completion": 0.03},
-}
+# Fields emit_step changes when a step finishes; delta subscribers get only these.
+COMPLETION_FIELDS = {"status", "type", "ended_at", "duration_ms", "output", "error"}
 
-MODEL_KEY = "default"  # Change to "gpt-4" or "claude-3.5" for different pricing
-
-
-def compute_cost(tokens_prompt: int, tokens_completion: int) -> float:
-    """Compute cost in USD for given token counts."""
-    rates = COST_RATES[MODEL_KEY]
-    return round(
-        (tokens_prompt / 1000) * rates["prompt"]
-        + (tokens_completion / 1000) * rates["completion"],
-        6,
-    )
+# Steps of one run emitting at once, unless the run sets max_concurrency.
+MAX_CONCURRENCY = int(os.getenv("SIM_MAX_CONCURRENCY", "4"))
 
 
 async def emit_step(
     run_id: str,
-    scenario_step: ScenarioStep,
+    plan: ScenarioPlan,
+    index: int,
     parent_step_id: str | None = None,
+    time_scale: float = 1.0,
 ) -> str:
-    """Emit a single step: create it as running, wait, then complete it."""
+    """Emit one planned step: create it as running, wait ``delay_s`` scaled
+    by ``time_scale``, then complete or fail it.
 
+    Everything but ids and timestamps comes precomputed from the plan,
+    including the step's encoded JSON, so nothing here walks a payload.
+    """
+    planned = plan.steps[index]
     step_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
 
-    # Determine status for creation
-    initial_status = StepStatus.running
-    step_type = StepType(scenario_step.type)
-
-    # If this is an error step, we still start as running
-    cost = compute_cost(scenario_step.tokens_prompt, scenario_step.tokens_completion)
-
-    step = Step(
+    step = Step.model_construct(
         step_id=step_id,
         run_id=run_id,
         parent_step_id=parent_step_id,
-        name=scenario_step.name,
-        type=step_type,
-        status=initial_status,
+        name=planned.name,
+        type=planned.type,
+        status=StepStatus.running,
         started_at=now,
-        tokens_prompt=scenario_step.tokens_prompt,
-        tokens_completion=scenario_step.tokens_completion,
-        cost_usd=cost,
-        input=scenario_step.input_data,
+        ended_at=None,
+        duration_ms=0,
+        tokens_prompt=planned.tokens_prompt,
+        tokens_completion=planned.tokens_completion,
+        cost_usd=plan.costs(now)[index],
+        model=planned.model,
+        input=planned.input,
+        output={},
+        error=None,
     )
     db.create_step(step)
 
     # Broadcast the "running" step
-    await manager.broadcast(run_id, {
-        "type": "step_update",
-        "step": step.model_dump(),
-    })
+    await manager.broadcast_step(step, db.cache_step_json(step, planned.running_json(step)))
 
     # Simulate processing time
-    await asyncio.sleep(scenario_step.delay_s)
+    await asyncio.sleep(planned.delay_s * time_scale)
 
     # Complete or fail the step
-    end_time = datetime.now(timezone.utc).isoformat()
-    step.ended_at = end_time
-    step.duration_ms = scenario_step.duration_ms
-
-    if scenario_step.should_fail:
-        step.status = StepStatus.failed
-        step.type = StepType.error
-        if scenario_step.error_data:
-            step.error = StepError(**scenario_step.error_data)
-        else:
-            step.error = StepError(message="Step failed unexpectedly")
-        step.output = {}
-    elif scenario_step.retry_of:
-        step.status = StepStatus.completed
-        step.output = scenario_step.output_data
-    else:
-        step.status = StepStatus.completed
-        step.output = scenario_step.output_data
-
+    step.ended_at = datetime.now(timezone.utc).isoformat()
+    step.duration_ms = planned.duration_ms
+    step.status = planned.end_status
+    step.type = planned.end_type
+    step.output = planned.output
+    step.error = planned.error
     db.update_step(step)
 
     # Broadcast the completed/failed step
-    await manager.broadcast(run_id, {
-        "type": "step_update",
-        "step": step.model_dump(),
-    })
+    await manager.broadcast_step(
+        step, db.cache_step_json(step, planned.ended_json(step)),
+        COMPLETION_FIELDS, planned.end_changes(step),
+    )
 
     return step_id
 
 
-async def walk_scenario(
+# ── Scheduling ──────────────────────────────────────────────────────────────
+
+class Scheduler:
+    """How one run walks its scenario: which siblings run concurrently, how
+    many steps may be emitting at the same time, and how fast simulated
+    time passes (0 replays with no delays)."""
+
+    def __init__(
+        self,
+        mode: Scheduling = Scheduling.scenario,
+        max_concurrency: Optional[int] = None,
+        time_scale: float = 1.0,
+    ) -> None:
+        self.mode = mode
+        self.slots = asyncio.Semaphore(max_concurrency or MAX_CONCURRENCY)
+        self.time_scale = time_scale
+
+    def concurrent(self, planned: PlannedStep) -> bool:
+        """Whether the children of ``planned`` may run concurrently."""
+        if self.mode == Scheduling.parallel:
+            return True
+        return self.mode == Scheduling.scenario and planned.parallel
+
+
+async def walk_plan(
     run_id: str,
-    scenario_step: ScenarioStep,
+    plan: ScenarioPlan,
+    index: int = 0,
     parent_step_id: str | None = None,
     is_root: bool = False,
+    scheduler: Scheduler | None = None,
 ) -> None:
-    """Recursively walk the scenario tree and emit steps."""
+    """Recursively walk a plan from step ``index`` and emit steps.
+
+    A step holds one of the run's concurrency slots only while it is being
+    emitted, never while its children run, so nested fan-out cannot
+    deadlock on the limit.
+    """
+    scheduler = scheduler or Scheduler()
+    planned = plan.steps[index]
 
-    step_id = await emit_step(run_id, scenario_step, parent_step_id)
+    async with scheduler.slots:
+        step_id = await emit_step(run_id, plan, index, parent_step_id, scheduler.time_scale)
 
     # If root, update run's root_step_id
     if is_root:
@@ -121,29 +134,47 @@ async def walk_scenario(
         if run:
             run.root_step_id = step_id
             db.update_run(run)
-            await manager.broadcast(run_id, {
-                "type": "run_update",
-                "run": run.model_dump(),
-            })
+            await manager.broadcast_run(run, db.run_json(run))
 
-    # Process children
-    if scenario_step.children:
-        # Check if children can be parallelized (siblings at same level)
-        # For simplicity, we run children sequentially to show the tree building
-        for child in scenario_step.children:
-            await walk_scenario(run_id, child, step_id)
+    # Process children, already in dependency order
+    if not planned.children:
+        return
+    if not scheduler.concurrent(planned):
+        for child in planned.children:
+            await walk_plan(run_id, plan, child, step_id, scheduler=scheduler)
+        return
 
+    # One task per child; a child first waits for the whole subtrees of the
+    # siblings it depends on. A failure cancels the remaining siblings.
+    async def walk_after(child: int, deps: list[asyncio.Task]) -> None:
+        if deps:
+            await asyncio.wait(deps)
+        await walk_plan(run_id, plan, child, step_id, scheduler=scheduler)
 
-async def run_simulation(run_id: str, scenario_name: str) -> None:
+    tasks: dict[int, asyncio.Task] = {}
+    async with asyncio.TaskGroup() as group:
+        for child in planned.children:
+            deps = [tasks[dep] for dep in plan.steps[child].depends_on]
+            tasks[child] = group.create_task(walk_after(child, deps))
+
+
+async def run_simulation(
+    run_id: str,
+    scenario_name: str,
+    scheduling: Scheduling = Scheduling.scenario,
+    max_concurrency: Optional[int] = None,
+    time_scale: float = 1.0,
+) -> None:
     """Run a full simulation for a given scenario."""
-    scenario = SCENARIOS.get(scenario_name)
-    if not scenario:
+    if scenario_name not in SCENARIOS:
         logger.error(f"Unknown scenario: {scenario_name}")
         return
 
     try:
-        logger.info(f"Starting simulation: {scenario_name} for run {run_id}")
-        await walk_scenario(run_id, scenario, is_root=True)
+        logger.info(f"Starting simulation: {scenario_name} ({scheduling.value}) for run {run_id}")
+        plan = plan_for(scenario_name)
+        scheduler = Scheduler(scheduling, max_concurrency, time_scale)
+        await walk_plan(run_id, plan, is_root=True, scheduler=scheduler)
 
         # Complete the run
         run = db.get_run(run_id)
@@ -151,10 +182,7 @@ async def run_simulation(run_id: str, scenario_name: str) -> None:
             run.status = RunStatus.completed
             run.updated_at = datetime.now(timezone.utc).isoformat()
             db.update_run(run)
-            await manager.broadcast(run_id, {
-                "type": "run_update",
-                "run": run.model_dump(),
-            })
+            await manager.broadcast_run(run, db.run_json(run))
 
         logger.info(f"Simulation completed: {scenario_name} for run {run_id}")
 
@@ -165,7 +193,4 @@ async def run_simulation(run_id: str, scenario_name: str) -> None:
             run.status = RunStatus.failed
             run.updated_at = datetime.now(timezone.utc).isoformat()
             db.update_run(run)
-            await manager.broadcast(run_id, {
-                "type": "run_update",
-                "run": run.model_dump(),
-            })
+            await manager.broadcast_run(run, db.run_json(run))
@@ -0,0 +1,311 @@
+"""SQLite-backed durable store (WAL mode, batched write-behind)."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Optional
+
+from database import Database
+from models import Run, Step
+from payloads import BlobStore
+from pricing import RateTable
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        TEXT PRIMARY KEY,
+    created_at    TEXT NOT NULL,
+    updated_at    TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    system_type   TEXT NOT NULL,
+    root_step_id  TEXT,
+    metadata      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs (created_at);
+
+CREATE TABLE IF NOT EXISTS steps (
+    step_id            TEXT PRIMARY KEY,
+    run_id             TEXT NOT NULL,
+    parent_step_id     TEXT,
+    name               TEXT NOT NULL,
+    type               TEXT NOT NULL,
+    status             TEXT NOT NULL,
+    started_at         TEXT NOT NULL,
+    ended_at           TEXT,
+    duration_ms        INTEGER NOT NULL,
+    tokens_prompt      INTEGER NOT NULL,
+    tokens_completion  INTEGER NOT NULL,
+    cost_usd           REAL NOT NULL,
+    input              TEXT NOT NULL,
+    output             TEXT NOT NULL,
+    error              TEXT,
+    model              TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_steps_run_started ON steps (run_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_steps_parent ON steps (parent_step_id);
+"""
+
+UPSERT_RUN = "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)"
+UPSERT_STEP = "INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+_STOP = object()
+
+# Backoff between retries of a commit that failed on a transient error.
+RETRY_MIN_S = 0.05
+RETRY_MAX_S = 5.0
+
+
+def run_row(run: Run) -> tuple:
+    return (
+        run.run_id, run.created_at, run.updated_at, run.status.value,
+        run.system_type.value, run.root_step_id, run.metadata.model_dump_json(),
+    )
+
+
+def step_fields(step: Step) -> tuple:
+    """The columns of ``step`` as it is now, taken on the event loop.
+
+    Payload dicts are kept by reference, not encoded: stored payloads are
+    replaced, never mutated in place (plans share them across runs).
+    """
+    return (
+        step.step_id, step.run_id, step.parent_step_id, step.name,
+        step.type.value, step.status.value, step.started_at, step.ended_at,
+        step.duration_ms, step.tokens_prompt, step.tokens_completion, step.cost_usd,
+        step.input, step.output,
+        step.error.model_dump_json() if step.error else None, step.model,
+    )
+
+
+def step_row(fields: tuple, payloads: Optional[BlobStore] = None) -> tuple:
+    """Row from ``step_fields`` with its payloads resolved and encoded, so
+    the file holds whole steps whatever the payload store. Runs on the
+    writer thread, where blob reads and encoding do not stall the loop."""
+    encode = payloads.payload_json if payloads is not None else dumps
+    return (*fields[:12], encode(fields[12]).decode(), encode(fields[13]).decode(), *fields[14:])
+
+
+class SQLiteDatabase(Database):
+    """Durable store: in-memory indexes serve reads, SQLite keeps history.
+
+    Writes update the in-memory indexes synchronously and are queued for a
+    writer thread, which commits them to SQLite in groups. Callers on the
+    event loop therefore never wait on disk I/O or fsync. Each write
+    queues a snapshot of the step's fields, so the writer never reads
+    objects the loop is still mutating; payload resolution and encoding
+    happen on the writer. A commit that fails on a transient error (busy,
+    locked, disk full) is retried with backoff, and ``flush()`` reports
+    success only once everything queued before it is committed. On startup
+    the in-memory state is rebuilt from the database file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 1000,
+        max_backlog: int = 10_000,
+        flush_interval_s: float = 0.02,
+        columnar: bool = False,
+        payloads: Optional[BlobStore] = None,
+    ) -> None:
+        super().__init__(columnar, payloads)
+        self.path = path
+        self.batch_size = batch_size
+        self.max_backlog = max_backlog
+        self.flush_interval_s = flush_interval_s
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        # Snapshots taken off the queue but not yet committed.
+        self._held = 0
+
+        conn = self._open()
+        try:
+            self._hydrate(conn)
+        finally:
+            conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only fsyncs at checkpoints; commits stay crash-consistent.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(steps)")}
+        if "model" not in columns:  # files created before steps carried a model
+            conn.execute("ALTER TABLE steps ADD COLUMN model TEXT")
+        return conn
+
+    def _hydrate(self, conn: sqlite3.Connection) -> None:
+        for row in conn.execute("SELECT * FROM runs ORDER BY created_at"):
+            run_id, created_at, updated_at, status, system_type, root_step_id, metadata = row
+            Database.create_run(self, Run(
+                run_id=run_id, created_at=created_at, updated_at=updated_at,
+                status=status, system_type=system_type, root_step_id=root_step_id,
+                metadata=json.loads(metadata),
+            ))
+        for row in conn.execute("SELECT * FROM steps ORDER BY run_id, started_at"):
+            (step_id, run_id, parent_step_id, name, type_, status, started_at, ended_at,
+             duration_ms, tokens_prompt, tokens_completion, cost_usd, input_, output, error, model) = row
+            Database.create_step(self, self.escape_payloads(Step(
+                step_id=step_id, run_id=run_id, parent_step_id=parent_step_id,
+                name=name, type=type_, status=status, started_at=started_at,
+                ended_at=ended_at, duration_ms=duration_ms, tokens_prompt=tokens_prompt,
+                tokens_completion=tokens_completion, cost_usd=cost_usd, model=model,
+                input=json.loads(input_), output=json.loads(output),
+                error=json.loads(error) if error else None,
+            )))
+        logger.info(f"SQLite store {self.path}: loaded {len(self.runs)} runs, {len(self.steps)} steps")
+
+    # ── Write-behind ─────────────────────────────────────────────────────
+
+    def create_run(self, run: Run) -> Run:
+        super().create_run(run)
+        self._queue.put(("runs", [run_row(run)]))
+        return run
+
+    def update_run(self, run: Run) -> Run:
+        super().update_run(run)
+        self._queue.put(("runs", [run_row(run)]))
+        return run
+
+    def create_step(self, step: Step) -> Step:
+        super().create_step(step)
+        self._queue.put(("steps", [step_fields(step)]))
+        return step
+
+    def update_step(self, step: Step) -> Step:
+        super().update_step(step)
+        self._queue.put(("steps", [step_fields(step)]))
+        return step
+
+    def create_steps(self, steps: list[Step]) -> list[Step]:
+        super().create_steps(steps)
+        self._queue.put(("steps", [step_fields(s) for s in steps]))
+        return steps
+
+    def reprice(self, rates: RateTable, run_id: Optional[str] = None) -> dict[str, list[str]]:
+        changed = super().reprice(rates, run_id)
+        if changed:
+            self._queue.put(("steps", [
+                step_fields(self.steps[sid]) for ids in changed.values() for sid in ids
+            ]))
+        return changed
+
+    async def wait_for_capacity(self) -> None:
+        while self._queue.qsize() + self._held > self.max_backlog:
+            await asyncio.sleep(0.005)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far is committed. Returns False
+        if any of it was dropped, or on timeout."""
+        done: Future = Future()
+        self._queue.put(done)
+        try:
+            return done.result(timeout)
+        except FutureTimeout:
+            return False
+
+    async def close(self) -> None:
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            await asyncio.to_thread(self._writer.join)
+
+    def _write_loop(self) -> None:
+        conn = self._open()
+        # Latest snapshot per id, kept until committed.
+        held: dict[str, dict[str, tuple]] = {"runs": {}, "steps": {}}
+        waiters: list[Future] = []
+        lost = False  # something was dropped since waiters were last answered
+        retry_s = 0.0
+        stop = False
+        try:
+            while True:
+                batch = self._take(retry_s)
+                for item in batch:
+                    if isinstance(item, tuple):
+                        table, snapshots = item
+                        held[table].update((snapshot[0], snapshot) for snapshot in snapshots)
+                    elif isinstance(item, Future):
+                        waiters.append(item)
+                    elif item is _STOP:
+                        stop = True
+                self._held = len(held["runs"]) + len(held["steps"])
+                try:
+                    lost |= not self._commit(conn, held["runs"], held["steps"])
+                except sqlite3.OperationalError:
+                    if not stop:
+                        retry_s = min(max(retry_s * 2, RETRY_MIN_S), RETRY_MAX_S)
+                        logger.exception(f"SQLite commit of {self._held} rows failed; retrying in {retry_s:.2f}s")
+                        continue
+                    logger.exception(f"SQLite commit of {self._held} rows failed at shutdown; dropping them")
+                    lost = True
+                except Exception:
+                    logger.exception(f"SQLite commit of {self._held} rows failed; dropping them")
+                    lost = True
+                retry_s = 0.0
+                held = {"runs": {}, "steps": {}}
+                self._held = 0
+                if waiters:
+                    for waiter in waiters:
+                        waiter.set_result(not lost)
+                    waiters, lost = [], False
+                if stop:
+                    return
+                if len(batch) < self.batch_size:
+                    # Let more writes accumulate: fewer, larger commits, and
+                    # fewer hand-offs of the GIL to this thread.
+                    time.sleep(self.flush_interval_s)
+        finally:
+            conn.close()
+
+    def _take(self, retry_s: float) -> list:
+        """The next group of queued items. While retrying, waits out the
+        backoff and returns whatever arrived meanwhile, possibly nothing."""
+        if retry_s:
+            time.sleep(retry_s)
+            batch = []
+        else:
+            batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, conn: sqlite3.Connection, runs: dict[str, tuple], steps: dict[str, tuple]) -> bool:
+        """Write one group of snapshots in a transaction. Returns False if
+        some step could not be encoded and was left out; raises if the
+        transaction fails."""
+        complete = True
+        rows = []
+        for fields in steps.values():
+            try:
+                rows.append(step_row(fields, self.payloads))
+            except Exception:
+                logger.exception(f"Cannot encode step {fields[0]}; dropping it")
+                complete = False
+        with conn:
+            if runs:
+                conn.executemany(UPSERT_RUN, list(runs.values()))
+            if rows:
+                conn.executemany(UPSERT_STEP, rows)
+        return complete
+
+
+def sqlite_path(url: str) -> Optional[str]:
+    """Extract the file path from a ``sqlite:///path`` style URL."""
+    scheme, sep, rest = url.partition("://")
+    if not sep or scheme.split("+")[0] != "sqlite":
+        return None
+    return rest[1:] if rest.startswith("/") else rest or ":memory:"
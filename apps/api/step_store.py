@@ -0,0 +1,243 @@
+"""Step storage behind ``Database.steps``: Step models or compact columns.
+
+``StepDict`` is the plain ``dict[str, Step]`` the store has always used.
+``StepColumns`` keeps the same mapping interface but stores each step as a
+row of fixed-width array columns (epoch-microsecond timestamps, enum codes,
+counts, cost) with interned ids and names, and ``input``/``output``/``error``
+payloads held separately as encoded JSON. ``Step`` models are built only
+when a step is read, i.e. at the API boundary, and scans run over NumPy
+views of the columns.
+
+Both expose ``pricing_columns``/``set_cost`` for bulk re-pricing.
+"""
+from __future__ import annotations
+
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from models import Step, StepError, StepStatus, StepType
+from serialization import dumps, loads
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_NULL = -1  # missing parent / model, and ids without a row
+_NO_TIME = -(2 ** 63)  # missing ended_at
+_EMPTY = b"{}"
+
+_TYPES = list(StepType)
+_TYPE_CODES = {t: i for i, t in enumerate(_TYPES)}
+_STATUSES = list(StepStatus)
+_STATUS_CODES = {s: i for i, s in enumerate(_STATUSES)}
+
+# (model codes, model names, started_at, tokens_prompt, tokens_completion, cost_usd)
+PricingColumns = tuple[np.ndarray, list, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def to_micros(value: str) -> int:
+    """Epoch microseconds of an ISO-8601 timestamp (naive means UTC)."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+def from_micros(value: int) -> str:
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+def _payload(value: dict) -> bytes:
+    if not value:
+        return _EMPTY
+    # orjson's result keeps its ~1 KiB write buffer allocated; copying it
+    # to an exact-size bytes object is what keeps payloads compact.
+    return bytes(memoryview(dumps(value)))
+
+
+class StepDict(dict):
+    """Step models keyed by step_id (the default store)."""
+
+    def pricing_columns(self, step_ids: Optional[list[str]] = None) -> PricingColumns:
+        """Columns of ``step_ids`` (all steps, in iteration order, if None)."""
+        steps = [self[sid] for sid in step_ids] if step_ids is not None else list(self.values())
+        n = len(steps)
+        models = [s.model for s in steps]
+        codes = {m: i for i, m in enumerate(set(models))}
+        return (
+            np.fromiter(map(codes.__getitem__, models), np.intp, n),
+            list(codes),
+            np.asarray([s.started_at for s in steps], dtype="U19"),
+            np.fromiter((s.tokens_prompt for s in steps), np.int64, n),
+            np.fromiter((s.tokens_completion for s in steps), np.int64, n),
+            np.fromiter((s.cost_usd for s in steps), np.float64, n),
+        )
+
+    def set_cost(self, step_id: str, cost: float) -> None:
+        self[step_id].cost_usd = cost
+
+
+class Interner:
+    """Dense int codes for repeated strings, each string stored once."""
+
+    __slots__ = ("codes", "values")
+
+    def __init__(self) -> None:
+        self.codes: dict[str, int] = {}
+        self.values: list[str] = []
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NULL
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def value(self, code: int) -> Optional[str]:
+        return self.values[code] if code != _NULL else None
+
+
+class StepColumns:
+    """Steps as rows of array columns; a drop-in for ``dict[str, Step]``.
+
+    Rows are appended on first write and overwritten in place after that,
+    so a row number is stable for the life of the store. Timestamps are
+    normalized to UTC on the way in.
+    """
+
+    _int_columns = (
+        ("step", "i"), ("run", "i"), ("parent", "i"), ("name", "i"), ("model", "i"),
+        ("type", "b"), ("status", "b"), ("started_at", "q"), ("ended_at", "q"),
+        ("duration_ms", "q"), ("tokens_prompt", "q"), ("tokens_completion", "q"),
+    )
+
+    def __init__(self) -> None:
+        self.ids = Interner()  # step ids, including parents not stored yet
+        self.runs = Interner()
+        self.names = Interner()
+        self.models = Interner()
+        self._row_of = array("q")  # step id code -> row, or _NULL
+        self.columns: dict[str, array] = {name: array(code) for name, code in self._int_columns}
+        self.columns["cost_usd"] = array("d")
+        # Payloads live outside the columns, as encoded JSON.
+        self.inputs: list[bytes] = []
+        self.outputs: list[bytes] = []
+        self.errors: list[Optional[bytes]] = []
+
+    # ── Mapping interface ────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return len(self.inputs)
+
+    def __contains__(self, step_id: object) -> bool:
+        return self._row(step_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        ids, step = self.ids.values, self.columns["step"]
+        return (ids[step[row]] for row in range(len(step)))
+
+    def __getitem__(self, step_id: str) -> Step:
+        row = self._row(step_id)
+        if row is None:
+            raise KeyError(step_id)
+        return self.materialize(row)
+
+    def get(self, step_id: str, default: Optional[Step] = None) -> Optional[Step]:
+        row = self._row(step_id)
+        return self.materialize(row) if row is not None else default
+
+    def values(self) -> Iterator[Step]:
+        return (self.materialize(row) for row in range(len(self.columns["step"])))
+
+    def __setitem__(self, step_id: str, step: Step) -> None:
+        code = self.ids.code(step_id)
+        parent = self.ids.code(step.parent_step_id)
+        missing = len(self.ids.values) - len(self._row_of)
+        if missing:
+            self._row_of.extend([_NULL] * missing)
+        row = self._row_of[code]
+        fields = (
+            code, self.runs.code(step.run_id), parent,
+            self.names.code(step.name), self.models.code(step.model),
+            _TYPE_CODES[step.type], _STATUS_CODES[step.status], to_micros(step.started_at),
+            to_micros(step.ended_at) if step.ended_at else _NO_TIME,
+            step.duration_ms, step.tokens_prompt, step.tokens_completion, step.cost_usd,
+        )
+        payloads = (
+            _payload(step.input),
+            _payload(step.output),
+            step.error.model_dump_json().encode() if step.error else None,
+        )
+        columns = self.columns.values()
+        if row == _NULL:
+            self._row_of[code] = len(self.inputs)
+            for column, value in zip(columns, fields):
+                column.append(value)
+            self.inputs.append(payloads[0])
+            self.outputs.append(payloads[1])
+            self.errors.append(payloads[2])
+        else:
+            for column, value in zip(columns, fields):
+                column[row] = value
+            self.inputs[row], self.outputs[row], self.errors[row] = payloads
+
+    def _row(self, step_id: object) -> Optional[int]:
+        code = self.ids.codes.get(step_id)  # type: ignore[arg-type]
+        if code is None:
+            return None
+        row = self._row_of[code]
+        return row if row != _NULL else None
+
+    def materialize(self, row: int) -> Step:
+        c = self.columns
+        ended_at = c["ended_at"][row]
+        error = self.errors[row]
+        return Step.model_construct(
+            step_id=self.ids.values[c["step"][row]],
+            run_id=self.runs.values[c["run"][row]],
+            parent_step_id=self.ids.value(c["parent"][row]),
+            name=self.names.values[c["name"][row]],
+            type=_TYPES[c["type"][row]],
+            status=_STATUSES[c["status"][row]],
+            started_at=from_micros(c["started_at"][row]),
+            ended_at=from_micros(ended_at) if ended_at != _NO_TIME else None,
+            duration_ms=c["duration_ms"][row],
+            tokens_prompt=c["tokens_prompt"][row],
+            tokens_completion=c["tokens_completion"][row],
+            cost_usd=c["cost_usd"][row],
+            model=self.models.value(c["model"][row]),
+            input=loads(self.inputs[row]),
+            output=loads(self.outputs[row]),
+            error=StepError(**loads(error)) if error is not None else None,
+        )
+
+    # ── Column access ────────────────────────────────────────────────────
+
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy NumPy view of a column. Drop it before the next write:
+        an array cannot grow while a view of it is alive."""
+        return np.frombuffer(self.columns[name], dtype=self.columns[name].typecode)
+
+    def rows(self, step_ids: Iterable[str]) -> np.ndarray:
+        codes, row_of = self.ids.codes, self._row_of
+        return np.fromiter((row_of[codes[sid]] for sid in step_ids), np.intp)
+
+    def pricing_columns(self, step_ids: Optional[list[str]] = None) -> PricingColumns:
+        rows = self.rows(step_ids) if step_ids is not None else slice(None)
+        model_codes = self.column("model")[rows].astype(np.intp)
+        # Steps without a model get the code one past the interned ones.
+        model_codes[model_codes == _NULL] = len(self.models.values)
+        return (
+            model_codes,
+            self.models.values + [None],
+            self.column("started_at")[rows],
+            self.column("tokens_prompt")[rows],
+            self.column("tokens_completion")[rows],
+            self.column("cost_usd")[rows].copy(),
+        )
+
+    def set_cost(self, step_id: str, cost: float) -> None:
+        self.columns["cost_usd"][self._row(step_id)] = cost
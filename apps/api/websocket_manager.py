@@ -1,44 +1,627 @@
 """WebSocket connection manager for per-run rooms."""
 from __future__ import annotations
 
-import json
+import asyncio
+import itertools
 import logging
+import os
+from collections import OrderedDict, deque
+from enum import Enum
+from typing import Callable, Optional
+
 from fastapi import WebSocket
 
+from models import Run, RunFilter, Step
+from pubsub import Bus, create_bus, pack, unpack
+from serialization import FrameEncoding, dumps, encode_frame, envelope, join_array, model_bytes
+
 logger = logging.getLogger(__name__)
 
+# Evicted runs whose last seq is remembered exactly (see ConnectionManager).
+EVICTED_SEQ_RUNS = 16384
+
+
+class OverflowPolicy(str, Enum):
+    """What to do when a subscriber's outbound queue is full."""
+    drop_oldest = "drop_oldest"  # discard the oldest queued message
+    coalesce = "coalesce"        # queued updates of one step/run collapse to the latest; else drop oldest
+    disconnect = "disconnect"    # close the connection; the client reconnects and refetches
+
+
+class StreamMode(str, Enum):
+    """How step completions are sent, negotiated per connection."""
+    full = "full"    # every step_update carries the whole step
+    delta = "delta"  # completions arrive as step_delta with only the changed fields
+
+
+def message_key(message: dict) -> Optional[str]:
+    """Identity of the object a message updates, used for coalescing."""
+    if "step" in message:
+        return "step:" + message["step"]["step_id"]
+    if "run" in message:
+        return "run:" + message["run"]["run_id"]
+    return None
+
+
+class Frame:
+    """One broadcast event with its JSON text for each stream mode.
+
+    Both variants are stamped with the run's ``seq`` and encoded once, then
+    shared by every subscriber and by replays.
+    """
+
+    __slots__ = ("seq", "key", "full", "delta", "_encoded")
+
+    def __init__(self, seq: int, payload: bytes, key: Optional[str], delta: Optional[bytes]) -> None:
+        self.seq = seq
+        self.key = key
+        self.full = self._stamp(seq, payload)
+        self.delta = self._stamp(seq, delta) if delta is not None else None
+        # Non-JSON encodings, filled on first use by a subscriber wanting them.
+        self._encoded: dict[tuple[bool, FrameEncoding], str | bytes] = {}
+
+    @staticmethod
+    def _stamp(seq: int, payload: bytes) -> str:
+        return '{"seq":%d,%s' % (seq, payload[1:].decode())
+
+    def text(self, mode: StreamMode) -> str:
+        if mode is StreamMode.delta and self.delta is not None:
+            return self.delta
+        return self.full
+
+    def render(self, mode: StreamMode, encoding: FrameEncoding) -> str | bytes:
+        """The frame as sent to subscribers of ``mode`` and ``encoding``."""
+        text = self.text(mode)
+        if encoding is FrameEncoding.json:
+            return text
+        cache_key = (text is self.delta, encoding)
+        data = self._encoded.get(cache_key)
+        if data is None:
+            data = self._encoded[cache_key] = encode_frame(text, encoding)
+        return data
+
+    def coalesce_key(self, mode: StreamMode) -> Optional[str]:
+        # A delta only makes sense on top of the snapshot before it, so it
+        # must never replace that snapshot in a subscriber's queue.
+        if mode is StreamMode.delta and self.delta is not None:
+            return None
+        return self.key
+
+
+class Subscriber:
+    """One WebSocket with a bounded outbound queue drained by its own task.
+
+    ``offer`` never awaits, so a slow client only ever delays itself.
+    """
+
+    _unkeyed = itertools.count()
+
+    def __init__(
+        self,
+        manager: "ConnectionManager",
+        run_id: Optional[str],
+        ws: WebSocket,
+        max_queue: int,
+        policy: OverflowPolicy,
+        mode: StreamMode = StreamMode.full,
+        encoding: FrameEncoding = FrameEncoding.json,
+    ) -> None:
+        self.manager = manager
+        self.run_id = run_id
+        self.ws = ws
+        self.max_queue = max_queue
+        self.policy = policy
+        self.mode = mode
+        self.encoding = encoding
+        self.dropped = 0
+        self._queue: OrderedDict[object, str | bytes] = OrderedDict()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._drain())
+
+    def offer(self, payload: str | bytes, key: Optional[str] = None, delta_of: Optional[str] = None) -> None:
+        """Queue a frame, applying the overflow policy when full.
+
+        ``delta_of`` is the key of the object a delta frame builds on, so
+        a newer snapshot of that object can drop it along with the old one.
+        """
+        if self._supersede(payload, key):
+            self._ready.set()
+            return
+        if len(self._queue) >= self.max_queue:
+            if self.policy is OverflowPolicy.disconnect:
+                logger.warning(f"WS queue full, disconnecting slow client: run={self.run_id}")
+                self.manager.disconnect(self.run_id, self.ws)
+                asyncio.create_task(self._close(code=1013))  # 1013: try again later
+                return
+            self._queue.popitem(last=False)
+            self.dropped += 1
+        self._queue[self._slot(key, delta_of)] = payload
+        self._ready.set()
+
+    def _supersede(self, payload: str | bytes, key: Optional[str]) -> bool:
+        """Under the coalesce policy, replace a queued version of ``key``."""
+        if self.policy is not OverflowPolicy.coalesce or key is None or key not in self._queue:
+            return False
+        # The newer version supersedes the queued one and any deltas queued
+        # on top of it. It moves to the back so it still follows everything
+        # else queued after the old one.
+        del self._queue[key]
+        stale = [k for k in self._queue if type(k) is tuple and k[0] == key]
+        for k in stale:
+            del self._queue[k]
+        self._queue[key] = payload
+        self.dropped += 1 + len(stale)
+        return True
+
+    def _slot(self, key: Optional[str], delta_of: Optional[str]) -> object:
+        """Queue key for a frame: its own key if it may coalesce, else a
+        fresh one (tagged with ``delta_of`` under the coalesce policy)."""
+        if self.policy is not OverflowPolicy.coalesce:
+            return next(self._unkeyed)
+        if key is not None:
+            return key
+        if delta_of is not None:
+            return (delta_of, next(self._unkeyed))
+        return next(self._unkeyed)
+
+    @property
+    def backlog(self) -> int:
+        """Frames queued and not yet handed to the socket."""
+        return len(self._queue)
+
+    def send_frame(self, frame: Frame) -> None:
+        key = frame.coalesce_key(self.mode)
+        self.offer(frame.render(self.mode, self.encoding), key, frame.key if key is None else None)
+
+    def preload(self, frames: list[Frame]) -> None:
+        """Queue replayed frames ahead of live ones, ignoring the bound."""
+        for frame in frames:
+            key = frame.coalesce_key(self.mode)
+            payload = frame.render(self.mode, self.encoding)
+            if not self._supersede(payload, key):
+                self._queue[self._slot(key, frame.key if key is None else None)] = payload
+        if frames:
+            self._ready.set()
+
+    async def _drain(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    _, payload = self._queue.popitem(last=False)
+                    if isinstance(payload, str):
+                        await self.ws.send_text(payload)
+                    else:
+                        await self.ws.send_bytes(payload)
+                self._ready.clear()
+        except Exception:
+            self.manager.disconnect(self.run_id, self.ws)
+
+    async def _close(self, code: int) -> None:
+        try:
+            await self.ws.close(code=code)
+        except Exception:
+            pass
+
+    def stop(self) -> None:
+        self._task.cancel()
+
+
+class FirehoseSubscriber(Subscriber):
+    """Subscriber to run updates across all runs matching ``run_filter``."""
+
+    def __init__(
+        self,
+        manager: "ConnectionManager",
+        ws: WebSocket,
+        max_queue: int,
+        policy: OverflowPolicy,
+        run_filter: RunFilter,
+        encoding: FrameEncoding = FrameEncoding.json,
+    ) -> None:
+        super().__init__(manager, None, ws, max_queue, policy, encoding=encoding)
+        self.run_filter = run_filter
+        # Runs this client was told about, so it hears when one stops matching.
+        self.visible: set[str] = set()
+
+
+class ReplayBuffer:
+    """Recent frames of one run, numbered by a per-run sequence.
+
+    Also holds the run's coalescing state: with ``window_s`` set, events
+    wait in ``pending`` (keyed, so repeats collapse) until the window closes.
+    """
+
+    def __init__(self, maxlen: int, window_s: float = 0.0, seq: int = 0) -> None:
+        self.seq = seq
+        self.frames: deque[Frame] = deque(maxlen=maxlen)
+        self.window_s = window_s
+        self.pending: OrderedDict[object, tuple[bytes, Optional[bytes]]] = OrderedDict()
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def append(self, payload: bytes, key: Optional[str], delta: Optional[bytes] = None) -> Frame:
+        """Record the next event under a new sequence number."""
+        self.seq += 1
+        frame = Frame(self.seq, payload, key, delta)
+        self.frames.append(frame)
+        return frame
+
+    def since(self, seq: int) -> Optional[list[Frame]]:
+        """Frames after ``seq``, or None if some were evicted (or ``seq``
+        comes from before a restart and is ahead of this buffer)."""
+        if seq == self.seq:
+            return []
+        if seq > self.seq:
+            return None
+        if not self.frames or self.frames[0].seq > seq + 1:
+            return None
+        return list(itertools.islice(self.frames, seq + 1 - self.frames[0].seq, None))
+
 
 class ConnectionManager:
     """Manages WebSocket connections grouped by run_id."""
 
-    def __init__(self) -> None:
-        self.rooms: dict[str, list[WebSocket]] = {}
+    def __init__(
+        self,
+        max_queue: int = 256,
+        overflow: OverflowPolicy = OverflowPolicy.drop_oldest,
+        replay_frames: int = 512,
+        replay_runs: int = 256,
+        coalesce_ms: int = 0,
+        bus: Optional[Bus] = None,
+    ) -> None:
+        self.rooms: dict[str, dict[WebSocket, Subscriber]] = {}
+        self.max_queue = max_queue
+        self.overflow = overflow
+        # Default coalescing window; 0 sends every event as its own frame.
+        self.coalesce_ms = coalesce_ms
+        # Per-run replay buffers for the most recently active runs.
+        self.replay_frames = replay_frames
+        self.replay_runs = replay_runs
+        self._history: OrderedDict[str, ReplayBuffer] = OrderedDict()
+        # Run seqs are numbered per worker process; a ``from_seq`` is only
+        # replayed when the client saw it under this epoch.
+        self.epoch = os.urandom(4).hex()
+        # Last seq of runs whose buffer was evicted, so a new buffer carries
+        # on from it and a run's seq never goes backwards. Only the latest
+        # EVICTED_SEQ_RUNS are remembered; the highest seq forgotten becomes
+        # the floor every new buffer starts from.
+        self._evicted_seq: OrderedDict[str, int] = OrderedDict()
+        self._seq_floor = 0
+        # Subscribers to /ws/runs, each with its own filter; frames on this
+        # channel are numbered by one global sequence and not replayed.
+        self.firehose: dict[WebSocket, FirehoseSubscriber] = {}
+        self._firehose_seq = 0
+        # Relay to other worker processes. Writes made on another worker
+        # are handed to these hooks so this worker's store can mirror them.
+        self.bus = bus or Bus()
+        self.on_remote_run: Optional[Callable[[Run], None]] = None
+        self.on_remote_steps: Optional[Callable[[list[Step]], None]] = None
+        # Rate changes: (model, prompt, completion, effective_from).
+        self.on_remote_rate: Optional[Callable[[str, float, float, str], None]] = None
+
+    # ── Cross-worker relay ───────────────────────────────────────────────
+
+    async def start(self) -> None:
+        """Start relaying broadcasts to and from other workers."""
+        await self.bus.start(self._on_bus_message)
+
+    async def close(self) -> None:
+        await self.bus.close()
+
+    def _publish(self, op: str, run_id: str, parts: list[bytes], **header) -> None:
+        if self.bus.remote:
+            self.bus.publish(pack({"op": op, "run_id": run_id, **header}, parts))
+
+    def _on_bus_message(self, data: bytes) -> None:
+        """Deliver a broadcast published by another worker."""
+        header, parts = unpack(data)
+        op, run_id = header["op"], header["run_id"]
+        if op == "step":
+            if self.on_remote_steps is not None:
+                self.on_remote_steps([Step.model_validate_json(parts[0])])
+            self._deliver(
+                run_id, envelope("step_update", "step", parts[0]),
+                "step:" + header["step_id"], parts[1] or None,
+            )
+        elif op == "steps":
+            if self.on_remote_steps is not None:
+                self.on_remote_steps([Step.model_validate_json(p) for p in parts])
+            self._deliver(run_id, envelope("step_batch", "steps", join_array(parts)))
+        elif op == "run":
+            run = Run.model_validate_json(parts[0])
+            if self.on_remote_run is not None:
+                self.on_remote_run(run)
+            self._deliver_run(run, parts[0])
+        elif op == "raw":
+            self._deliver(run_id, parts[0], header["key"], parts[1] or None)
+        elif op == "window":
+            self._set_coalesce_window(run_id, header["window_ms"])
+        elif op == "rate":
+            if self.on_remote_rate is not None:
+                self.on_remote_rate(
+                    header["model"], header["prompt"], header["completion"], header["effective_from"],
+                )
 
-    async def connect(self, run_id: str, ws: WebSocket) -> None:
+    # ── Subscriptions ────────────────────────────────────────────────────
+
+    async def connect(
+        self,
+        run_id: str,
+        ws: WebSocket,
+        from_seq: Optional[int] = None,
+        mode: StreamMode = StreamMode.full,
+        encoding: FrameEncoding = FrameEncoding.json,
+        epoch: Optional[str] = None,
+    ) -> Subscriber:
+        """Subscribe ``ws`` to a run.
+
+        The client first gets a ``hello`` frame carrying this worker's
+        ``epoch``. With ``from_seq``, frames numbered after it are replayed
+        before live ones. If they have already left the buffer, or
+        ``from_seq`` was not seen under this epoch (the client was on
+        another worker), the client gets a ``resync`` frame telling it to
+        refetch over REST instead. ``from_seq=0`` replays from the start
+        on any worker.
+        """
         await ws.accept()
-        self.rooms.setdefault(run_id, []).append(ws)
+        sub = Subscriber(self, run_id, ws, self.max_queue, self.overflow, mode, encoding)
+        history = self._replay_buffer(run_id)
+        hello = b'{"type":"hello","epoch":"%s"}' % self.epoch.encode()
+        if from_seq is None:
+            sub.send_frame(Frame(history.seq, hello, None, None))
+        else:
+            frames = history.since(from_seq) if from_seq == 0 or epoch == self.epoch else None
+            if frames is None:
+                sub.send_frame(Frame(
+                    history.seq, b'{"type":"resync","epoch":"%s"}' % self.epoch.encode(), None, None,
+                ))
+            else:
+                sub.send_frame(Frame(from_seq, hello, None, None))
+                sub.preload(frames)
+        # Registered in the same tick as the replay, so no frame falls between.
+        self.rooms.setdefault(run_id, {})[ws] = sub
         logger.info(f"WS connected: run={run_id} (total={len(self.rooms[run_id])})")
+        return sub
+
+    async def connect_firehose(
+        self,
+        ws: WebSocket,
+        run_filter: RunFilter,
+        snapshot: Callable[[], tuple[list[Run], list[bytes]]],
+        encoding: FrameEncoding = FrameEncoding.json,
+    ) -> FirehoseSubscriber:
+        """Subscribe ``ws`` to updates of every run matching ``run_filter``.
+
+        The client first gets a ``runs_snapshot`` of the matching runs
+        (``snapshot()`` returns them with their encoded JSON), then live
+        ``run_update`` frames and a ``run_removed`` frame for any run it
+        was shown that stops matching.
+        """
+        await ws.accept()
+        # Taken after the handshake and in the same tick as registration,
+        # so every run update lands in the snapshot or in the stream.
+        runs, encoded = snapshot()
+        sub = FirehoseSubscriber(self, ws, self.max_queue, self.overflow, run_filter, encoding)
+        sub.visible.update(run.run_id for run in runs)
+        sub.send_frame(Frame(
+            self._firehose_seq, envelope("runs_snapshot", "runs", join_array(encoded)), None, None,
+        ))
+        self.firehose[ws] = sub
+        logger.info(f"WS firehose connected (total={len(self.firehose)})")
+        return sub
 
-    def disconnect(self, run_id: str, ws: WebSocket) -> None:
-        if run_id in self.rooms:
-            self.rooms[run_id] = [c for c in self.rooms[run_id] if c is not ws]
-            if not self.rooms[run_id]:
-                del self.rooms[run_id]
+    def disconnect(self, run_id: Optional[str], ws: WebSocket) -> None:
+        if run_id is None:
+            sub = self.firehose.pop(ws, None)
+            if sub is not None:
+                sub.stop()
+                logger.info("WS firehose disconnected")
+            return
+        room = self.rooms.get(run_id)
+        if room is None:
+            return
+        sub = room.pop(ws, None)
+        if sub is None:
+            return
+        sub.stop()
+        if not room:
+            del self.rooms[run_id]
         logger.info(f"WS disconnected: run={run_id}")
 
     async def broadcast(self, run_id: str, message: dict) -> None:
-        """Send a JSON message to all clients subscribed to a run_id."""
-        if run_id not in self.rooms:
+        """Queue a JSON message for all clients subscribed to a run_id."""
+        await self.broadcast_encoded(run_id, dumps(message), message_key(message))
+
+    async def broadcast_step(
+        self,
+        step: Step,
+        encoded: bytes,
+        changed: Optional[set[str]] = None,
+        changes: Optional[bytes] = None,
+    ) -> None:
+        """Send a step_update built around the step's cached encoding.
+
+        ``changed`` names the fields modified since the previous broadcast
+        of this step; delta-mode subscribers then get a ``step_delta``
+        carrying only those fields instead of the full snapshot. Callers
+        that have those fields encoded already pass them as ``changes``.
+        """
+        delta = None
+        if changed:
+            delta = b'{"type":"step_delta","run_id":%s,"step_id":%s,"changes":%s}' % (
+                dumps(step.run_id), dumps(step.step_id),
+                changes if changes is not None else model_bytes(step, include=changed),
+            )
+        self._deliver(
+            step.run_id, envelope("step_update", "step", encoded), "step:" + step.step_id, delta,
+        )
+        self._publish("step", step.run_id, [encoded, delta or b""], step_id=step.step_id)
+
+    async def broadcast_steps(self, run_id: str, encoded: list[bytes]) -> None:
+        """Send one step_batch with the cached encodings of a run's steps."""
+        self._deliver(run_id, envelope("step_batch", "steps", join_array(encoded)))
+        self._publish("steps", run_id, encoded)
+
+    async def broadcast_run(self, run: Run, encoded: bytes) -> None:
+        """Send a run_update built around the run's cached encoding, to the
+        run's own subscribers and to matching firehose subscribers."""
+        self._deliver_run(run, encoded)
+        self._publish("run", run.run_id, [encoded])
+
+    def _deliver_run(self, run: Run, encoded: bytes) -> None:
+        payload = envelope("run_update", "run", encoded)
+        self._deliver(run.run_id, payload, "run:" + run.run_id)
+        if self.firehose:
+            self._broadcast_firehose(run, payload)
+
+    def _broadcast_firehose(self, run: Run, payload: bytes) -> None:
+        update: Optional[Frame] = None
+        removed: Optional[Frame] = None
+        for sub in list(self.firehose.values()):
+            if sub.run_filter.matches(run):
+                if update is None:
+                    self._firehose_seq += 1
+                    update = Frame(self._firehose_seq, payload, "run:" + run.run_id, None)
+                sub.visible.add(run.run_id)
+                sub.send_frame(update)
+            elif run.run_id in sub.visible:
+                if removed is None:
+                    self._firehose_seq += 1
+                    removed = Frame(self._firehose_seq, b'{"type":"run_removed","run_id":%s}' % (
+                        dumps(run.run_id)), None, None)
+                sub.visible.discard(run.run_id)
+                sub.send_frame(removed)
+
+    async def broadcast_encoded(
+        self,
+        run_id: str,
+        payload: bytes,
+        key: Optional[str] = None,
+        delta: Optional[bytes] = None,
+    ) -> None:
+        """Queue an already-encoded JSON object frame for every subscriber,
+        on this worker and (through the bus) on all others."""
+        self._deliver(run_id, payload, key, delta)
+        self._publish("raw", run_id, [payload, delta or b""], key=key)
+
+    def _deliver(
+        self,
+        run_id: str,
+        payload: bytes,
+        key: Optional[str] = None,
+        delta: Optional[bytes] = None,
+    ) -> None:
+        """Queue a frame for this worker's subscribers of a run.
+
+        The frame gets the run's next ``seq`` and is kept for replay even
+        when nobody is connected yet. It is rendered once per stream mode
+        and encoding and shared by all subscribers; nothing here waits for
+        a network write. If the run has a coalescing window, the event is
+        held until the window closes (see ``set_coalesce_window``).
+        """
+        history = self._replay_buffer(run_id)
+        if history.window_s <= 0:
+            self._emit(run_id, history, payload, key, delta)
             return
-        payload = json.dumps(message, default=str)
-        stale: list[WebSocket] = []
-        for ws in self.rooms[run_id]:
-            try:
-                await ws.send_text(payload)
-            except Exception:
-                stale.append(ws)
-        for ws in stale:
-            self.disconnect(run_id, ws)
+        previous = history.pending.pop(key, None) if key is not None else None
+        if previous is not None and delta is not None:
+            # The snapshot this delta builds on was never sent, so send
+            # the complete new version instead.
+            delta = None
+        history.pending[key if key is not None else next(Subscriber._unkeyed)] = (payload, delta)
+        if history.flush_handle is None:
+            history.flush_handle = asyncio.get_running_loop().call_later(
+                history.window_s, self._flush_pending, run_id, history,
+            )
+
+    def set_coalesce_window(self, run_id: str, window_ms: int) -> None:
+        """Coalesce a run's events over ``window_ms`` milliseconds.
+
+        Within a window, updates of the same step or run collapse to the
+        latest and the rest go out together as one ``batch`` frame, so each
+        subscriber gets at most one frame per window however fast the run
+        produces events. 0 turns coalescing off.
+        """
+        self._set_coalesce_window(run_id, window_ms)
+        self._publish("window", run_id, [], window_ms=window_ms)
+
+    def publish_rate(self, model: str, prompt: float, completion: float, effective_from: str) -> None:
+        """Tell other workers about a rate set on this one, so they price
+        new steps and re-price stored ones alike."""
+        self._publish(
+            "rate", "", [], model=model, prompt=prompt, completion=completion,
+            effective_from=effective_from,
+        )
+
+    def _set_coalesce_window(self, run_id: str, window_ms: int) -> None:
+        history = self._replay_buffer(run_id)
+        history.window_s = window_ms / 1000
+        if history.window_s <= 0 and history.flush_handle is not None:
+            history.flush_handle.cancel()
+            self._flush_pending(run_id, history)
+
+    def _flush_pending(self, run_id: str, history: ReplayBuffer) -> None:
+        history.flush_handle = None
+        events, history.pending = list(history.pending.values()), OrderedDict()
+        if len(events) == 1:
+            payload, delta = events[0]
+            self._emit(run_id, history, payload, None, delta)
+            return
+        if not events:
+            return
+        payload = envelope("batch", "messages", join_array([p for p, _ in events]))
+        delta = None
+        if any(d is not None for _, d in events):
+            delta = envelope("batch", "messages", join_array([d or p for p, d in events]))
+        self._emit(run_id, history, payload, None, delta)
+
+    def _emit(
+        self,
+        run_id: str,
+        history: ReplayBuffer,
+        payload: bytes,
+        key: Optional[str],
+        delta: Optional[bytes],
+    ) -> None:
+        frame = history.append(payload, key, delta)
+        room = self.rooms.get(run_id)
+        if not room:
+            return
+        for sub in list(room.values()):
+            sub.send_frame(frame)
+
+    def _replay_buffer(self, run_id: str) -> ReplayBuffer:
+        history = self._history.get(run_id)
+        if history is None:
+            history = self._history[run_id] = ReplayBuffer(
+                self.replay_frames, self.coalesce_ms / 1000, self._evicted_seq.pop(run_id, self._seq_floor),
+            )
+            if len(self._history) > self.replay_runs:
+                self._evict_buffer()
+        else:
+            self._history.move_to_end(run_id)
+        return history
+
+    def _evict_buffer(self) -> None:
+        """Drop the least recently active replay buffer of a run with no
+        subscribers and no events waiting for its coalescing window. Other
+        buffers are kept, so the cap can be exceeded while they are in use."""
+        for run_id, history in self._history.items():
+            if not history.pending and run_id not in self.rooms:
+                del self._history[run_id]
+                self._evicted_seq[run_id] = history.seq
+                if len(self._evicted_seq) > EVICTED_SEQ_RUNS:
+                    _, seq = self._evicted_seq.popitem(last=False)
+                    self._seq_floor = max(self._seq_floor, seq)
+                return
 
 
-manager = ConnectionManager()
+manager = ConnectionManager(
+    max_queue=int(os.environ.get("WS_QUEUE_SIZE", "256")),
+    overflow=OverflowPolicy(os.environ.get("WS_OVERFLOW_POLICY", OverflowPolicy.drop_oldest.value)),
+    replay_frames=int(os.environ.get("WS_REPLAY_FRAMES", "512")),
+    replay_runs=int(os.environ.get("WS_REPLAY_RUNS", "256")),
+    coalesce_ms=int(os.environ.get("WS_COALESCE_MS", "0")),
+    bus=create_bus(os.environ.get("BROADCAST_BUS_URL")),
+)
@@ -1,42 +1,63 @@
 "use client";
 
-import { useState, useMemo, useEffect } from "react";
+import { useState, useMemo, useEffect, useRef } from "react";
 import { AppSidebar } from "@/components/layout/app-sidebar";
 import { TopNav } from "@/components/layout/top-nav";
 import { LatencyChart } from "@/components/dashboard/latency-chart";
 import { MetricsPanel } from "@/components/dashboard/metrics-panel";
 import { TraceTable } from "@/components/dashboard/trace-table";
 import { StatsBar } from "@/components/dashboard/stats-bar";
-import { useRuns } from "@/hooks/use-runs";
+import { useRuns, useStats } from "@/hooks/use-runs";
 import { getRunSteps } from "@/lib/api";
 import { Skeleton } from "@/components/ui/skeleton";
 import type { Step } from "@/types";
 
 export default function DashboardPage() {
   const { data: runs, isLoading } = useRuns();
+  const { data: stats } = useStats();
   const [allSteps, setAllSteps] = useState<Map<string, Step[]>>(new Map());
 
-  // Fetch steps for all runs
+  // Steps of the 20 newest runs. Keyed on each run's id and status, so a
+  // run is refetched when it appears or changes status, not on every
+  // run_update the firehose delivers.
+  const stepKeys = useMemo(
+    () => (runs ?? []).slice(0, 20).map((run) => `${run.run_id}:${run.status}`).join(","),
+    [runs]
+  );
+  const fetchedKeys = useRef(new Set<string>());
+
   useEffect(() => {
-    if (!runs || runs.length === 0) return;
+    if (!stepKeys) return;
+    const keys = stepKeys.split(",");
+    const stale = keys.filter((key) => !fetchedKeys.current.has(key));
+    fetchedKeys.current = new Set(keys);
+    const runIdOf = (key: string) => key.slice(0, key.lastIndexOf(":"));
 
     const fetchSteps = async () => {
-      const newMap = new Map<string, Step[]>();
+      const fetched = new Map<string, Step[]>();
       await Promise.all(
-        runs.slice(0, 20).map(async (run) => {
+        stale.map(async (key) => {
+          const runId = runIdOf(key);
           try {
-            const steps = await getRunSteps(run.run_id);
-            newMap.set(run.run_id, steps);
+            fetched.set(runId, await getRunSteps(runId));
           } catch {
-            newMap.set(run.run_id, []);
+            fetched.set(runId, []);
           }
         })
       );
-      setAllSteps(newMap);
+      // Kept to the latest listed runs, which a later effect may have changed.
+      setAllSteps((prev) => {
+        const next = new Map<string, Step[]>();
+        for (const key of fetchedKeys.current) {
+          const runId = runIdOf(key);
+          next.set(runId, fetched.get(runId) ?? prev.get(runId) ?? []);
+        }
+        return next;
+      });
     };
 
     fetchSteps();
-  }, [runs]);
+  }, [stepKeys]);
 
   const currentRuns = runs ?? [];
 
@@ -59,11 +80,11 @@ export default function DashboardPage() {
           ) : (
             <>
               {/* Stats bar */}
-              <StatsBar runs={currentRuns} allSteps={allSteps} />
+              <StatsBar stats={stats?.global} />
 
               {/* Chart + Metrics panel */}
               <div className="grid grid-cols-1 lg:grid-cols-[1fr_300px] gap-5">
-                <LatencyChart runs={currentRuns} allSteps={allSteps} />
+                <LatencyChart />
                 <MetricsPanel runs={currentRuns} allSteps={allSteps} />
               </div>
 
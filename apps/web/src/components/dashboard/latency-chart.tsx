@@ -11,45 +11,26 @@ import {
   ResponsiveContainer,
   Legend,
 } from "recharts";
-import type { Run, Step } from "@/types";
+import { useLatencyTimeseries } from "@/hooks/use-runs";
+import type { LatencyPoint } from "@/types";
 
-interface LatencyChartProps {
-  runs: Run[];
-  allSteps: Map<string, Step[]>;
-}
+/** p50/p95 per 10s bucket from the server's streaming latency sketches. */
+export function LatencyChart() {
+  const { data: latency } = useLatencyTimeseries("type", "15m");
 
-export function LatencyChart({ runs, allSteps }: LatencyChartProps) {
   const chartData = useMemo(() => {
-    // Generate time-series data from runs
-    const sortedRuns = [...runs]
-      .sort((a, b) => new Date(a.created_at).getTime() - new Date(b.created_at).getTime())
-      .slice(-40); // Last 40 data points
-
-    return sortedRuns.map((run, idx) => {
-      const steps = allSteps.get(run.run_id) || [];
-      const llmSteps = steps.filter((s) => s.type === "llm");
-      const toolSteps = steps.filter((s) => s.type === "tool");
-
-      const avgLatency = steps.length > 0
-        ? steps.reduce((a, s) => a + (s.duration_ms || 0), 0) / steps.length
-        : Math.random() * 200 + 50;
-
-      const llmLatency = llmSteps.length > 0
-        ? llmSteps.reduce((a, s) => a + (s.duration_ms || 0), 0) / llmSteps.length
-        : avgLatency * (0.8 + Math.random() * 0.4);
-
-      const toolLatency = toolSteps.length > 0
-        ? toolSteps.reduce((a, s) => a + (s.duration_ms || 0), 0) / toolSteps.length
-        : avgLatency * (0.3 + Math.random() * 0.5);
+    const series = latency?.series ?? {};
+    const byTime = (points: LatencyPoint[] = []) => new Map(points.map((p) => [p.t, p] as const));
+    const llm = byTime(series.llm);
+    const tool = byTime(series.tool);
 
-      return {
-        name: `${idx + 1}`,
-        avgLatency: Math.round(avgLatency),
-        llmLatency: Math.round(llmLatency),
-        toolLatency: Math.round(toolLatency),
-      };
-    });
-  }, [runs, allSteps]);
+    return (series.all ?? []).slice(-40).map((point) => ({
+      name: new Date(point.t * 1000).toLocaleTimeString([], { hour: "2-digit", minute: "2-digit", second: "2-digit" }),
+      avgLatency: Math.round(point.p50 ?? 0),
+      llmLatency: Math.round(llm.get(point.t)?.p95 ?? 0),
+      toolLatency: Math.round(tool.get(point.t)?.p95 ?? 0),
+    }));
+  }, [latency]);
 
   // If no data, generate sample data
   const data = chartData.length > 0 ? chartData : Array.from({ length: 40 }, (_, i) => ({
@@ -122,7 +103,7 @@ export function LatencyChart({ runs, allSteps }: LatencyChartProps) {
               stroke="hsl(187, 100%, 50%)"
               strokeWidth={2}
               fill="url(#gradCyan)"
-              name="LLM Latency"
+              name="LLM p95"
               dot={false}
             />
             <Area
@@ -131,7 +112,7 @@ export function LatencyChart({ runs, allSteps }: LatencyChartProps) {
               stroke="hsl(174, 72%, 56%)"
               strokeWidth={1.5}
               fill="url(#gradTeal)"
-              name="Avg Latency"
+              name="p50 (all)"
               dot={false}
             />
             <Area
@@ -140,7 +121,7 @@ export function LatencyChart({ runs, allSteps }: LatencyChartProps) {
               stroke="hsl(217, 91%, 65%)"
               strokeWidth={1.5}
               fill="url(#gradBlue)"
-              name="Tool Latency"
+              name="Tool p95"
               dot={false}
             />
           </AreaChart>
@@ -1,37 +1,25 @@
 "use client";
 
 import React, { useMemo } from "react";
-import type { Run, Step } from "@/types";
+import type { Stats } from "@/types";
 
 interface StatsBarProps {
-  runs: Run[];
-  allSteps: Map<string, Step[]>;
+  /** Global aggregates from `GET /api/stats`. */
+  stats: Stats | undefined;
 }
 
-export function StatsBar({ runs, allSteps }: StatsBarProps) {
+export function StatsBar({ stats: totals }: StatsBarProps) {
   const stats = useMemo(() => {
-    const completed = runs.filter((r) => r.status === "completed").length;
-    const running = runs.filter((r) => r.status === "running").length;
-    const failed = runs.filter((r) => r.status === "failed").length;
-
-    let totalTokens = 0;
-    let totalCost = 0;
-    let totalSteps = 0;
-
-    allSteps.forEach((steps) => {
-      steps.forEach((s) => {
-        totalTokens += (s.tokens_prompt || 0) + (s.tokens_completion || 0);
-        totalCost += s.cost_usd || 0;
-      });
-      totalSteps += steps.length;
-    });
+    const runsByStatus = totals?.runs_by_status ?? {};
+    const totalTokens = totals?.tokens_total ?? 0;
+    const totalCost = totals?.cost_usd ?? 0;
 
     return [
-      { label: "Total Runs", value: runs.length.toString(), color: "text-foreground" },
-      { label: "Running", value: running.toString(), color: "text-blue-400" },
-      { label: "Completed", value: completed.toString(), color: "text-emerald-400" },
-      { label: "Failed", value: failed.toString(), color: "text-red-400" },
-      { label: "Total Steps", value: totalSteps.toString(), color: "text-foreground" },
+      { label: "Total Runs", value: (totals?.runs ?? 0).toString(), color: "text-foreground" },
+      { label: "Running", value: (runsByStatus.running ?? 0).toString(), color: "text-blue-400" },
+      { label: "Completed", value: (runsByStatus.completed ?? 0).toString(), color: "text-emerald-400" },
+      { label: "Failed", value: (runsByStatus.failed ?? 0).toString(), color: "text-red-400" },
+      { label: "Total Steps", value: (totals?.steps ?? 0).toString(), color: "text-foreground" },
       {
         label: "Tokens",
         value: totalTokens > 1000 ? `${(totalTokens / 1000).toFixed(1)}k` : totalTokens.toString(),
@@ -43,7 +31,7 @@ export function StatsBar({ runs, allSteps }: StatsBarProps) {
         color: "text-foreground",
       },
     ];
-  }, [runs, allSteps]);
+  }, [totals]);
 
   return (
     <div className="flex items-center gap-6 rounded-lg border bg-card px-5 py-3 overflow-x-auto">
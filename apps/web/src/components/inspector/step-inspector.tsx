@@ -23,6 +23,7 @@ import {
   ChevronRight,
 } from "lucide-react";
 import { cn, formatDuration, formatTokens, formatCost, formatTimestamp } from "@/lib/utils";
+import { useStepPayload } from "@/hooks/use-steps";
 import type { Step } from "@/types";
 
 interface StepInspectorProps {
@@ -89,8 +90,13 @@ function JsonBlock({ label, data }: { label: string; data: unknown }) {
 }
 
 export function StepInspector({ step, open, onOpenChange }: StepInspectorProps) {
+  // Large payload values are fetched on demand; undefined while loading.
+  const payload = useStepPayload(step);
   if (!step) return null;
 
+  const input = payload?.input;
+  const output = payload?.output;
+
   const totalTokens = step.tokens_prompt + step.tokens_completion;
 
   return (
@@ -132,7 +138,7 @@ export function StepInspector({ step, open, onOpenChange }: StepInspectorProps)
               />
               <MetricCard
                 icon={Coins}
-                label="Cost"
+                label={step.model ? `Cost (${step.model})` : "Cost"}
                 value={formatCost(step.cost_usd)}
               />
               <MetricCard
@@ -170,32 +176,32 @@ export function StepInspector({ step, open, onOpenChange }: StepInspectorProps)
             {/* LLM-specific: Prompt & Completion */}
             {step.type === "llm" && (
               <>
-                {step.input?.prompt && (
+                {input?.prompt && (
                   <div className="space-y-1">
                     <p className="text-xs font-medium text-muted-foreground">
                       Prompt
                     </p>
                     <div className="relative">
                       <div className="absolute right-2 top-2">
-                        <CopyButton text={String(step.input.prompt)} />
+                        <CopyButton text={String(input.prompt)} />
                       </div>
                       <div className="rounded-md bg-blue-500/5 border border-blue-500/20 p-3 text-sm whitespace-pre-wrap max-h-48 overflow-y-auto">
-                        {String(step.input.prompt)}
+                        {String(input.prompt)}
                       </div>
                     </div>
                   </div>
                 )}
-                {step.output?.completion && (
+                {output?.completion && (
                   <div className="space-y-1">
                     <p className="text-xs font-medium text-muted-foreground">
                       Completion
                     </p>
                     <div className="relative">
                       <div className="absolute right-2 top-2">
-                        <CopyButton text={String(step.output.completion)} />
+                        <CopyButton text={String(output.completion)} />
                       </div>
                       <div className="rounded-md bg-green-500/5 border border-green-500/20 p-3 text-sm whitespace-pre-wrap max-h-48 overflow-y-auto">
-                        {String(step.output.completion)}
+                        {String(output.completion)}
                       </div>
                     </div>
                   </div>
@@ -206,17 +212,17 @@ export function StepInspector({ step, open, onOpenChange }: StepInspectorProps)
             {/* Tool-specific */}
             {step.type === "tool" && (
               <>
-                {step.input?.tool && (
+                {input?.tool && (
                   <div className="space-y-1">
                     <p className="text-xs font-medium text-muted-foreground">
                       Tool Name
                     </p>
                     <code className="rounded bg-purple-500/10 px-2 py-1 text-sm text-purple-400">
-                      {String(step.input.tool)}
+                      {String(input.tool)}
                     </code>
                   </div>
                 )}
-                {step.input?.args && (
+                {input?.args && (
                   <div className="space-y-1">
                     <p className="text-xs font-medium text-muted-foreground">
                       Arguments
@@ -224,11 +230,11 @@ export function StepInspector({ step, open, onOpenChange }: StepInspectorProps)
                     <div className="relative">
                       <div className="absolute right-2 top-2">
                         <CopyButton
-                          text={JSON.stringify(step.input.args, null, 2)}
+                          text={JSON.stringify(input.args, null, 2)}
                         />
                       </div>
                       <pre className="rounded-md bg-purple-500/5 border border-purple-500/20 p-3 text-xs font-mono overflow-x-auto max-h-32 overflow-y-auto">
-                        {JSON.stringify(step.input.args, null, 2)}
+                        {JSON.stringify(input.args, null, 2)}
                       </pre>
                     </div>
                   </div>
@@ -260,8 +266,8 @@ export function StepInspector({ step, open, onOpenChange }: StepInspectorProps)
             <Separator />
 
             {/* Raw Input/Output JSON */}
-            <JsonBlock label="Raw Input" data={step.input} />
-            <JsonBlock label="Raw Output" data={step.output} />
+            <JsonBlock label="Raw Input" data={input} />
+            <JsonBlock label="Raw Output" data={output} />
 
             {/* Timestamps */}
             <div className="space-y-1">
@@ -1,14 +1,63 @@
 "use client";
 
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
-import { listRuns, getRun, createRun, listScenarios } from "@/lib/api";
-import type { CreateRunRequest } from "@/types";
+import { useEffect } from "react";
+import { useQuery, useMutation, useQueryClient, type QueryClient } from "@tanstack/react-query";
+import { listRuns, getRun, createRun, getLatencyTimeseries, getStats, listScenarios } from "@/lib/api";
+import { RunsFirehose } from "@/lib/websocket";
+import type { CreateRunRequest, LatencyGroup, LatencyWindow, Run } from "@/types";
 
+const RUNS_LIMIT = 50;
+
+/** Newest-first insert/replace of `run`, capped at the list size. */
+function upsertRun(runs: Run[], run: Run): Run[] {
+  const rest = runs.filter((r) => r.run_id !== run.run_id);
+  const idx = rest.findIndex((r) => r.created_at < run.created_at);
+  rest.splice(idx === -1 ? rest.length : idx, 0, run);
+  return rest.slice(0, RUNS_LIMIT);
+}
+
+// One firehose shared by every component showing the runs list.
+let firehose: { socket: RunsFirehose; users: number } | null = null;
+
+function subscribeRuns(queryClient: QueryClient): () => void {
+  if (!firehose) {
+    const socket = new RunsFirehose({}, RUNS_LIMIT, (msg) => {
+      if (msg.type === "runs_snapshot") {
+        queryClient.setQueryData<Run[]>(["runs"], msg.runs);
+      } else if (msg.type === "run_update") {
+        queryClient.setQueryData<Run[]>(["runs"], (runs) => upsertRun(runs ?? [], msg.run));
+        queryClient.setQueryData<Run>(["run", msg.run.run_id], msg.run);
+      } else if (msg.type === "run_removed") {
+        queryClient.setQueryData<Run[]>(["runs"], (runs) =>
+          runs?.filter((r) => r.run_id !== msg.run_id)
+        );
+      }
+    });
+    socket.connect();
+    firehose = { socket, users: 0 };
+  }
+  firehose.users += 1;
+  return () => {
+    if (firehose && --firehose.users === 0) {
+      firehose.socket.disconnect();
+      firehose = null;
+    }
+  };
+}
+
+/**
+ * Recent runs, kept current by the `/ws/runs` firehose instead of polling.
+ * The initial REST fetch only covers the time before the socket's snapshot.
+ */
 export function useRuns() {
+  const queryClient = useQueryClient();
+
+  useEffect(() => subscribeRuns(queryClient), [queryClient]);
+
   return useQuery({
     queryKey: ["runs"],
-    queryFn: () => listRuns(50),
-    refetchInterval: 5000,
+    queryFn: () => listRuns(RUNS_LIMIT),
+    staleTime: Infinity,
   });
 }
 
@@ -21,6 +70,23 @@ export function useRun(runId: string | undefined) {
   });
 }
 
+/** Server-side aggregates; cheap to poll since nothing is rescanned. */
+export function useStats() {
+  return useQuery({
+    queryKey: ["stats"],
+    queryFn: getStats,
+    refetchInterval: 5000,
+  });
+}
+
+export function useLatencyTimeseries(group: LatencyGroup, window: LatencyWindow) {
+  return useQuery({
+    queryKey: ["latency", group, window],
+    queryFn: () => getLatencyTimeseries(group, window),
+    refetchInterval: 10000,
+  });
+}
+
 export function useScenarios() {
   return useQuery({
     queryKey: ["scenarios"],
@@ -33,8 +99,9 @@ export function useCreateRun() {
 
   return useMutation({
     mutationFn: (req: CreateRunRequest) => createRun(req),
-    onSuccess: () => {
-      queryClient.invalidateQueries({ queryKey: ["runs"] });
+    // The firehose announces the new run; just show it without waiting.
+    onSuccess: (run) => {
+      queryClient.setQueryData<Run[]>(["runs"], (runs) => upsertRun(runs ?? [], run));
     },
   });
 }
@@ -1,41 +1,118 @@
 "use client";
 
 import { useQuery, useQueryClient } from "@tanstack/react-query";
-import { getRunSteps } from "@/lib/api";
-import type { Step } from "@/types";
-import { useCallback } from "react";
+import { getRunStepsSince, getStepPayload } from "@/lib/api";
+import type { PayloadRef, Step, StepPayload } from "@/types";
+import { useCallback, useRef } from "react";
+
+/** Upsert `steps` into `oldSteps` by step_id, keeping existing order. */
+export function mergeSteps(oldSteps: Step[], steps: Step[]): Step[] {
+  if (steps.length === 0) return oldSteps;
+  const updated = [...oldSteps];
+  const indexById = new Map(updated.map((s, i) => [s.step_id, i] as const));
+  for (const step of steps) {
+    const idx = indexById.get(step.step_id);
+    if (idx !== undefined) {
+      updated[idx] = step;
+    } else {
+      indexById.set(step.step_id, updated.length);
+      updated.push(step);
+    }
+  }
+  return updated;
+}
 
 export function useSteps(runId: string | undefined) {
+  const queryClient = useQueryClient();
+  // Version (and the worker epoch that numbered it) of the last response
+  // per run, so polls only fetch changes.
+  const versions = useRef(new Map<string, { version: number; epoch: string }>());
+
   return useQuery({
     queryKey: ["steps", runId],
-    queryFn: () => getRunSteps(runId!),
+    queryFn: async () => {
+      const cached = queryClient.getQueryData<Step[]>(["steps", runId]);
+      const since = cached ? versions.current.get(runId!) : undefined;
+      const data = await getRunStepsSince(runId!, since);
+      versions.current.set(runId!, { version: data.version, epoch: data.epoch });
+      // Another worker answers a foreign version with every step.
+      return cached && since !== undefined && since.epoch === data.epoch
+        ? mergeSteps(cached, data.steps)
+        : data.steps;
+    },
     enabled: !!runId,
     refetchInterval: 2000,
   });
 }
 
+function isPayloadRef(value: unknown): value is PayloadRef {
+  return (
+    typeof value === "object" &&
+    value !== null &&
+    "$blob" in value &&
+    Object.keys(value).length === 2
+  );
+}
+
+function hasPayloadRefs(step: Step): boolean {
+  return (
+    Object.values(step.input).some(isPayloadRef) ||
+    Object.values(step.output).some(isPayloadRef)
+  );
+}
+
 /**
- * Utility to upsert a step in the cached steps list.
+ * The step's input and output with payload references resolved. Steps
+ * holding references fetch them once per status (output arrives on
+ * completion); others resolve to their own payloads. Null while loading.
+ */
+export function useStepPayload(step: Step | null): StepPayload | null {
+  const needsFetch = !!step && hasPayloadRefs(step);
+  const { data } = useQuery({
+    queryKey: ["payload", step?.step_id, step?.status],
+    queryFn: () => getStepPayload(step!.step_id),
+    enabled: needsFetch,
+    staleTime: Infinity,
+  });
+  if (!step) return null;
+  if (!needsFetch) {
+    return { step_id: step.step_id, input: step.input, output: step.output };
+  }
+  return data ?? null;
+}
+
+/**
+ * Utility to upsert steps in the cached steps list.
  * Used by WebSocket handler to merge real-time updates.
  */
-export function useUpsertStep() {
+export function useUpsertSteps() {
+  const queryClient = useQueryClient();
+
+  return useCallback(
+    (runId: string, steps: Step[]) => {
+      queryClient.setQueryData<Step[]>(["steps", runId], (oldSteps) =>
+        oldSteps ? mergeSteps(oldSteps, steps) : steps
+      );
+    },
+    [queryClient]
+  );
+}
+
+/**
+ * Apply a step_delta: merge the changed fields into the cached step.
+ * Returns false if the step is not cached, so the caller can refetch.
+ */
+export function useApplyStepDelta() {
   const queryClient = useQueryClient();
 
   return useCallback(
-    (step: Step) => {
-      queryClient.setQueryData<Step[]>(
-        ["steps", step.run_id],
-        (oldSteps) => {
-          if (!oldSteps) return [step];
-          const idx = oldSteps.findIndex((s) => s.step_id === step.step_id);
-          if (idx >= 0) {
-            const updated = [...oldSteps];
-            updated[idx] = step;
-            return updated;
-          }
-          return [...oldSteps, step];
-        }
+    (runId: string, stepId: string, changes: Partial<Step>): boolean => {
+      const cached = queryClient.getQueryData<Step[]>(["steps", runId]);
+      if (!cached?.some((s) => s.step_id === stepId)) return false;
+      queryClient.setQueryData<Step[]>(["steps", runId], (oldSteps) =>
+        oldSteps?.map((s) => (s.step_id === stepId ? { ...s, ...changes } : s))
       );
+      return true;
     },
     [queryClient]
   );
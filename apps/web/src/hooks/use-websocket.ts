@@ -3,25 +3,48 @@
 import { useEffect, useRef, useCallback } from "react";
 import { useQueryClient } from "@tanstack/react-query";
 import { RunWebSocket } from "@/lib/websocket";
-import { useUpsertStep } from "./use-steps";
-import type { Run, WsMessage } from "@/types";
+import { useApplyStepDelta, useUpsertSteps } from "./use-steps";
+import type { Run, Step, WsEvent, WsMessage } from "@/types";
 
 export function useRunWebSocket(runId: string | undefined) {
   const wsRef = useRef<RunWebSocket | null>(null);
-  const upsertStep = useUpsertStep();
+  const upsertSteps = useUpsertSteps();
+  const applyStepDelta = useApplyStepDelta();
   const queryClient = useQueryClient();
 
   const handleMessage = useCallback(
     (msg: WsMessage) => {
-      if (msg.type === "step_update") {
-        upsertStep(msg.step);
-      } else if (msg.type === "run_update") {
-        queryClient.setQueryData<Run>(["run", msg.run.run_id], msg.run);
-        // Also invalidate the runs list so sidebar updates
-        queryClient.invalidateQueries({ queryKey: ["runs"] });
+      if (msg.type === "hello") return;
+      if (msg.type === "resync") {
+        queryClient.invalidateQueries({ queryKey: ["steps", runId] });
+        queryClient.invalidateQueries({ queryKey: ["run", runId] });
+        return;
       }
+      const events: WsEvent[] = msg.type === "batch" ? msg.messages : [msg];
+      // Full step snapshots are merged into the cache in one update, so a
+      // batch frame re-renders once instead of once per event.
+      const steps: Step[] = [];
+      for (const event of events) {
+        if (event.type === "step_update") {
+          steps.push(event.step);
+        } else if (event.type === "step_batch") {
+          steps.push(...event.steps);
+        } else if (event.type === "step_delta") {
+          if (steps.length > 0) {
+            upsertSteps(steps[0].run_id, steps.splice(0));
+          }
+          if (!applyStepDelta(event.run_id, event.step_id, event.changes)) {
+            // Never saw the full step; fetch it instead.
+            queryClient.invalidateQueries({ queryKey: ["steps", event.run_id] });
+          }
+        } else if (event.type === "run_update") {
+          // The runs list hears about this from the firehose.
+          queryClient.setQueryData<Run>(["run", event.run.run_id], event.run);
+        }
+      }
+      if (steps.length > 0) upsertSteps(steps[0].run_id, steps);
     },
-    [upsertStep, queryClient]
+    [runId, upsertSteps, applyStepDelta, queryClient]
   );
 
   useEffect(() => {
@@ -2,9 +2,15 @@ import type {
   Run,
   Step,
   CreateRunRequest,
+  ListRunsParams,
   RunsListResponse,
   StepsListResponse,
+  StepPayload,
   ScenariosResponse,
+  StatsResponse,
+  LatencyGroup,
+  LatencyWindow,
+  LatencyTimeseriesResponse,
 } from "@/types";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
@@ -33,12 +39,22 @@ export async function createRun(req: CreateRunRequest): Promise<Run> {
 }
 
 export async function listRuns(limit = 50): Promise<Run[]> {
-  const data = await fetchJson<RunsListResponse>(
-    `${API_URL}/api/runs?limit=${limit}`
-  );
+  const data = await listRunsPage({ limit });
   return data.runs;
 }
 
+export async function listRunsPage(
+  params: ListRunsParams = {}
+): Promise<RunsListResponse> {
+  const { tags, ...rest } = params;
+  const query = new URLSearchParams();
+  for (const [key, value] of Object.entries(rest)) {
+    if (value !== undefined) query.set(key, String(value));
+  }
+  for (const tag of tags ?? []) query.append("tag", tag);
+  return fetchJson<RunsListResponse>(`${API_URL}/api/runs?${query}`);
+}
+
 export async function getRun(runId: string): Promise<Run> {
   return fetchJson<Run>(`${API_URL}/api/runs/${runId}`);
 }
@@ -46,12 +62,43 @@ export async function getRun(runId: string): Promise<Run> {
 // ─── Steps ──────────────────────────────────────────────────────────────────
 
 export async function getRunSteps(runId: string): Promise<Step[]> {
-  const data = await fetchJson<StepsListResponse>(
-    `${API_URL}/api/runs/${runId}/steps`
-  );
+  const data = await getRunStepsSince(runId);
   return data.steps;
 }
 
+/** Steps changed after version `since` of `epoch` (all steps when omitted,
+ * or when the server worker answering has another epoch). */
+export async function getRunStepsSince(
+  runId: string,
+  since?: { version: number; epoch: string }
+): Promise<StepsListResponse> {
+  const query =
+    since === undefined ? "" : `?since=${since.version}&epoch=${since.epoch}`;
+  return fetchJson<StepsListResponse>(
+    `${API_URL}/api/runs/${runId}/steps${query}`
+  );
+}
+
+/** A step's input and output, fetched when it holds payload references. */
+export async function getStepPayload(stepId: string): Promise<StepPayload> {
+  return fetchJson<StepPayload>(`${API_URL}/api/steps/${stepId}/payload`);
+}
+
+// ─── Stats ──────────────────────────────────────────────────────────────────
+
+export async function getStats(): Promise<StatsResponse> {
+  return fetchJson<StatsResponse>(`${API_URL}/api/stats`);
+}
+
+export async function getLatencyTimeseries(
+  group: LatencyGroup,
+  window: LatencyWindow
+): Promise<LatencyTimeseriesResponse> {
+  return fetchJson<LatencyTimeseriesResponse>(
+    `${API_URL}/api/analytics/latency/timeseries?group=${group}&window=${window}`
+  );
+}
+
 // ─── Scenarios ──────────────────────────────────────────────────────────────
 
 export async function listScenarios(): Promise<ScenariosResponse> {
@@ -1,6 +1,7 @@
 /**
  * Cost computation utilities.
- * Matches the backend cost rates exactly.
+ * Mirrors the backend's built-in rates; the server's rate table
+ * (GET /api/rates, with effective dates) is authoritative.
  */
 
 export const COST_RATES: Record<string, { prompt: number; completion: number }> = {
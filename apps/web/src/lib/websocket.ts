@@ -1,30 +1,34 @@
-import type { WsMessage } from "@/types";
+import type { FirehoseMessage, RunFilter, WsMessage } from "@/types";
 
 const WS_URL = process.env.NEXT_PUBLIC_WS_URL || "ws://localhost:8000";
 
-export type MessageHandler = (msg: WsMessage) => void;
+export type MessageHandler<T = WsMessage> = (msg: T) => void;
 
-export class RunWebSocket {
+/** JSON WebSocket with keepalive pings and automatic reconnects. */
+abstract class ReconnectingWebSocket<T extends { seq: number }> {
   private ws: WebSocket | null = null;
-  private runId: string;
-  private handler: MessageHandler;
+  private handler: MessageHandler<T>;
   private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
   private pingTimer: ReturnType<typeof setInterval> | null = null;
   private closed = false;
+  // Last frame sequence seen; reconnects resume after it. Sequences are
+  // numbered per server worker, named by the epoch of the last hello.
+  protected lastSeq = 0;
+  protected epoch: string | null = null;
 
-  constructor(runId: string, handler: MessageHandler) {
-    this.runId = runId;
+  constructor(protected label: string, handler: MessageHandler<T>) {
     this.handler = handler;
   }
 
+  protected abstract url(): string;
+
   connect(): void {
     if (this.closed) return;
 
-    const url = `${WS_URL}/ws/runs/${this.runId}`;
-    this.ws = new WebSocket(url);
+    this.ws = new WebSocket(this.url());
 
     this.ws.onopen = () => {
-      console.log(`[WS] Connected to run ${this.runId}`);
+      console.log(`[WS] Connected to ${this.label}`);
       // Start ping interval
       this.pingTimer = setInterval(() => {
         if (this.ws?.readyState === WebSocket.OPEN) {
@@ -36,7 +40,9 @@ export class RunWebSocket {
     this.ws.onmessage = (event) => {
       try {
         if (event.data === "pong") return;
-        const msg: WsMessage = JSON.parse(event.data);
+        const msg: T & { epoch?: string } = JSON.parse(event.data);
+        this.lastSeq = msg.seq;
+        if (msg.epoch) this.epoch = msg.epoch;
         this.handler(msg);
       } catch (e) {
         console.error("[WS] Failed to parse message:", e);
@@ -44,7 +50,7 @@ export class RunWebSocket {
     };
 
     this.ws.onclose = () => {
-      console.log(`[WS] Disconnected from run ${this.runId}`);
+      console.log(`[WS] Disconnected from ${this.label}`);
       this.clearPing();
       if (!this.closed) {
         this.scheduleReconnect();
@@ -59,7 +65,7 @@ export class RunWebSocket {
 
   private scheduleReconnect(): void {
     this.reconnectTimer = setTimeout(() => {
-      console.log(`[WS] Reconnecting to run ${this.runId}...`);
+      console.log(`[WS] Reconnecting to ${this.label}...`);
       this.connect();
     }, 2000);
   }
@@ -84,3 +90,34 @@ export class RunWebSocket {
     }
   }
 }
+
+export class RunWebSocket extends ReconnectingWebSocket<WsMessage> {
+  constructor(private runId: string, handler: MessageHandler) {
+    super(`run ${runId}`, handler);
+  }
+
+  protected url(): string {
+    const epoch = this.epoch ? `&epoch=${this.epoch}` : "";
+    return `${WS_URL}/ws/runs/${this.runId}?from_seq=${this.lastSeq}${epoch}&mode=delta`;
+  }
+}
+
+/** All runs matching `filter`; every (re)connect starts with a snapshot. */
+export class RunsFirehose extends ReconnectingWebSocket<FirehoseMessage> {
+  constructor(
+    private filter: RunFilter,
+    private limit: number,
+    handler: MessageHandler<FirehoseMessage>
+  ) {
+    super("runs firehose", handler);
+  }
+
+  protected url(): string {
+    const params = new URLSearchParams({ limit: String(this.limit) });
+    if (this.filter.status) params.set("status", this.filter.status);
+    if (this.filter.system_type) params.set("system_type", this.filter.system_type);
+    if (this.filter.user_id) params.set("user_id", this.filter.user_id);
+    for (const tag of this.filter.tags ?? []) params.append("tag", tag);
+    return `${WS_URL}/ws/runs?${params}`;
+  }
+}
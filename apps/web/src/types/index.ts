@@ -5,6 +5,7 @@ export type RunStatus = "running" | "completed" | "failed";
 export type SystemType = "mock" | "openclaw" | "claude" | "other";
 export type StepType = "llm" | "tool" | "plan" | "final" | "error";
 export type StepStatus = "running" | "completed" | "failed" | "retrying";
+export type Scheduling = "sequential" | "scenario" | "parallel";
 
 export interface RunMetadata {
   user_id: string;
@@ -27,6 +28,20 @@ export interface Run {
   metadata: RunMetadata;
 }
 
+/**
+ * A large payload value kept in the server's payload store. Steps hold it
+ * in place of the value; `getStepPayload` returns the resolved payloads.
+ * A `null` `$blob` wraps a value of the step's own that has a `$blob` key,
+ * and resolves to that value.
+ */
+export type PayloadRef =
+  | {
+      $blob: string;
+      /** Size of the value's JSON encoding. */
+      bytes: number;
+    }
+  | { $blob: null; value: unknown };
+
 export interface Step {
   step_id: string;
   run_id: string;
@@ -40,6 +55,8 @@ export interface Step {
   tokens_prompt: number;
   tokens_completion: number;
   cost_usd: number;
+  /** Rate table key the cost was priced under; null means "default". */
+  model: string | null;
   input: Record<string, unknown>;
   output: Record<string, unknown>;
   error: StepError | null;
@@ -52,24 +69,125 @@ export interface Scenario {
 
 // ─── WebSocket message types ────────────────────────────────────────────────
 
-export type WsMessage =
+export type WsEvent =
   | { type: "step_update"; step: Step }
+  /** Only the fields that changed since the last update of this step. */
+  | { type: "step_delta"; run_id: string; step_id: string; changes: Partial<Step> }
+  | { type: "step_batch"; steps: Step[] }
   | { type: "run_update"; run: Run };
 
+export type WsMessage = (
+  | WsEvent
+  /** Events from one coalescing window, in order. */
+  | { type: "batch"; messages: WsEvent[] }
+  /** First frame of a connection: `seq` is numbered per server worker. */
+  | { type: "hello"; epoch: string }
+  /** Missed frames are gone from the server buffer, or were numbered by
+   * another worker; refetch over REST. */
+  | { type: "resync"; epoch: string }
+) & { seq: number };
+
+/** Frames on the `/ws/runs` firehose. */
+export type FirehoseMessage = (
+  | { type: "runs_snapshot"; runs: Run[] }
+  | { type: "run_update"; run: Run }
+  /** A run the client was shown no longer matches its filter. */
+  | { type: "run_removed"; run_id: string }
+) & { seq: number };
+
 // ─── API request / response ─────────────────────────────────────────────────
 
 export interface CreateRunRequest {
   system_type?: SystemType;
   scenario?: string;
   metadata?: Partial<RunMetadata>;
+  scheduling?: Scheduling;
+  max_concurrency?: number;
 }
 
 export interface RunsListResponse {
   runs: Run[];
+  /** Cursor for the next (older) page, null when exhausted. */
+  next_cursor: string | null;
+  /** Cursor for polling runs newer than this page. */
+  prev_cursor: string | null;
+}
+
+export interface RunFilter {
+  status?: RunStatus;
+  system_type?: SystemType;
+  user_id?: string;
+  /** Every tag must be present. */
+  tags?: string[];
+}
+
+export interface ListRunsParams extends RunFilter {
+  limit?: number;
+  before?: string;
+  after?: string;
+}
+
+/** Totals over a step and all of its descendants. */
+export interface Rollup {
+  tokens_prompt: number;
+  tokens_completion: number;
+  cost_usd: number;
+  duration_ms: number;
+  /** Failed steps in the subtree. */
+  errors: number;
+}
+
+/** Aggregates the server keeps up to date on every write. */
+export interface Stats extends Rollup {
+  tokens_total: number;
+  steps: number;
+  steps_by_type: Partial<Record<StepType, number>>;
+  steps_by_status: Partial<Record<StepStatus, number>>;
+  runs: number;
+  runs_by_status: Partial<Record<RunStatus, number>>;
+}
+
+export interface StatsResponse {
+  global: Stats;
+  by_system_type: Partial<Record<SystemType, Stats>>;
+}
+
+/** Latency percentiles (ms) from the server's sketches; null when empty. */
+export interface LatencySummary {
+  count: number;
+  p50: number | null;
+  p95: number | null;
+  p99: number | null;
+}
+
+export interface LatencyPoint extends LatencySummary {
+  /** Bucket start, epoch seconds. */
+  t: number;
+}
+
+export type LatencyGroup = "type" | "name";
+export type LatencyWindow = "1m" | "5m" | "15m" | "1h";
+
+export interface LatencyTimeseriesResponse {
+  group: LatencyGroup;
+  window: LatencyWindow;
+  bucket_s: number;
+  series: Record<string, LatencyPoint[]>;
 }
 
 export interface StepsListResponse {
   steps: Step[];
+  /** Step high-water mark; pass back as `since` to fetch only changes. */
+  version: number;
+  /** Server worker that numbered `version`; pass back with `since`. */
+  epoch: string;
+}
+
+/** A step's input and output with payload references resolved. */
+export interface StepPayload {
+  step_id: string;
+  input: Record<string, unknown>;
+  output: Record<string, unknown>;
 }
 
 export interface ScenariosResponse {